@@ -3,7 +3,14 @@
 ESGAgent
 
 Tools: GovESGSearch, CorpESGSearch, ExternalRatings
-LangGraph flow: policy -> corporate -> ratings
+LangGraph flow: START -> (policy | corporate | ratings) -> END, the three
+branches run concurrently and each fans out its Tavily queries (per region,
+per company x source) on a thread pool; in-flight calls stay bounded by the
+shared Tavily slot (concurrency.provider_slot).
+Facts come from the ESG fact store (esg_store.py) and only missing or expired
+ones are queried, so a steady-state run makes no Tavily calls. Due corporate
+targets are queried several companies at a time (advanced depth), with
+per-company fallback for the ones a combined answer misses.
 Outputs full JSON (no HTML)
 """
 from __future__ import annotations
@@ -11,8 +18,8 @@ from __future__ import annotations
 import os
 import json
 import re
-from typing import Dict, List, Optional, Any, TypedDict
-from urllib import request
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TypedDict
 
 try:
     from langchain.tools import tool
@@ -23,6 +30,17 @@ except Exception:
             return fn
         return deco
 
+try:
+    from .esg_extract import extract
+    from .concurrency import ThreadPoolExecutor
+    from .esg_store import get_esg_store
+    from .http_client import TransportError, tavily_search as _tavily_search
+except ImportError:
+    from esg_extract import extract
+    from concurrency import ThreadPoolExecutor
+    from esg_store import get_esg_store
+    from http_client import TransportError, tavily_search as _tavily_search
+
 # Best-effort: load env from evagent/.env if present (for TAVILY_API_KEY, etc.)
 def _load_env_from_dotenv() -> None:
     if os.getenv("TAVILY_API_KEY"):
@@ -46,6 +64,21 @@ def _load_env_from_dotenv() -> None:
 
 _load_env_from_dotenv()
 
+# Threads per tool; actual in-flight Tavily calls are capped by EVAGENT_MAX_TAVILY
+ESG_SEARCH_WORKERS = int(os.getenv("ESG_SEARCH_WORKERS", "8"))
+# Companies per combined CorpESGSearch query (1 = one query per company)
+ESG_CORP_BATCH_SIZE = int(os.getenv("ESG_CORP_BATCH_SIZE", "3"))
+# A batch size whose recorded hit rate drops below this is halved on later runs
+ESG_CORP_BATCH_MIN_HIT_RATE = float(os.getenv("ESG_CORP_BATCH_MIN_HIT_RATE", "0.6"))
+
+
+def _fan_out(fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    """fn over items on a bounded thread pool; results in input order."""
+    if len(items) <= 1:
+        return [fn(x) for x in items]
+    with ThreadPoolExecutor(max_workers=min(ESG_SEARCH_WORKERS, len(items)), thread_name_prefix="esg-search") as pool:
+        return list(pool.map(fn, items))
+
 # ---------------------------------
 # Whitelist (OEM names)
 # ---------------------------------
@@ -63,47 +96,154 @@ OEM_WHITELIST = {
 }
 
 # ---------------------------------
-# Tavily helpers
+# Facts (served from the ESG fact store, fetched via Tavily when due)
 # ---------------------------------
-def _tavily_search(query: str, *, depth: str = "basic") -> Dict[str, Any]:
-    api_key = os.getenv("TAVILY_API_KEY")
-    if not api_key:
-        return {}
-    url = "https://api.tavily.com/search"
-    body = json.dumps(
-        {
-            "api_key": api_key,
-            "query": query,
-            "max_results": 5,
-            "include_answer": True,
-            "search_depth": depth,
-        }
-    ).encode("utf-8")
-    req = request.Request(url, data=body, headers={"Content-Type": "application/json"})
-    try:
-        with request.urlopen(req, timeout=30) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except Exception:
-        return {}
+_REGION_NAMES = {
+    "KR": "South Korea",
+    "CN": "China",
+    "JP": "Japan",
+    "EU": "European Union",
+    "US": "United States",
+    "UK": "United Kingdom",
+}
+
+def _region_name(code: str) -> str:
+    return _REGION_NAMES.get(code.upper(), code)
+
+def _corp_target(answer: str) -> Dict[str, Any]:
+    e = extract(answer)
+    return {"target_year": e["target_year"], "scope": e["scopes"], "policy": (answer or "").strip() or "N/A"}
+
+# fact type -> (query template, search depth, answer parser); parsers use esg_extract
+_FACTS = {
+    "gov_policy": (
+        "{region} government net zero policy target year carbon neutral official", "basic",
+        lambda a: {"policy": (a or "").strip() or "N/A", "carbon_neutral": extract(a)["target_year"]},
+    ),
+    "corp_target": (
+        "{subject} ESG net zero target year Scope 1 Scope 2 Scope 3 sustainability report", "advanced",
+        _corp_target,
+    ),
+    "msci": ("MSCI ESG rating {subject} official", "basic", lambda a: extract(a)["msci"]),
+    "cdp": ("CDP score {subject} environmental score official", "basic", lambda a: extract(a)["cdp"]),
+}
 
-def _parse_year(text: str) -> Optional[int]:
-    s = text or ""
-    yrs = [int(y) for y in re.findall(r"(20[2-6][0-9])", s)]
-    if not yrs:
+def esg_fact_keys(regions: List[str], oems: List[str]) -> List[tuple]:
+    """(subject, fact type) keys an ESG run needs for these regions / OEMs."""
+    keys = [(r, "gov_policy") for r in regions]
+    for c in oems:
+        if c in OEM_WHITELIST:
+            keys += [(c, "corp_target"), (c, "msci"), (c, "cdp")]
+    return keys
+
+def _fact(key: tuple) -> Dict[str, Any]:
+    """Stored fact for (subject, fact type), re-fetched via Tavily only when missing or expired."""
+    subject, fact_type = key
+    template, depth, parse = _FACTS[fact_type]
+    query = template.format(subject=subject, region=_region_name(subject))
+
+    def _fetch(q: str) -> Optional[str]:
+        # None = the call failed (nothing is stored); "" = no answer
+        try:
+            data = _tavily_search(q, depth=depth, raise_errors=True)
+        except TransportError:
+            return None
+        return data.get("answer") or ""
+
+    fetch = _fetch if os.getenv("TAVILY_API_KEY") else None
+    return get_esg_store().lookup(subject, fact_type, query, fetch, parse)
+
+# ---------------------------------
+# Corporate target batching
+# ---------------------------------
+# Other names the search answers use for whitelisted OEMs
+_COMPANY_ALIASES = {"General Motors": ("GM",), "Volkswagen": ("VW",)}
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+# Clause boundaries inside a sentence; the separator stays with the clause before it
+_CLAUSE_RE = re.compile(r"(,\s+(?:while|whereas|but)\s+|,\s+and\s+(?!\d)|\s+whereas\s+|;\s+)", re.IGNORECASE)
+_CLAUSE_TAIL_RE = re.compile(r"(?:,\s+(?:while|whereas|but|and)|\s+whereas|;)\s*$", re.IGNORECASE)
+_name_patterns: Dict[str, Any] = {}
+
+def _name_re(company: str):
+    pat = _name_patterns.get(company)
+    if pat is None:
+        names = (company,) + _COMPANY_ALIASES.get(company, ())
+        pat = re.compile(r"\b(?:" + "|".join(map(re.escape, names)) + r")\b", re.IGNORECASE)
+        _name_patterns[company] = pat
+    return pat
+
+def _clauses(sentence: str) -> List[str]:
+    pieces = _CLAUSE_RE.split(sentence)
+    return [pieces[i] + (pieces[i + 1] if i + 1 < len(pieces) else "") for i in range(0, len(pieces), 2)]
+
+def _split_by_company(answer: str, companies: List[str]) -> Dict[str, str]:
+    """Text of a combined answer per company, split on sentences and clauses.
+
+    A sentence naming one company goes to it whole; one naming several is split
+    into clauses, each going to the single company it names (unnamed clauses
+    continue the previous one). Clauses naming several companies, and text
+    following them that names none, are dropped: their values cannot be tied
+    to one company, so those companies fall back to their own query.
+    """
+    parts: Dict[str, List[str]] = {c: [] for c in companies}
+    current: List[str] = []
+    for sentence in _SENTENCE_RE.split(answer or ""):
+        named = [c for c in companies if _name_re(c).search(sentence)]
+        if len(named) <= 1:
+            if named:
+                current = named
+            for c in current:
+                parts[c].append(sentence)
+            continue
+        last = None
+        for clause in _clauses(sentence):
+            in_clause = [c for c in named if _name_re(c).search(clause)]
+            if len(in_clause) > 1:
+                current = []
+            elif in_clause:
+                current = in_clause
+            if current:
+                c = current[0]
+                # Consecutive clauses of one company keep their original separators
+                if last == c:
+                    parts[c][-1] += clause
+                else:
+                    parts[c].append(clause)
+            last = current[0] if current else None
+        current = []
+    return {c: " ".join(_CLAUSE_TAIL_RE.sub(".", p.strip()) for p in v) for c, v in parts.items() if v}
+
+def _corp_batch_size() -> int:
+    """ESG_CORP_BATCH_SIZE, halved while its recorded hit rate is below the minimum."""
+    stats = get_esg_store().batch_stats("corp_target")
+    size = max(1, ESG_CORP_BATCH_SIZE)
+    while size > 1:
+        s = stats.get(size)
+        # Keep a size until it has been tried on a few batches' worth of companies
+        if s is None or s["subjects"] < 2 * size or s["hit_rate"] >= ESG_CORP_BATCH_MIN_HIT_RATE:
+            break
+        size //= 2
+    return size
+
+def _corp_batch(group: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """One combined query for ``group``; stores and returns facts for companies it answered.
+
+    Returns None when the call failed, so the group is not counted in the batch stats.
+    """
+    template, depth, parse = _FACTS["corp_target"]
+    query = template.format(subject=", ".join(group), region="")
+    try:
+        data = _tavily_search(query, depth=depth, raise_errors=True)
+    except TransportError:
         return None
-    valid = [y for y in yrs if 2024 <= y <= 2065]
-    return min(valid) if valid else min(yrs)
-
-def _parse_scopes(text: str) -> List[str]:
-    s = (text or "").lower()
-    scopes: List[str] = []
-    if re.search(r"\bscope\s*1\b|\bs1\b", s):
-        scopes.append("S1")
-    if re.search(r"\bscope\s*2\b|\bs2\b", s):
-        scopes.append("S2")
-    if re.search(r"\bscope\s*3\b|\bs3\b", s):
-        scopes.append("S3")
-    return scopes
+    answer = (data.get("answer") or "").strip()
+    found = {}
+    for company, segment in _split_by_company(answer, group).items():
+        value = parse(segment)
+        if value["target_year"] is None and not value["scope"]:
+            continue
+        found[company] = get_esg_store().put(company, "corp_target", value, query=query, answer=segment)
+    return found
 
 # ---------------------------------
 # Tools
@@ -113,88 +253,62 @@ def GovESGSearch(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Lookup government ESG policies by region.
 
     payload: {"regions": list[str]}
-    returns: { region: {"policy": str, "carbon_neutral": int|None, "notes": str} }
+    returns: { region: {"policy": str, "carbon_neutral": int|None} }
     """
     regions: List[str] = payload.get("regions", [])
-    api_key = os.getenv("TAVILY_API_KEY")
-
-    def _region_name(code: str) -> str:
-        m = {
-            "KR": "South Korea",
-            "CN": "China",
-            "JP": "Japan",
-            "EU": "European Union",
-            "US": "United States",
-            "UK": "United Kingdom",
-        }
-        return m.get(code.upper(), code)
-
-    out: Dict[str, Any] = {}
-    for r in regions:
-        rn = _region_name(r)
-        if api_key:
-            q = f"{rn} government net zero policy target year carbon neutral official"
-            data = _tavily_search(q, depth="basic")
-            answer = data.get("answer") if isinstance(data, dict) else None
-            out[r] = {
-                "policy": (answer or "").strip() or "N/A",
-                "carbon_neutral": _parse_year(answer or ""),
-            }
-        else:
-            out[r] = {"policy": "N/A", "carbon_neutral": None}
-    return out
+    facts = _fan_out(_fact, [(r, "gov_policy") for r in regions])
+    return {r: f["value"] for r, f in zip(regions, facts)}
 
 @tool("CorpESGSearch", description="Summarize OEM corporate ESG targets (year, scope) via Tavily")
 def CorpESGSearch(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Summarize OEM corporate ESG targets for allowed companies via Tavily.
 
     payload: {"oems": list[str]}
-    returns: { company: {"target_year": int|None, "scope": list[str], "policy": str} }
+    returns: {"targets": { company: {"target_year": int|None, "scope": list[str], "policy": str} },
+              "batching": {"batch_size": int, "batch_queries": int, "companies": int, ...}}
     """
     oems: List[str] = payload.get("oems", [])
-    api_key = os.getenv("TAVILY_API_KEY")
+    allowed = [c for c in oems if c in OEM_WHITELIST]
+    store = get_esg_store()
+
+    # Due companies share combined advanced queries; only the ones a combined
+    # answer did not cover fall back to their own query
+    facts: Dict[str, Dict[str, Any]] = {}
+    due = [c for c in allowed if store.fresh(c, "corp_target") is None]
+    size = _corp_batch_size()
+    groups = [due[i:i + size] for i in range(0, len(due), size)] if size > 1 else []
+    groups = [g for g in groups if len(g) > 1]
+    if groups and os.getenv("TAVILY_API_KEY"):
+        answered = [(g, found) for g, found in zip(groups, _fan_out(_corp_batch, groups)) if found is not None]
+        for _, found in answered:
+            facts.update(found)
+        batched = sum(len(g) for g, _ in answered)
+        if answered:
+            store.record_batch("corp_target", size, queries=len(answered), subjects=batched, hits=len(facts))
+        batching = {
+            "batch_size": size, "batch_queries": len(groups), "failed_queries": len(groups) - len(answered),
+            "companies": batched, "hits": len(facts), "hit_rate": round(len(facts) / batched, 3) if batched else 0.0,
+            "fallback": sum(len(g) for g in groups) - len(facts),
+        }
+    else:
+        batching = {"batch_size": size, "batch_queries": 0, "companies": 0}
 
-    res: Dict[str, Any] = {}
-    for comp in oems:
-        if comp not in OEM_WHITELIST:
-            continue
-        if api_key:
-            q = f"{comp} ESG net zero target year Scope 1 Scope 2 Scope 3 sustainability report"
-            data = _tavily_search(q, depth="advanced")
-            answer = data.get("answer") if isinstance(data, dict) else None
-            res[comp] = {
-                "target_year": _parse_year(answer or ""),
-                "scope": _parse_scopes(answer or ""),
-                "policy": (answer or "").strip() or "N/A",
-            }
-        else:
-            res[comp] = {"target_year": None, "scope": [], "policy": "N/A"}
-    return res
+    rest = [c for c in allowed if c not in facts]
+    facts.update(zip(rest, _fan_out(_fact, [(c, "corp_target") for c in rest])))
+    return {"targets": {c: facts[c]["value"] for c in allowed}, "batching": batching}
 
 @tool("ExternalRatings", description="Fetch external ESG ratings hints (MSCI/CDP) via Tavily search")
 def ExternalRatings(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Fetch external ESG ratings hints (MSCI/CDP) via Tavily search.
 
     payload: {"oems": list[str]}
-    returns: { company: {"msci": str|None, "cdp": str|None, "notes": str} }
+    returns: { company: {"msci": str|None, "cdp": str|None} }
     """
-    api_key = os.getenv("TAVILY_API_KEY")
     companies: List[str] = payload.get("oems", [])
-    if not api_key:
-        return {c: {"msci": None, "cdp": None} for c in companies}
-
-    def _pick(pattern: str, text: str) -> Optional[str]:
-        m = re.search(pattern, text or "", re.IGNORECASE)
-        return m.group(0) if m else None
-
-    out: Dict[str, Any] = {}
-    for c in companies:
-        msci_ans = _tavily_search(f"MSCI ESG rating {c} official", depth="basic")
-        cdp_ans = _tavily_search(f"CDP score {c} environmental score official", depth="basic")
-        msci = _pick(r"AAA|AA|A|BBB|BB|B|CCC", msci_ans.get("answer") if isinstance(msci_ans, dict) else "")
-        cdp = _pick(r"A\+|A-|A|B\+|B|B-|C\+|C|C-|D\+|D|D-", cdp_ans.get("answer") if isinstance(cdp_ans, dict) else "")
-        out[c] = {"msci": msci, "cdp": cdp}
-    return out
+    # One fact per (company, source), all fanned out together
+    keys = [(c, source) for c in companies for source in ("msci", "cdp")]
+    facts = dict(zip(keys, _fan_out(_fact, keys)))
+    return {c: {"msci": facts[(c, "msci")]["value"], "cdp": facts[(c, "cdp")]["value"]} for c in companies}
 
 # ---------------------------------
 # State
@@ -204,52 +318,63 @@ class ESGState(TypedDict):
     oems: List[str]
     gov_esg_findings: Optional[Dict[str, Any]]
     corp_esg_findings: Optional[Dict[str, Any]]
+    corp_batching: Optional[Dict[str, Any]]
     external_ratings: Optional[Dict[str, Any]]
     out_dir: str
 
 # ---------------------------------
 # Nodes
 # ---------------------------------
-def collect_policy(state: ESGState) -> ESGState:
+# The nodes run as parallel branches, so each returns only the key it owns
+def collect_policy(state: ESGState) -> Dict[str, Any]:
     gov = GovESGSearch.invoke({"payload": {"regions": state.get("regions", [])}})
-    new = state.copy()
-    new["gov_esg_findings"] = gov
-    return new
+    return {"gov_esg_findings": gov}
 
-def collect_corporate(state: ESGState) -> ESGState:
+def collect_corporate(state: ESGState) -> Dict[str, Any]:
     oems = [o for o in state.get("oems", []) if o in OEM_WHITELIST]
     corp = CorpESGSearch.invoke({"payload": {"oems": oems}})
-    new = state.copy()
-    new["corp_esg_findings"] = corp
-    return new
+    return {"corp_esg_findings": corp["targets"], "corp_batching": corp["batching"]}
 
-def collect_ratings(state: ESGState) -> ESGState:
+def collect_ratings(state: ESGState) -> Dict[str, Any]:
     oems = [o for o in state.get("oems", []) if o in OEM_WHITELIST]
     ratings = ExternalRatings.invoke({"payload": {"oems": oems}})
-    new = state.copy()
-    new["external_ratings"] = ratings
-    return new
+    return {"external_ratings": ratings}
 
 # ---------------------------------
 # Graph
 # ---------------------------------
 def compile_esg_graph():
-    from langgraph.graph import StateGraph
+    from langgraph.graph import END, START, StateGraph
 
     g = StateGraph(ESGState)
     g.add_node("policy", collect_policy)
     g.add_node("corporate", collect_corporate)
     g.add_node("ratings", collect_ratings)
-    g.set_entry_point("policy")
-    g.add_edge("policy", "corporate")
-    g.add_edge("corporate", "ratings")
+    # Fan out from START, fan back in at END (one superstep)
+    for node in ("policy", "corporate", "ratings"):
+        g.add_edge(START, node)
+        g.add_edge(node, END)
     return g.compile()
 
 # ---------------------------------
 # Runner
 # ---------------------------------
-def run_esg_agent(regions: List[str], oems: List[str], out_dir: Optional[str] = None):
+def run_esg_agent(
+    regions: List[str],
+    oems: List[str],
+    out_dir: Optional[str] = None,
+    previous: Optional[Dict[str, Any]] = None,
+):
+    """Run the ESG graph for the given regions/OEMs.
+
+    previous: an earlier run_esg_agent() result; its gov/corp/ratings entries are
+    kept for units not re-queried here, so a retry can fetch only failed units.
+    """
     compiled = compile_esg_graph()
+    store = get_esg_store()
+    keys = esg_fact_keys(regions, oems)
+    due = store.due(keys)
+    print(f"[ESG] facts: {len(keys) - len(due)} fresh, {len(due)} to fetch")
     base_out = out_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "outputs")
     os.makedirs(base_out, exist_ok=True)
 
@@ -258,18 +383,44 @@ def run_esg_agent(regions: List[str], oems: List[str], out_dir: Optional[str] =
         "oems": oems,
         "gov_esg_findings": None,
         "corp_esg_findings": None,
+        "corp_batching": None,
         "external_ratings": None,
         "out_dir": base_out,
     }
     final = compiled.invoke(init)
+    batching = final.get("corp_batching") or {}
+    if batching.get("batch_queries"):
+        print(f"[ESG] corp targets: {batching['batch_queries']} batched queries for {batching['companies']} companies, "
+              f"hit rate {batching['hit_rate']:.0%}, {batching['fallback']} per-company fallbacks")
+
+    gov = final["gov_esg_findings"]
+    corp = final["corp_esg_findings"]
+    ratings = final.get("external_ratings", {})
+    out_regions = final["regions"]
+    if previous:
+        gov = {**(previous.get("gov") or {}), **(gov or {})}
+        corp = {**(previous.get("corp") or {}), **(corp or {})}
+        ratings = {**(previous.get("ratings") or {}), **(ratings or {})}
+        out_regions = list(gov.keys())
+
+    # Where each stored fact came from (the answer text stays in the fact store)
+    provenance: Dict[str, Any] = {}
+    for subject, fact_type in esg_fact_keys(list(gov or {}), list({**(corp or {}), **(ratings or {})})):
+        fact = store.get(subject, fact_type)
+        if fact is not None:
+            provenance.setdefault(subject, {})[fact_type] = {
+                "query": fact["query"],
+                "fetched_at": datetime.fromtimestamp(fact["fetched_at"]).isoformat(timespec="seconds"),
+            }
 
     # Build structured JSON output
     output_data = {
         "analysis_type": "ESG Summary (OEM only)",
-        "regions": final["regions"],
-        "government_policies": final["gov_esg_findings"],
-        "corporate_esg_goals": final["corp_esg_findings"],
-        "external_ratings": final.get("external_ratings", {}),
+        "regions": out_regions,
+        "government_policies": gov,
+        "corporate_esg_goals": corp,
+        "external_ratings": ratings,
+        "fact_provenance": provenance,
         "notes": {
             "ghg_protocol_scopes": {
                 "scope_1": "Direct emissions from owned/controlled sources (e.g., company vehicles, on-site fuel combustion).",
@@ -298,16 +449,24 @@ def run_esg_agent(regions: List[str], oems: List[str], out_dir: Optional[str] =
         }
     }
 
-    # Save as JSON only
+    # Save as JSON only (left untouched when no fact changed)
     out_path = os.path.join(base_out, "esg_analysis.json")
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    text = json.dumps(output_data, ensure_ascii=False, indent=2)
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            unchanged = f.read() == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
 
     return {
-        "gov": final["gov_esg_findings"],
-        "corp": final["corp_esg_findings"],
-        "ratings": final.get("external_ratings", {}),
+        "gov": gov,
+        "corp": corp,
+        "ratings": ratings,
         "json_path": out_path,
+        "corp_batching": batching,
     }
 
 if __name__ == "__main__":
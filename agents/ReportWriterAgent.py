@@ -7,7 +7,12 @@ from __future__ import annotations
 import os
 import json
 import re
-from typing import Any, Dict, List, Optional, TypedDict
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypedDict
 
 # 추가: 일괄 변환 유틸 불러오기
 try:
@@ -17,6 +22,13 @@ try:
 except Exception:
     _batch_convert_html_dir_to_pdf = None  # 선택적 의존성
 
+try:
+    from .concurrency import provider_slot
+    from .http_client import prompt_cache_key, prompt_cache_metrics, prompt_cache_warmup, record_usage
+except ImportError:
+    from concurrency import provider_slot
+    from http_client import prompt_cache_key, prompt_cache_metrics, prompt_cache_warmup, record_usage
+
 _HAS_LANGCHAIN = False
 try:
     from langchain_openai import ChatOpenAI
@@ -27,10 +39,16 @@ except Exception:
 
 def _outputs_dir() -> str:
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    out = os.path.normpath(os.path.join(base_dir, "..", "outputs"))
+    out = os.getenv("EVAGENT_OUTPUTS_DIR") or os.path.normpath(os.path.join(base_dir, "..", "outputs"))
     return os.path.abspath(out)
 
 
+def _companies_config_path() -> str:
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cfg_dir = os.getenv("EVAGENT_CONFIG_DIR") or os.path.join(base_dir, "config")
+    return os.path.join(cfg_dir, "allowed_companies.json")
+
+
 def _file_uri(p: str) -> str:
     ap = os.path.abspath(p)
     return "file:///" + ap.replace("\\", "/")
@@ -48,9 +66,16 @@ PROMPT_SYSTEM = """당신은 전문 시장 분석 보고서 작성자입니다.
 6. 코드블록 출력 금지. 순수 본문만 출력
 """
 
-PROMPT_USER_TEMPLATE = """전기차 시장 분석 보고서 본문을 작성하세요.
+# 모든 OEM 보고서에 동일한 앞부분 (provider 프롬프트 캐시 대상)
+PROMPT_SHARED_TEMPLATE = """전기차 시장 분석 보고서 본문을 작성하세요.
+
+# 공통 입력 데이터 (모든 OEM 보고서에 동일)
 
-# 입력 데이터
+## 전체 데이터 개요 (공통 표: cols=열 이름, rows=회사별 행)
+{shared_context}
+"""
+
+PROMPT_USER_TEMPLATE = """# 대상 회사 입력 데이터
 {data_summary}
 
 # 대상 회사
@@ -128,62 +153,199 @@ JIT 관점 분석 (2-3문단)
 """
 
 
-def _compose_user_prompt(summary: Dict[str, Any], images: Dict[str, Any], target_company: str) -> str:
-    """프롬프트 조합"""
-    def dumps(x: Any) -> str:
-        return json.dumps(x, ensure_ascii=False, indent=2)
-    
-    tech = summary.get("tech", {}) or {}
-    esg = summary.get("esg", {}) or {}
-    valuechain = summary.get("valuechain", {}) or {}
-    stock = summary.get("stock", {}) or {}
-
-    # 해당 회사만 필터링
-    filtered_tech = tech.get(target_company, {}) if isinstance(tech, dict) else {}
-    filtered_valuechain = {target_company: valuechain.get(target_company, {})} if isinstance(valuechain, dict) else {}
-    filtered_stock = {target_company: stock.get(target_company, {})} if isinstance(stock, dict) else {}
-    filtered_esg = {target_company: esg.get(target_company, {})} if isinstance(esg, dict) else {}
-
-    # config에서 전체 OEM 리스트
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                               "config", "allowed_companies.json")
-    all_oems = []
-    if os.path.isfile(config_path):
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            all_oems = [c["name"] for c in data.get("companies", []) if c.get("category") == "OEM"]
-        except Exception:
-            pass
+# 보고서 프롬프트의 입력 데이터 토큰 예산 (~4자 = 1토큰 근사, 초과 시 서술형 필드를 단계적으로 축약)
+REPORT_PROMPT_TOKEN_BUDGET = int(os.getenv("REPORT_PROMPT_TOKEN_BUDGET", "6000"))
+# 예산 초과 시 차례로 적용할 서술형 필드 최대 길이 (None = 원문 유지)
+_TEXT_LIMITS = (None, 400, 160, 60)
+
+_TECH_AXES = ["TRL", "MRL", "CRAAP", "Materiality", "ISSB", "OTA_Compliance"]
+_STOCK_COLS = ["ticker", "current", "prev_close", "market_cap", "pe", "change_90d_pct",
+               "volatility_pct", "max_drawdown_pct"]
+
+
+def _estimate_tokens(text: str) -> int:
+    """토큰 수 근사 (문자 4개 = 1토큰)"""
+    return (len(text) + 3) // 4
 
-    data_summary = f"""
-## 분석 대상
-전체 OEM: {dumps(all_oems)}
-이번 보고서 대상: {target_company}
 
-## 전체 데이터 개요
-- ValueChain: {dumps(summary.get("valuechain", {}))}
-- ESG: {dumps(summary.get("esg", {}))}
-- Stock: {dumps(summary.get("stock", {}))}
-- Tech: {dumps(summary.get("tech", {}))}
+def _compact(x: Any) -> str:
+    """공백 없는 JSON 직렬화"""
+    return json.dumps(x, ensure_ascii=False, separators=(",", ":"), default=str)
 
-## {target_company} 상세 데이터
-- ValueChain: {dumps(filtered_valuechain)}
-- ESG: {dumps(filtered_esg)}
-- Stock: {dumps(filtered_stock)}
-- Tech: {dumps(filtered_tech)}
 
+def _clip(text: Any, limit: Optional[int]) -> Any:
+    if limit is None or not isinstance(text, str) or len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "…"
+
+
+def _round(x: Any) -> Any:
+    if not isinstance(x, float):
+        return x
+    return int(x) if x.is_integer() else round(x, 2)
+
+
+def _table(cols: List[str], rows: List[List[Any]]) -> str:
+    """열 이름은 한 번만, 행은 배열로 (키 반복 제거)"""
+    return _compact({"cols": cols, "rows": rows})
+
+
+def _oem_names() -> List[str]:
+    """config의 전체 OEM 이름 목록"""
+    config_path = _companies_config_path()
+    if not os.path.isfile(config_path):
+        return []
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return [c["name"] for c in data.get("companies", []) if c.get("category") == "OEM"]
+    except Exception:
+        return []
+
+
+def _shared_context(summary: Dict[str, Any], all_oems: List[str], text_limit: Optional[int]) -> str:
+    """전체 회사 공통 표: 회사당 한 행, 수치 위주. 회사별 서술은 상세 데이터로."""
+    tech = summary.get("tech") or {}
+    esg = summary.get("esg") or {}
+    valuechain = summary.get("valuechain") or {}
+    stock = summary.get("stock") or {}
+    lines = [f"전체 OEM: {_compact(all_oems)}"]
+
+    if isinstance(tech, dict) and tech:
+        rows = []
+        for company, res in tech.items():
+            scores = (res or {}).get("evaluation_summary") or {
+                k: (v or {}).get("score") for k, v in ((res or {}).get("evaluation") or {}).items()
+            }
+            rows.append([company] + [scores.get(axis) for axis in _TECH_AXES])
+        lines.append(f"- Tech 점수: {_table(['company'] + _TECH_AXES, rows)}")
+
+    if isinstance(valuechain, dict) and valuechain:
+        # 결정적 집계(counts) 우선. jit_evaluation은 LLM 경로면 66km_counts/140km_counts 키를 쓴다
+        counts = valuechain.get("counts") or {}
+        rows = [[name, c.get("within_66km"), c.get("within_140km")] for name, c in sorted(counts.items())]
+        if not rows:
+            jit = (valuechain.get("jit_evaluation") or {}).get("companies") or []
+            rows = [[c.get("company"),
+                     c.get("jit_score", c.get("66km_counts")),
+                     c.get("regional_score", c.get("140km_counts"))] for c in jit]
+        lines.append(f"- ValueChain 공급사 수: {_table(['company', 'within_66km', 'within_140km'], rows)}")
+
+    if isinstance(stock, dict) and stock:
+        oem_rows = [[d.get("company_name")] + [_round(d.get(k)) for k in _STOCK_COLS]
+                    for d in stock.get("oem_data") or []]
+        if oem_rows:
+            lines.append(f"- Stock OEM: {_table(['company'] + _STOCK_COLS, oem_rows)}")
+        sup_rows = [[d.get("category"), d.get("company_name")] + [_round(d.get(k)) for k in _STOCK_COLS]
+                    for d in stock.get("supplier_data") or []]
+        if sup_rows:
+            lines.append(f"- Stock 공급사: {_table(['category', 'company'] + _STOCK_COLS, sup_rows)}")
+        if stock.get("trend_indicators"):
+            lines.append(f"- Stock 추세: {_compact(stock['trend_indicators'])}")
+        evaluation = stock.get("llm_evaluation") or {}
+        if evaluation:
+            evaluation = {k: _clip(v, text_limit) for k, v in evaluation.items() if k != "evaluation_method"}
+            lines.append(f"- Stock 시장 평가: {_compact(evaluation)}")
+
+    if isinstance(esg, dict) and esg:
+        gov = {region: {"carbon_neutral": g.get("carbon_neutral"), "policy": _clip(g.get("policy"), text_limit)}
+               for region, g in (esg.get("gov") or {}).items() if isinstance(g, dict)}
+        if gov:
+            lines.append(f"- ESG 정부 정책: {_compact(gov)}")
+        corp = esg.get("corp") or {}
+        ratings = esg.get("ratings") or {}
+        rows = []
+        for company in dict.fromkeys([*corp, *ratings]):
+            c, r = corp.get(company) or {}, ratings.get(company) or {}
+            rows.append([company, c.get("target_year"), c.get("scope"), r.get("msci"), r.get("cdp")])
+        if rows:
+            lines.append(f"- ESG 기업: {_table(['company', 'target_year', 'scope', 'msci', 'cdp'], rows)}")
+
+    return "\n".join(lines)
+
+
+def _target_context(summary: Dict[str, Any], target_company: str, text_limit: Optional[int]) -> str:
+    """대상 회사 상세: 공통 표에 없는 근거(평가 사유, 참고 출처, 정책 원문)만"""
+    tech = summary.get("tech") or {}
+    esg = summary.get("esg") or {}
+    lines = []
+
+    res = tech.get(target_company) if isinstance(tech, dict) else None
+    if isinstance(res, dict):
+        if res.get("evaluation"):
+            detail = {
+                axis: {
+                    "rationale": _clip((v or {}).get("rationale"), text_limit),
+                    "references": (v or {}).get("references") or [],
+                }
+                for axis, v in res["evaluation"].items()
+            }
+            lines.append(f"- Tech 평가 근거: {_compact(detail)}")
+        elif res.get("error"):
+            lines.append(f"- Tech: 오류 ({_clip(res['error'], text_limit)})")
+
+    corp = (esg.get("corp") or {}).get(target_company) if isinstance(esg, dict) else None
+    if isinstance(corp, dict) and corp.get("policy"):
+        lines.append(f"- ESG 정책: {_compact(_clip(corp['policy'], text_limit))}")
+
+    if not lines:
+        lines.append("- 공통 표 외 추가 데이터 없음")
+    return "\n".join(lines)
+
+
+def _fit_text(build: Callable[[Optional[int]], str], budget: int) -> str:
+    """서술형 필드 길이를 _TEXT_LIMITS 순서로 줄여 가며 budget 토큰 이내 결과를 반환"""
+    for limit in _TEXT_LIMITS:
+        text = build(limit)
+        if _estimate_tokens(text) <= budget:
+            return text
+    print(f"[Prompt] 최대 축약 후에도 예산 초과 ({_estimate_tokens(text)} > {budget} tokens)")
+    return text
+
+
+def _compose_prompt_parts(
+    summary: Dict[str, Any],
+    images: Dict[str, Any],
+    target_company: str,
+    budget: Optional[int] = None,
+) -> Tuple[str, str]:
+    """프롬프트 조합 → (공통 prefix, 회사별 suffix)
+
+    prefix: 전체 회사 데이터를 회사당 한 행의 압축 표로. 대상 회사와 무관하게
+    바이트 단위로 동일해야 provider 프롬프트 캐시가 적중한다.
+    suffix: 대상 회사의 표에 없는 근거 + 이미지 목록 + 출력 구조.
+    입력 데이터가 budget(기본 REPORT_PROMPT_TOKEN_BUDGET) 토큰을 넘으면 공통 표를
+    먼저 맞추고 남은 예산에 맞춰 회사별 서술형 필드를 단계적으로 줄인다.
+    """
+    images = images or {}
+    budget = budget or REPORT_PROMPT_TOKEN_BUDGET
+    all_oems = _oem_names()
+    prefix = _fit_text(
+        lambda limit: PROMPT_SHARED_TEMPLATE.format(shared_context=_shared_context(summary, all_oems, limit)),
+        budget,
+    )
+    image_lines = f"""
 ## 사용 가능 이미지
 - 지도: {images.get("map", "없음")}
 - 배터리: {images.get("battery_chart", "없음")}
 - HVAC: {images.get("hvac_chart", "없음")}
 - {target_company} 주가: {images.get("oem_charts_by_company", {}).get(target_company, "없음")}
 """
-    
-    return PROMPT_USER_TEMPLATE.format(
+    data_summary = _fit_text(
+        lambda limit: f"""
+## 분석 대상
+이번 보고서 대상: {target_company}
+
+## {target_company} 상세 데이터 (수치는 공통 표의 {target_company} 행 참조)
+{_target_context(summary, target_company, limit)}
+{image_lines}""",
+        max(budget - _estimate_tokens(prefix), 0),
+    )
+    suffix = PROMPT_USER_TEMPLATE.format(
         data_summary=data_summary,
         target_company=target_company
     )
+    return prefix, suffix
 
 
 def _collect_images(summary: Dict[str, Any]) -> Dict[str, Any]:
@@ -196,15 +358,25 @@ def _collect_images(summary: Dict[str, Any]) -> Dict[str, Any]:
     map_png = os.path.join(out_dir, "map_oem_suppliers.png")
     out["map"] = _file_uri(map_png) if os.path.isfile(map_png) else ""
     
+    # 주가 차트: 이번 실행의 stock 결과 경로 우선, 없으면 outputs 에서 최신 파일
+    stock = summary.get("stock") or {}
+    supplier_paths = stock.get("supplier_charts") or {}
+    oem_paths = stock.get("oem_charts") or {}
+
+    def _latest(pattern: str) -> str:
+        files = glob.glob(os.path.join(out_dir, pattern))
+        return max(files, key=os.path.getmtime) if files else ""
+
+    def _chart(path: Optional[str], pattern: str) -> str:
+        path = path if path and os.path.isfile(path) else _latest(pattern)
+        return _file_uri(path) if path else ""
+
     # 배터리/HVAC
-    battery_files = glob.glob(os.path.join(out_dir, "stock_Battery_merged_*.png"))
-    hvac_files = glob.glob(os.path.join(out_dir, "stock_HVAC_merged_*.png"))
-    out["battery_chart"] = _file_uri(battery_files[-1]) if battery_files else ""
-    out["hvac_chart"] = _file_uri(hvac_files[-1]) if hvac_files else ""
+    out["battery_chart"] = _chart(supplier_paths.get("Battery"), "stock_Battery_merged_*.png")
+    out["hvac_chart"] = _chart(supplier_paths.get("HVAC"), "stock_HVAC_merged_*.png")
     
     # OEM 차트
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                               "config", "allowed_companies.json")
+    config_path = _companies_config_path()
     ticker_map = {}
     if os.path.isfile(config_path):
         try:
@@ -217,114 +389,16 @@ def _collect_images(summary: Dict[str, Any]) -> Dict[str, Any]:
             pass
     
     oem_charts = {}
-    oem_files = glob.glob(os.path.join(out_dir, "stock_OEM_*_*.png"))
-    for filepath in oem_files:
-        filename = os.path.basename(filepath)
-        parts = filename.split("_")
-        if len(parts) >= 3:
-            ticker = parts[2]
-            company_name = next((name for name, t in ticker_map.items() if t == ticker), None)
-            if company_name:
-                oem_charts[company_name] = _file_uri(filepath)
+    for company_name, ticker in ticker_map.items():
+        uri = _chart(oem_paths.get(ticker), f"stock_OEM_{glob.escape(ticker)}_*.png")
+        if uri:
+            oem_charts[company_name] = uri
     
     out["oem_charts_by_company"] = oem_charts
     return out
 
 
-def _text_to_html(text: str, images: Dict[str, Any]) -> str:
-    """LLM 텍스트를 HTML로 변환"""
-    lines = text.splitlines()
-    html_lines: List[str] = []
-    buf: List[str] = []
-
-    def flush_table():
-        nonlocal buf
-        if not buf:
-            return
-        try:
-            rows = []
-            for ln in buf:
-                cells = [c.strip() for c in ln.strip().strip('|').split('|')]
-                rows.append(cells)
-            header = rows[0]
-            body = rows[2:] if len(rows) > 2 else []
-            html_lines.append('<table class="tbl">')
-            html_lines.append('<thead><tr>' + ''.join(f'<th>{c}</th>' for c in header) + '</tr></thead>')
-            if body:
-                html_lines.append('<tbody>')
-                for r in body:
-                    html_lines.append('<tr>' + ''.join(f'<td>{c}</td>' for c in r) + '</tr>')
-                html_lines.append('</tbody>')
-            html_lines.append('</table>')
-        except Exception:
-            for ln in buf:
-                html_lines.append(f'<p>{ln}</p>')
-        buf = []
-
-    def img_tag(kind: str, current_company: Optional[str] = None) -> str:
-        src = ''
-        if '지도' in kind:
-            src = images.get('map', '')
-        elif '배터리' in kind:
-            src = images.get('battery_chart', '')
-        elif 'HVAC' in kind or '공조' in kind:
-            src = images.get('hvac_chart', '')
-        elif '주가' in kind and current_company:
-            src = images.get('oem_charts_by_company', {}).get(current_company, '')
-            if not src:
-                print(f"[WARNING] OEM 차트 누락: {current_company}")
-        return f'<img alt="{kind}" src="{src}" style="max-width: 100%; height: auto; margin: 10px 0;" />' if src else ''
-
-    current_company = None
-    
-    for raw in lines:
-        ln = raw.strip()
-        if not ln:
-            flush_table()
-            html_lines.append('<br/>')
-            continue
-        
-        # 회사명 추적
-        if ln.startswith('### 4.1') and '분석' in ln:
-            match = re.search(r"^###\s+4\.1\s+(.+?)\s+분석", ln)
-            if match:
-                company_candidate = match.group(1).strip()
-                oem_list = list(images.get('oem_charts_by_company', {}).keys())
-                if company_candidate in oem_list:
-                    current_company = company_candidate
-                    print(f"[INFO] 회사 섹션: {current_company}")
-                else:
-                    for oem in oem_list:
-                        if oem in company_candidate or company_candidate in oem:
-                            current_company = oem
-                            print(f"[INFO] 회사 섹션 (매칭): {current_company}")
-                            break
-        
-        if ln.startswith('|'):
-            buf.append(ln)
-            continue
-        else:
-            flush_table()
-
-        if ln.startswith('#### '):
-            html_lines.append(f'<h4>{ln[5:]}</h4>')
-        elif ln.startswith('### '):
-            html_lines.append(f'<h3>{ln[4:]}</h3>')
-        elif ln.startswith('## '):
-            html_lines.append(f'<h2>{ln[3:]}</h2>')
-        elif ln.startswith('# '):
-            html_lines.append(f'<h1>{ln[2:]}</h1>')
-        elif '[이미지:' in ln or '[그림:' in ln:
-            kind = ln.replace('[이미지:', '').replace('[그림:', '').replace(']', '').strip()
-            tag = img_tag(kind, current_company)
-            if tag:
-                html_lines.append(tag)
-        else:
-            html_lines.append(f'<p>{ln}</p>')
-
-    flush_table()
-
-    css = """
+_REPORT_CSS = """
     <style>
       body { 
         font-family: 'Malgun Gothic', Arial, sans-serif; 
@@ -369,8 +443,8 @@ def _text_to_html(text: str, images: Dict[str, Any]) -> str:
       }
     </style>
     """
-    
-    title_page = """
+
+_TITLE_PAGE = """
       <div class="titlepage">
         <h2 style="color: #666;">AI Market Intelligence</h2>
         <h1>EV Market Trend Analysis Report</h1>
@@ -378,10 +452,143 @@ def _text_to_html(text: str, images: Dict[str, Any]) -> str:
         <h4 class="subtitle">AI-Driven Multi-Agent Analysis System</h4>
       </div>
     """
-    
-    head = f"<head><meta charset='utf-8'><title>EV Market Report</title>{css}</head>"
-    body = "\n".join([title_page] + html_lines)
-    return f"<!DOCTYPE html><html lang='ko'>{head}<body>{body}</body></html>"
+
+
+# str.splitlines()와 같은 줄 경계 (\v, \f, \x1c-\x1e, \x85, \u2028, \u2029 포함)
+_LINE_BREAK_RE = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class IncrementalHtmlRenderer:
+    """LLM 텍스트 → HTML 본문 줄 단위 변환기 (스트리밍 청크를 그대로 feed 가능).
+
+    - feed(chunk): 완성된 줄만 변환, 미완성 줄은 다음 청크까지 보류
+    - 표(| ... |)는 표가 끝나는 줄에서 한 번에 <table>로 변환
+    - 새 #/## 제목이 나오면 직전 섹션이 완료된 것으로 보고 sections를 증가
+    """
+
+    def __init__(self, images: Dict[str, Any]):
+        self.images = images
+        self.html_lines: List[str] = []
+        self.sections = 0
+        self.headings = 0
+        self.current_company: Optional[str] = None
+        self._table: List[str] = []
+        self._pending = ""
+
+    def _flush_table(self) -> None:
+        buf, self._table = self._table, []
+        if not buf:
+            return
+        try:
+            rows = []
+            for ln in buf:
+                cells = [c.strip() for c in ln.strip().strip('|').split('|')]
+                rows.append(cells)
+            header = rows[0]
+            body = rows[2:] if len(rows) > 2 else []
+            self.html_lines.append('<table class="tbl">')
+            self.html_lines.append('<thead><tr>' + ''.join(f'<th>{c}</th>' for c in header) + '</tr></thead>')
+            if body:
+                self.html_lines.append('<tbody>')
+                for r in body:
+                    self.html_lines.append('<tr>' + ''.join(f'<td>{c}</td>' for c in r) + '</tr>')
+                self.html_lines.append('</tbody>')
+            self.html_lines.append('</table>')
+        except Exception:
+            for ln in buf:
+                self.html_lines.append(f'<p>{ln}</p>')
+
+    def _img_tag(self, kind: str) -> str:
+        images = self.images
+        current_company = self.current_company
+        src = ''
+        if '지도' in kind:
+            src = images.get('map', '')
+        elif '배터리' in kind:
+            src = images.get('battery_chart', '')
+        elif 'HVAC' in kind or '공조' in kind:
+            src = images.get('hvac_chart', '')
+        elif '주가' in kind and current_company:
+            src = images.get('oem_charts_by_company', {}).get(current_company, '')
+            if not src:
+                print(f"[WARNING] OEM 차트 누락: {current_company}")
+        return f'<img alt="{kind}" src="{src}" style="max-width: 100%; height: auto; margin: 10px 0;" />' if src else ''
+
+    def _line(self, raw: str) -> None:
+        ln = raw.strip()
+        if not ln:
+            self._flush_table()
+            self.html_lines.append('<br/>')
+            return
+
+        # 회사명 추적
+        if ln.startswith('### 4.1') and '분석' in ln:
+            match = re.search(r"^###\s+4\.1\s+(.+?)\s+분석", ln)
+            if match:
+                company_candidate = match.group(1).strip()
+                oem_list = list(self.images.get('oem_charts_by_company', {}).keys())
+                if company_candidate in oem_list:
+                    self.current_company = company_candidate
+                    print(f"[INFO] 회사 섹션: {self.current_company}")
+                else:
+                    for oem in oem_list:
+                        if oem in company_candidate or company_candidate in oem:
+                            self.current_company = oem
+                            print(f"[INFO] 회사 섹션 (매칭): {self.current_company}")
+                            break
+
+        if ln.startswith('|'):
+            self._table.append(ln)
+            return
+        self._flush_table()
+
+        if ln.startswith('#### '):
+            self.html_lines.append(f'<h4>{ln[5:]}</h4>')
+        elif ln.startswith('### '):
+            self.html_lines.append(f'<h3>{ln[4:]}</h3>')
+        elif ln.startswith('## ') or ln.startswith('# '):
+            if self.headings:
+                self.sections += 1
+            self.headings += 1
+            if ln.startswith('## '):
+                self.html_lines.append(f'<h2>{ln[3:]}</h2>')
+            else:
+                self.html_lines.append(f'<h1>{ln[2:]}</h1>')
+        elif '[이미지:' in ln or '[그림:' in ln:
+            kind = ln.replace('[이미지:', '').replace('[그림:', '').replace(']', '').strip()
+            tag = self._img_tag(kind)
+            if tag:
+                self.html_lines.append(tag)
+        else:
+            self.html_lines.append(f'<p>{ln}</p>')
+
+    def feed(self, chunk: str) -> None:
+        text = self._pending + chunk
+        # 청크 경계에서 끊긴 \r\n을 줄바꿈 2번으로 세지 않도록 끝의 \r은 보류
+        held = "\r" if text.endswith("\r") else ""
+        *lines, rest = _LINE_BREAK_RE.split(text[:-1] if held else text)
+        self._pending = rest + held
+        for ln in lines:
+            self._line(ln)
+
+    def finish(self) -> None:
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+        self._flush_table()
+
+    def document(self) -> str:
+        head = f"<head><meta charset='utf-8'><title>EV Market Report</title>{_REPORT_CSS}</head>"
+        body = "\n".join([_TITLE_PAGE] + self.html_lines)
+        return f"<!DOCTYPE html><html lang='ko'>{head}<body>{body}</body></html>"
+
+
+def _text_to_html(text: str, images: Dict[str, Any]) -> str:
+    """LLM 텍스트를 HTML로 변환"""
+    renderer = IncrementalHtmlRenderer(images)
+    renderer.feed(text)
+    renderer.finish()
+    return renderer.document()
 
 
 def _render_html(text: str, images: Dict[str, Any], html_path: str) -> str:
@@ -464,13 +671,143 @@ def _image_to_pdf_reportlab(img_path: str, pdf_path: str) -> bool:
         return False
 
 
-def _html_to_pdf_playwright(html_path: str, pdf_path: str) -> bool:
+PDF_OPTIONS = {
+    "format": "A4",
+    "margin": {"top": "18mm", "right": "16mm", "bottom": "20mm", "left": "16mm"},
+    "print_background": True,
+}
+
+
+class PdfRenderer:
+    """Chromium 1개 + 재사용 페이지 N개로 구성된 HTML → PDF 렌더러.
+
+    - run_report_writer 1회당 한 번 생성하고, 모든 변환이 같은 브라우저를 공유한다
+      (파일마다 Chromium을 새로 띄우지 않으므로 변환 비용 = 페이지 렌더 시간).
+    - Playwright async API를 백그라운드 스레드의 이벤트 루프에서 구동하므로
+      render()는 어느 스레드에서 호출해도 안전하다.
+    - 브라우저는 첫 render() 호출 시 기동; 기동 실패 시 render()는 False를 반환.
+
+    Env: REPORT_PDF_PAGES (동시 렌더 페이지 수, 기본 2)
+    """
+
+    def __init__(self, pages: Optional[int] = None):
+        self.max_pages = max(1, pages or int(os.getenv("REPORT_PDF_PAGES", "2")))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="pdf-renderer", daemon=True)
+        self._thread.start()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._failed: Optional[str] = None
+        self._pw = None
+        self._browser = None
+        self._context = None
+        self._pages: Optional[asyncio.Queue] = None
+        self._created = 0
+
+    def _run(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _astart(self) -> None:
+        from playwright.async_api import async_playwright  # type: ignore
+
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch()
+        self._context = await self._browser.new_context()
+        self._pages = asyncio.Queue()
+
+    def _ensure_started(self) -> bool:
+        with self._start_lock:
+            if self._started:
+                return True
+            if self._failed:
+                return False
+            try:
+                self._run(self._astart(), timeout=120)
+                self._started = True
+                print(f"[PDF] Chromium 기동 (pages={self.max_pages})")
+                return True
+            except Exception as e:
+                self._failed = str(e)
+                print(f"[PDF] playwright 기동 실패: {str(e)[:120]}")
+                return False
+
+    async def _acquire_page(self):
+        assert self._pages is not None
+        if self._pages.empty() and self._created < self.max_pages:
+            self._created += 1
+            try:
+                return await self._context.new_page()
+            except Exception:
+                self._created -= 1
+                raise
+        return await self._pages.get()
+
+    async def _arender(self, file_url: str, pdf_path: str) -> None:
+        page = await self._acquire_page()
+        try:
+            await page.goto(file_url, wait_until="load")
+            await page.emulate_media(media="print")
+            await page.pdf(path=pdf_path, **PDF_OPTIONS)
+        except Exception:
+            # 오류 난 페이지는 버리고 다음 요청 때 새로 만든다
+            self._created -= 1
+            try:
+                await page.close()
+            except Exception:
+                pass
+            raise
+        self._pages.put_nowait(page)
+
+    def render(self, html_path: str, pdf_path: str) -> bool:
+        if not self._ensure_started():
+            return False
+        try:
+            self._run(self._arender(_file_uri(html_path), pdf_path), timeout=180)
+            print(f"[PDF] ✓ playwright: {os.path.basename(pdf_path)}")
+            return True
+        except Exception as e:
+            print(f"[PDF] playwright 실패: {str(e)[:120]}")
+            return False
+
+    async def _aclose(self) -> None:
+        try:
+            if self._browser is not None:
+                await self._browser.close()
+        finally:
+            if self._pw is not None:
+                await self._pw.stop()
+
+    def close(self) -> None:
+        try:
+            if self._started:
+                self._run(self._aclose(), timeout=60)
+        except Exception:
+            pass
+        finally:
+            self._started = False
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+
+    def __enter__(self) -> "PdfRenderer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _html_to_pdf_playwright(html_path: str, pdf_path: str, renderer: Optional[PdfRenderer] = None) -> bool:
     """Playwright(Chromium)으로 HTML → PDF 변환.
 
+    renderer가 주어지면 공유 브라우저를 사용하고, 없으면 1회용 브라우저를 띄운다.
+
     요구 사항:
       - pip install playwright
       - playwright install chromium
     """
+    if renderer is not None:
+        return renderer.render(html_path, pdf_path)
+
     try:
         from playwright.sync_api import sync_playwright  # type: ignore
     except Exception:
@@ -485,12 +822,7 @@ def _html_to_pdf_playwright(html_path: str, pdf_path: str) -> bool:
             page = context.new_page()
             page.goto(file_url, wait_until="load")
             page.emulate_media(media="print")
-            page.pdf(
-                path=pdf_path,
-                format="A4",
-                margin={"top": "18mm", "right": "16mm", "bottom": "20mm", "left": "16mm"},
-                print_background=True,
-            )
+            page.pdf(path=pdf_path, **PDF_OPTIONS)
             browser.close()
         print(f"[PDF] ✓ playwright: {os.path.basename(pdf_path)}")
         return True
@@ -754,17 +1086,151 @@ def _html_to_pdf_reportlab(html_path: str, pdf_path: str) -> bool:
         return False
 
 
+# ===== 출력 폴더 일괄 변환 (증분) =====
+class ConversionManifest:
+    """HTML 내용 해시 기준 변환 이력 (outputs/.conversion_manifest.json).
+
+    {target 경로(out_dir 기준 상대): 변환 당시 HTML sha256} 를 기록해, HTML이
+    바뀌지 않았고 결과 파일이 남아 있으면 다시 렌더링하지 않는다.
+    """
+
+    FILENAME = ".conversion_manifest.json"
+
+    def __init__(self, out_dir: str):
+        self.out_dir = os.path.abspath(out_dir)
+        self.path = os.path.join(self.out_dir, self.FILENAME)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except Exception:
+            self._entries = {}
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _key(self, target: str) -> str:
+        return os.path.relpath(os.path.abspath(target), self.out_dir).replace("\\", "/")
+
+    def is_fresh(self, html_path: str, target: str, html_hash: Optional[str] = None) -> bool:
+        if not os.path.isfile(target):
+            return False
+        with self._lock:
+            recorded = self._entries.get(self._key(target))
+        if recorded is None:
+            # 이력 없는 기존 결과물: mtime이 HTML보다 새로우면 최신으로 간주
+            return os.path.getmtime(target) >= os.path.getmtime(html_path)
+        return recorded == (html_hash or self.file_hash(html_path))
+
+    def mark(self, html_path: str, target: str, html_hash: Optional[str] = None) -> None:
+        digest = html_hash or self.file_hash(html_path)
+        with self._lock:
+            self._entries[self._key(target)] = digest
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=0, sort_keys=True)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[Convert] manifest 저장 실패: {e}")
+
+
+_MANIFESTS: Dict[str, ConversionManifest] = {}
+_MANIFESTS_LOCK = threading.Lock()
+
+
+def _conversion_manifest(out_dir: str) -> ConversionManifest:
+    key = os.path.abspath(out_dir)
+    with _MANIFESTS_LOCK:
+        manifest = _MANIFESTS.get(key)
+        if manifest is None:
+            manifest = ConversionManifest(key)
+            _MANIFESTS[key] = manifest
+        return manifest
+
+
+def convert_outputs_dir(
+    out_dir: Optional[str] = None,
+    renderer: Optional[PdfRenderer] = None,
+    *,
+    images: bool = True,
+    files: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """출력 폴더의 HTML을 PDF(out_dir/<name>.pdf)·PNG(out_dir/png/<name>.png)로 일괄 변환.
+
+    배치(run_report_writer 1회)당 한 번 실행하며, 내용 해시가 같고 결과 파일이
+    있는 HTML은 건너뛴다. files: 이 HTML 경로만 변환 (기본: 폴더 전체).
+    반환: {"pdf": [...], "png": [...], "skipped": int, "failed": [...]}
+    """
+    out_dir = os.path.abspath(out_dir or _outputs_dir())
+    manifest = _conversion_manifest(out_dir)
+    summary: Dict[str, Any] = {"pdf": [], "png": [], "skipped": 0, "failed": []}
+    png_dir = os.path.join(out_dir, "png")
+    only = {os.path.abspath(f) for f in files} if files is not None else None
+
+    # 폴더 바로 아래 HTML만: 하위 폴더는 다른 실행의 작업 폴더 (예: worker의 jobs/<job_id>/)
+    names = sorted(os.listdir(out_dir)) if os.path.isdir(out_dir) else []
+    for name in names:
+        html_path = os.path.join(out_dir, name)
+        if not name.lower().endswith((".html", ".htm")) or not os.path.isfile(html_path):
+            continue
+        if only is not None and html_path not in only:
+            continue
+        stem = os.path.splitext(name)[0]
+        try:
+            digest = manifest.file_hash(html_path)
+        except OSError:
+            continue
+
+        targets = [("pdf", os.path.join(out_dir, stem + ".pdf"))]
+        if images:
+            targets.append(("png", os.path.join(png_dir, stem + ".png")))
+        for kind, target in targets:
+            if manifest.is_fresh(html_path, target, digest):
+                summary["skipped"] += 1
+                continue
+            if kind == "pdf":
+                ok = _html_to_pdf_playwright(html_path, target, renderer)
+            else:
+                os.makedirs(png_dir, exist_ok=True)
+                ok = _html_to_image_imgkit(html_path, target)
+            if ok:
+                manifest.mark(html_path, target, digest)
+                summary[kind].append(target)
+            else:
+                summary["failed"].append(target)
+                if kind == "png":
+                    # 이미지 변환기 미설치: 남은 파일도 실패하므로 이미지 단계 중단
+                    images = False
+
+    print(f"[Convert] PDF {len(summary['pdf'])}개, PNG {len(summary['png'])}개 변환, "
+          f"{summary['skipped']}개 최신 상태 건너뜀, 실패 {len(summary['failed'])}개")
+    return summary
+
+
 # ===== LangGraph 노드 =====
 class ReportState(TypedDict):
     supervisor_results: Optional[Dict[str, Any]]
     summary: Optional[Dict[str, Any]]
     images: Optional[Dict[str, Any]]
     target_company: Optional[str]
+    prompt_prefix: Optional[str]
     user_prompt: Optional[str]
+    prompt_tokens: Optional[int]
     llm_text: Optional[str]
     html_path: Optional[str]
     pdf_path: Optional[str]
     error: Optional[str]
+    pdf_renderer: Optional[Any]
 
 
 def validate_inputs(state: ReportState) -> ReportState:
@@ -812,8 +1278,12 @@ def compose_prompt_node(state: ReportState) -> ReportState:
         new["error"] = "Missing data"
         return new
     
-    new["user_prompt"] = _compose_user_prompt(summary, images, target_company)
-    print(f"[Prompt] {target_company} ({len(new['user_prompt'])} chars)")
+    prefix, suffix = _compose_prompt_parts(summary, images, target_company)
+    new["prompt_prefix"] = prefix
+    new["user_prompt"] = suffix
+    shared_tokens = _estimate_tokens(PROMPT_SYSTEM) + _estimate_tokens(prefix)
+    new["prompt_tokens"] = shared_tokens + _estimate_tokens(suffix)
+    print(f"[Prompt] {target_company} (~{new['prompt_tokens']} tokens, 공통 prefix ~{shared_tokens})")
     return new
 
 
@@ -827,11 +1297,21 @@ def call_llm_node(state: ReportState) -> ReportState:
     
     try:
         model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        llm = ChatOpenAI(model=model_name, temperature=0.3, max_tokens=4000)
+        llm = ChatOpenAI(model=model_name, temperature=0.3, max_tokens=4000, stream_usage=True)
         
         print(f"[LLM] 호출 중...")
-        response = llm.invoke(f"{PROMPT_SYSTEM}\n\n{user_prompt}")
-        text = getattr(response, "content", "") or str(response)
+        # system + 공통 prefix가 모든 회사에 동일 → provider 프롬프트 캐시로 재사용
+        prefix = state.get("prompt_prefix") or ""
+        messages = _report_messages(prefix, user_prompt)
+        cache_key = prompt_cache_key(PROMPT_SYSTEM + prefix)
+        if REPORT_STREAMING:
+            text = _stream_report(llm, messages, state, cache_key)
+        else:
+            with prompt_cache_warmup(cache_key):
+                with provider_slot("openai"):
+                    response = llm.invoke(messages, extra_body={"prompt_cache_key": cache_key})
+            record_usage("openai", getattr(response, "usage_metadata", None))
+            text = getattr(response, "content", "") or str(response)
         
         if not text:
             new["error"] = "Empty LLM response"
@@ -847,25 +1327,110 @@ def call_llm_node(state: ReportState) -> ReportState:
     return new
 
 
+# 스트리밍 모드: 응답을 받는 대로 HTML로 변환하고 섹션이 끝날 때마다
+# <html_path>.part 에 중간 결과를 기록 (최종 HTML은 render_html_node가 작성)
+REPORT_STREAMING = os.getenv("REPORT_STREAMING", "1") != "0"
+# 응답 앞부분 N자 안에 #/## 제목이 없으면 형식 오류로 보고 조기 중단
+REPORT_HEADING_WITHIN_CHARS = int(os.getenv("REPORT_HEADING_WITHIN_CHARS", "1500"))
+
+
+class MalformedReportError(RuntimeError):
+    """스트리밍 중 보고서 형식이 아니라고 판단되어 생성을 중단함."""
+
+
+def _report_path(state: ReportState, ext: str) -> str:
+    run_id = (state.get("summary") or {}).get("run_id", "manual")
+    target_company = state.get("target_company") or "manual"
+    safe_company = target_company.replace(" ", "_").replace("/", "_")
+    return os.path.join(_outputs_dir(), f"report_{run_id}_{safe_company}.{ext}")
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _report_messages(prefix: str, suffix: str) -> List[Dict[str, str]]:
+    """system 규칙 → 공통 prefix → 회사별 suffix 순서 (앞 두 메시지가 캐시되는 prefix)"""
+    messages = [{"role": "system", "content": PROMPT_SYSTEM}]
+    if prefix:
+        messages.append({"role": "user", "content": prefix})
+    messages.append({"role": "user", "content": suffix})
+    return messages
+
+
+def _stream_report(llm, messages: List[Dict[str, str]], state: ReportState, cache_key: str) -> str:
+    """LLM 응답을 스트리밍으로 받아 전체 텍스트를 반환.
+
+    섹션(#/##)이 완료될 때마다 부분 HTML을 <report>.html.part 로 기록하고,
+    앞부분에 제목이 없으면 MalformedReportError로 조기 중단한다.
+    같은 cache_key의 첫 요청이 첫 토큰을 받을 때까지(= provider가 prefix를
+    캐시할 때까지) 나머지 요청은 대기한 뒤 캐시된 prefix로 시작한다.
+    """
+    renderer = IncrementalHtmlRenderer(state.get("images") or {})
+    part_path = _report_path(state, "html.part")
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    company = state.get("target_company", "")
+    chunks: List[str] = []
+    received = 0
+    flushed = 0
+    started = time.perf_counter()
+    usage = None
+
+    try:
+        with prompt_cache_warmup(cache_key) as warmed, provider_slot("openai"):
+            for chunk in llm.stream(messages, extra_body={"prompt_cache_key": cache_key}):
+                warmed()
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                piece = getattr(chunk, "content", "") or ""
+                if not isinstance(piece, str) or not piece:
+                    continue
+                chunks.append(piece)
+                received += len(piece)
+                renderer.feed(piece)
+                if not renderer.headings and received > REPORT_HEADING_WITHIN_CHARS:
+                    # 제너레이터를 빠져나오면 스트림(HTTP 연결)도 닫힌다
+                    raise MalformedReportError(
+                        f"no section heading in first {REPORT_HEADING_WITHIN_CHARS} chars"
+                    )
+                if renderer.sections > flushed:
+                    if not flushed:
+                        print(f"[LLM] {company}: 첫 섹션 {time.perf_counter() - started:.1f}s")
+                    flushed = renderer.sections
+                    _write_atomic(part_path, renderer.document())
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    record_usage("openai", usage)
+    return "".join(chunks)
+
+
 def render_html_node(state: ReportState) -> ReportState:
     new = state.copy()
     text = state.get("llm_text", "")
     images = state.get("images", {})
-    summary = state.get("summary", {})
-    target_company = state.get("target_company", "manual")
     
     if not text:
         new["error"] = "No text to render"
         return new
     
-    run_id = summary.get("run_id", "manual")
-    safe_company = target_company.replace(" ", "_").replace("/", "_")
-    html_path = os.path.join(_outputs_dir(), f"report_{run_id}_{safe_company}.html")
+    html_path = _report_path(state, "html")
     
     try:
         new["html_path"] = _render_html(text, images, html_path)
     except Exception as e:
         new["error"] = str(e)
+    finally:
+        # 스트리밍 중간 결과는 최종 HTML로 대체
+        try:
+            os.remove(html_path + ".part")
+        except OSError:
+            pass
     
     return new
 
@@ -884,9 +1449,10 @@ def convert_html_to_pdf_node(state: ReportState) -> ReportState:
     safe_company = target_company.replace(" ", "_").replace("/", "_")
     pdf_path = os.path.join(_outputs_dir(), f"report_{run_id}_{safe_company}.pdf")
 
-    # HTML → PDF: Playwright(Chromium) 사용
-    if _html_to_pdf_playwright(html_path, pdf_path):
+    # HTML → PDF: Playwright(Chromium) 사용 (run_report_writer의 공유 브라우저)
+    if _html_to_pdf_playwright(html_path, pdf_path, state.get("pdf_renderer")):
         new["pdf_path"] = pdf_path
+        _conversion_manifest(_outputs_dir()).mark(html_path, pdf_path)
         return new
 
     # 최후의 수단(선택): 이미지→PDF 파이프라인
@@ -899,8 +1465,31 @@ def convert_html_to_pdf_node(state: ReportState) -> ReportState:
     return new
 
 
-def compile_report_graph():
-    """LangGraph 그래프"""
+# HTML -> Image(리포트별) 노드
+def convert_html_to_image_node(state: ReportState) -> ReportState:
+    new = state.copy()
+    html_path = state.get("html_path")
+    summary = state.get("summary", {})
+    target_company = state.get("target_company", "manual")
+
+    if not html_path or not os.path.isfile(html_path):
+        return new
+
+    run_id = summary.get("run_id", "manual")
+    safe_company = target_company.replace(" ", "_").replace("/", "_")
+    img_path = os.path.join(_outputs_dir(), f"report_{run_id}_{safe_company}.png")
+
+    if _html_to_image_imgkit(html_path, img_path):
+        new["img_path"] = img_path
+    return new
+
+
+def compile_report_graph(include_conversion: bool = True):
+    """LangGraph 그래프
+
+    include_conversion=False이면 render_html까지만 실행 (PDF/이미지 변환은
+    run_report_writer의 별도 변환 풀에서 수행).
+    """
     from langgraph.graph import StateGraph
     
     graph = StateGraph(ReportState)
@@ -909,144 +1498,126 @@ def compile_report_graph():
     graph.add_node("compose_prompt", compose_prompt_node)
     graph.add_node("call_llm", call_llm_node)
     graph.add_node("render_html", render_html_node)
-    graph.add_node("convert_pdf", convert_html_to_pdf_node)
-
-    # HTML -> Image(리포트별) 노드
-    def convert_html_to_image_node(state: ReportState) -> ReportState:
-        new = state.copy()
-        html_path = state.get("html_path")
-        summary = state.get("summary", {})
-        target_company = state.get("target_company", "manual")
 
-        if not html_path or not os.path.isfile(html_path):
-            return new
-
-        run_id = summary.get("run_id", "manual")
-        safe_company = target_company.replace(" ", "_").replace("/", "_")
-        img_path = os.path.join(_outputs_dir(), f"report_{run_id}_{safe_company}.png")
-
-        if _html_to_image_imgkit(html_path, img_path):
-            new["img_path"] = img_path
-        return new
-
-    # 추가: 출력 폴더 내 HTML 일괄 PDF 변환 노드
-    def convert_outputs_dir_node(state: ReportState) -> ReportState:
-        try:
-            out_dir = _outputs_dir()
-            # 일괄: HTML → PDF (Playwright)
-            for root, _, files in os.walk(out_dir):
-                for name in sorted(files):
-                    if not name.lower().endswith(('.html', '.htm')):
-                        continue
-                    html_path = os.path.join(root, name)
-                    pdf_path = os.path.join(out_dir, os.path.splitext(name)[0] + '.pdf')
-                    if not _html_to_pdf_playwright(html_path, pdf_path):
-                        print("[PDF] 배치 변환 실패: playwright/chromium 확인 필요")
-        except Exception as e:
-            print(f"[PDF] batch convert 실패: {e}")
-        return state
-
-    graph.add_node("convert_outputs_dir", convert_outputs_dir_node)
-    graph.add_node("convert_html_to_image", convert_html_to_image_node)
-
-    # 추가: 출력 폴더 내 HTML -> 이미지 일괄 변환
-    def convert_outputs_dir_images_node(state: ReportState) -> ReportState:
-        try:
-            # 의존성 미설치 상황에서도 파이프라인 지속
-            from evagent.tools.convert_html_dir_to_image import convert_html_dir_to_image  # type: ignore
-        except Exception:
-            print("[IMG] batch converter unavailable (imgkit/wkhtmltoimage 미설치 가능)")
-            return state
-
-        try:
-            out_dir = _outputs_dir()
-            convert_html_dir_to_image(
-                input_dir=out_dir,
-                output_dir=None,
-                overwrite=True,
-                format="png",
-            )
-        except Exception as e:
-            print(f"[IMG] batch convert 실패: {e}")
-        return state
-
-    graph.add_node("convert_outputs_dir_images", convert_outputs_dir_images_node)
-    
     graph.set_entry_point("validate")
     graph.add_edge("validate", "collect_images")
     graph.add_edge("collect_images", "compose_prompt")
     graph.add_edge("compose_prompt", "call_llm")
     graph.add_edge("call_llm", "render_html")
-    graph.add_edge("render_html", "convert_pdf")
-    graph.add_edge("convert_pdf", "convert_html_to_image")
-    graph.add_edge("convert_html_to_image", "convert_outputs_dir")
-    graph.add_edge("convert_outputs_dir", "convert_outputs_dir_images")
+    if include_conversion:
+        graph.add_node("convert_pdf", convert_html_to_pdf_node)
+        graph.add_node("convert_html_to_image", convert_html_to_image_node)
+        graph.add_edge("render_html", "convert_pdf")
+        graph.add_edge("convert_pdf", "convert_html_to_image")
     
     return graph.compile()
 
 
-def run_report_writer(supervisor_results: Dict[str, Any]) -> Dict[str, Any]:
-    """모든 OEM별 보고서 생성"""
+def run_report_writer(
+    supervisor_results: Dict[str, Any],
+    max_concurrency: Optional[int] = None,
+    companies: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """OEM별 보고서 생성
+
+    max_concurrency: 동시에 생성할 보고서 수 (기본 REPORT_MAX_CONCURRENCY 또는 4).
+    OpenAI 호출 수는 전역 provider 한도(EVAGENT_MAX_OPENAI)로도 제한된다.
+    companies: 보고서를 생성할 OEM (기본: config의 전체 OEM). API 작업 큐처럼 요청 회사만 생성할 때 사용.
+        지정하면 출력 폴더 일괄 변환도 이번에 생성한 HTML로 한정한다 (작업자 간 같은 폴더 공유).
+    """
     
     # OEM 목록
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                               "config", "allowed_companies.json")
-    all_oems = []
-    if os.path.isfile(config_path):
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            all_oems = [c["name"] for c in data.get("companies", []) if c.get("category") == "OEM"]
-        except Exception:
-            pass
+    all_oems = list(companies) if companies else _oem_names()
     
     if not all_oems:
         return {"error": "No OEM list"}
     
-    compiled = compile_report_graph()
-    results = []
+    gen_graph = compile_report_graph(include_conversion=False)
+    workers = max(1, max_concurrency or int(os.getenv("REPORT_MAX_CONCURRENCY", "4")))
+    total = len(all_oems)
+    by_company: Dict[str, Dict[str, Any]] = {}
+    lock = threading.Lock()
     
     print(f"\n{'='*60}")
-    print(f"총 {len(all_oems)}개 OEM 보고서 생성")
+    print(f"총 {total}개 OEM 보고서 생성 (동시 생성 {workers}개)")
     print(f"{'='*60}\n")
     
-    for idx, company in enumerate(all_oems, 1):
-        print(f"\n[{idx}/{len(all_oems)}] {company}")
-        
+    def _finish(company: str, result: Dict[str, Any]) -> None:
+        with lock:
+            by_company[company] = result
+            done = len(by_company)
+        if result.get("error"):
+            print(f"[{done}/{total}] ✗ {company}: {result['error']}")
+        else:
+            print(f"[{done}/{total}] ✓ {company}")
+    
+    def _result(company: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "company": company,
+            "html_path": state.get("html_path"),
+            "pdf_path": state.get("pdf_path"),
+            "error": state.get("error"),
+            "prompt_tokens": state.get("prompt_tokens"),
+        }
+    
+    def _generate(company: str) -> ReportState:
         init_state: ReportState = {
             "supervisor_results": supervisor_results,
             "summary": None,
             "images": None,
             "target_company": company,
+            "prompt_prefix": None,
             "user_prompt": None,
+            "prompt_tokens": None,
             "llm_text": None,
             "html_path": None,
             "pdf_path": None,
             "error": None,
+            "pdf_renderer": renderer,
         }
-        
-        try:
-            final_state = compiled.invoke(init_state)
-            
-            result = {
-                "company": company,
-                "html_path": final_state.get("html_path"),
-                "pdf_path": final_state.get("pdf_path"),
-                "error": final_state.get("error"),
-            }
-            results.append(result)
+        return gen_graph.invoke(init_state)
+    
+    # 1단계(LLM 생성 + HTML)는 동시 workers개, 2단계(PDF)는 별도 풀에서
+    # 생성이 끝난 보고서부터 바로 변환 → 전체 시간이 회사별 합이 아닌 최댓값에 수렴.
+    # PNG는 보고서별로 만들지 않고 마지막 일괄 변환(png/<name>.png)에서 한 번만 렌더링
+    usage_before = prompt_cache_metrics().get("openai", {})
+    renderer = PdfRenderer()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-llm") as gen_pool, \
+                ThreadPoolExecutor(max_workers=renderer.max_pages, thread_name_prefix="report-pdf") as pdf_pool:
+            gen_futures = {gen_pool.submit(_generate, c): c for c in all_oems}
+            pdf_futures = {}
+            for fut in as_completed(gen_futures):
+                company = gen_futures[fut]
+                try:
+                    state = fut.result()
+                except Exception as e:
+                    _finish(company, {"company": company, "html_path": None, "pdf_path": None, "error": str(e)})
+                    continue
+                if not state.get("html_path"):
+                    _finish(company, _result(company, state))
+                    continue
+                print(f"  → {company}: HTML 완료, PDF 변환 대기")
+                pdf_futures[pdf_pool.submit(convert_html_to_pdf_node, state)] = (company, state)
             
-            if result.get("error"):
-                print(f"  ✗ 실패: {result['error']}")
+            for fut in as_completed(pdf_futures):
+                company, state = pdf_futures[fut]
+                try:
+                    _finish(company, _result(company, fut.result()))
+                except Exception as e:
+                    # HTML는 이미 생성됨: 변환 실패만 기록
+                    _finish(company, {**_result(company, state), "error": f"PDF conversion failed: {e}"})
         
+        # 출력 폴더 일괄 변환: 배치당 1회, 변경된 HTML만
+        scope = [r["html_path"] for r in by_company.values() if r.get("html_path")] if companies else None
+        try:
+            convert_outputs_dir(_outputs_dir(), renderer, files=scope)
         except Exception as e:
-            print(f"  ✗ 예외: {e}")
-            results.append({
-                "company": company,
-                "html_path": None,
-                "pdf_path": None,
-                "error": str(e),
-            })
+            print(f"[Convert] 일괄 변환 실패: {e}")
+    finally:
+        renderer.close()
+    
+    results = [by_company[c] for c in all_oems]
     
     # 최종 요약
     print("\n" + "="*60)
@@ -1058,6 +1629,21 @@ def run_report_writer(supervisor_results: Dict[str, Any]) -> Dict[str, Any]:
     
     print(f"성공: {success}개 / 실패: {failed}개")
     
+    prompt_tokens = {r["company"]: r["prompt_tokens"] for r in results if r.get("prompt_tokens")}
+    if prompt_tokens:
+        print(f"프롬프트 입력 토큰(근사): 합계 {sum(prompt_tokens.values())}, "
+              f"평균 {sum(prompt_tokens.values()) // len(prompt_tokens)}")
+    
+    # 이번 배치의 provider 프롬프트 캐시 적중 (응답 usage 기준)
+    usage_after = prompt_cache_metrics().get("openai", {})
+    prompt_cache = {
+        k: usage_after.get(k, 0) - usage_before.get(k, 0)
+        for k in ("requests", "cache_hits", "prompt_tokens", "cached_tokens")
+    }
+    if prompt_cache["requests"]:
+        print(f"프롬프트 캐시: 적중 {prompt_cache['cache_hits']}/{prompt_cache['requests']}회, "
+              f"캐시 토큰 {prompt_cache['cached_tokens']}/{prompt_cache['prompt_tokens']}")
+    
     if success > 0:
         print("\n생성된 보고서:")
         for r in results:
@@ -1070,6 +1656,8 @@ def run_report_writer(supervisor_results: Dict[str, Any]) -> Dict[str, Any]:
         "total": len(results),
         "success": success,
         "failed": failed,
+        "prompt_tokens": prompt_tokens,
+        "prompt_cache": prompt_cache,
         "results": results
     }
 
@@ -4,7 +4,8 @@ from __future__ import annotations
 
 import os
 import json
-from datetime import datetime, timezone
+import time
+from concurrent.futures import as_completed
 from typing import Dict, Any, Optional, List
 
 try:
@@ -29,6 +30,19 @@ except Exception:
             return fn
         return deco
 
+try:
+    from .chart_render import chart_spec, render_charts
+    from .concurrency import ThreadPoolExecutor, provider_slot
+    from .market_analytics import compute_market_analytics
+    from .price_store import get_price_store
+    from .result_cache import get_result_cache
+except ImportError:
+    from chart_render import chart_spec, render_charts
+    from concurrency import ThreadPoolExecutor, provider_slot
+    from market_analytics import compute_market_analytics
+    from price_store import get_price_store
+    from result_cache import get_result_cache
+
 
 # -------------------------
 # Utilities
@@ -36,13 +50,13 @@ except Exception:
 
 def _outputs_dir() -> str:
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    out_dir = os.path.normpath(os.path.join(base_dir, "..", "outputs"))
+    out_dir = os.getenv("EVAGENT_OUTPUTS_DIR") or os.path.normpath(os.path.join(base_dir, "..", "outputs"))
     return os.path.abspath(out_dir)
 
 
 def _config_dir() -> str:
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    cfg_dir = os.path.normpath(os.path.join(base_dir, "..", "config"))
+    cfg_dir = os.getenv("EVAGENT_CONFIG_DIR") or os.path.normpath(os.path.join(base_dir, "..", "config"))
     return os.path.abspath(cfg_dir)
 
 
@@ -67,6 +81,42 @@ def _fmt_currency(v: Optional[float]) -> str:
     except Exception:
         return "-"
 
+def _build_record(
+    ticker: str,
+    hist,
+    last_price: Optional[float] = None,
+    prev_close: Optional[float] = None,
+    market_cap: Optional[float] = None,
+    pe: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Per-ticker dict (see fetch_stock_data) from a history frame and quote fields."""
+    if hist is None or hist.empty or "Close" not in hist:
+        return None
+    close = hist["Close"].dropna()
+    if close.empty:
+        return None
+
+    current = last_price or close.iloc[-1]
+
+    # Calculate 90-day change
+    if len(close) >= 2:
+        start_price = close.iloc[0]
+        end_price = close.iloc[-1]
+        change_pct = ((end_price - start_price) / start_price) * 100
+    else:
+        change_pct = 0.0
+
+    return {
+        "ticker": ticker,
+        "current": float(current),
+        "prev_close": float(prev_close) if prev_close else None,
+        "market_cap": float(market_cap) if market_cap else None,
+        "pe": float(pe) if pe else None,
+        "history": hist,
+        "change_90d_pct": float(change_pct)
+    }
+
+
 def fetch_stock_data(ticker: str, period: str = "3mo") -> Optional[Dict[str, Any]]:
     """Fetch 90-day price data and basic info for a ticker.
     
@@ -82,142 +132,227 @@ def fetch_stock_data(ticker: str, period: str = "3mo") -> Optional[Dict[str, Any
             "change_90d_pct": float
         }
     """
-    if yf is None:
-        return None
-    
+    return fetch_market_data([ticker], period).get(ticker)
+
+
+# -------------------------
+# Batched market data fetch
+# -------------------------
+# "bulk": one yf.download per missing date range for all tickers (default)
+# "per_ticker": one Ticker.history per ticker
+STOCK_FETCH_MODE = os.getenv("STOCK_FETCH_MODE", "bulk")
+# Threads for per-ticker quote / P/E / history calls (in-flight calls are
+# still capped by the yfinance provider slot)
+STOCK_FETCH_WORKERS = int(os.getenv("STOCK_FETCH_WORKERS", "8"))
+
+
+def _download_histories(tickers: List[str], **window: Any) -> Dict[str, Any]:
+    """One bulk download for all tickers -> {ticker: OHLCV frame}; {} if unavailable.
+
+    ``window`` is period=... or start=/end=... as accepted by yf.download.
+    """
+    if not hasattr(yf, "download"):
+        return _ticker_histories(tickers, **window)
     try:
-        tk = yf.Ticker(ticker)
-        hist = tk.history(period=period, interval="1d")
-        
-        if hist is None or hist.empty:
+        with provider_slot("yfinance"):
+            df = yf.download(
+                tickers, interval="1d", group_by="ticker",
+                auto_adjust=True, threads=True, progress=False, **window,
+            )
+    except Exception as e:
+        print(f"Bulk download failed ({e}); fetching per ticker")
+        return _ticker_histories(tickers, **window)
+    if df is None or df.empty:
+        return {}
+
+    out: Dict[str, Any] = {}
+    multi = getattr(df.columns, "nlevels", 1) > 1
+    for ticker in tickers:
+        if multi:
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            frame = df[ticker]
+        elif len(tickers) == 1:
+            frame = df
+        else:
+            continue
+        # The shared index is the union of all exchanges' trading days
+        frame = frame.dropna(how="all")
+        if not frame.empty:
+            out[ticker] = frame
+    return out
+
+
+def _ticker_histories(tickers: List[str], **window: Any) -> Dict[str, Any]:
+    """Per-ticker Ticker.history on the fetch pool -> {ticker: OHLCV frame}."""
+    def _one(ticker: str):
+        try:
+            with provider_slot("yfinance"):
+                return yf.Ticker(ticker).history(interval="1d", **window)
+        except Exception as e:
+            print(f"Error fetching {ticker}: {e}")
             return None
-        
-        close = hist["Close"].dropna()
-        if close.empty:
+
+    workers = max(1, min(STOCK_FETCH_WORKERS, len(tickers)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stock-history") as pool:
+        frames = dict(zip(tickers, pool.map(_one, tickers)))
+    return {t: f for t, f in frames.items() if f is not None and not f.empty}
+
+
+def _trailing_pe(tk, ticker: str, offline: bool = False) -> Optional[float]:
+    """P/E from the slow ``info`` lookup, cached per ticker (EVAGENT_CACHE_TTL)."""
+    cache = get_result_cache()
+    if offline:
+        return (cache.get("stock.pe", {"ticker": ticker}) or {}).get("pe")
+
+    def _lookup() -> Optional[Dict[str, Any]]:
+        try:
+            with provider_slot("yfinance"):
+                full_info = tk.info
+        except Exception:
             return None
-        
+        pe = full_info.get("trailingPE") or full_info.get("forwardPE")
+        return {"pe": float(pe) if pe else None}
+
+    hit = cache.cached("stock.pe", {"ticker": ticker}, _lookup, cacheable=lambda r: r is not None)
+    return (hit or {}).get("pe")
+
+
+def _fetch_ticker(ticker: str, hist, offline: bool = False) -> Optional[Dict[str, Any]]:
+    if hist is None or hist.empty:
+        return None
+    if offline:
+        # No quote lookups: last two stored closes stand in for price / previous close
+        close = hist["Close"].dropna()
+        prev_close = close.iloc[-2] if len(close) >= 2 else None
+        return _build_record(ticker, hist, None, prev_close, None, _trailing_pe(None, ticker, offline=True))
+    try:
+        tk = yf.Ticker(ticker)
+
         # Basic info
-        info = getattr(tk, "fast_info", {})
-        current = getattr(info, "last_price", None) or close.iloc[-1]
-        prev_close = getattr(info, "previous_close", None)
-        market_cap = getattr(info, "market_cap", None)
-        
-        # Try to get P/E from info dict
-        pe = None
         try:
-            full_info = tk.info
-            pe = full_info.get("trailingPE") or full_info.get("forwardPE")
+            with provider_slot("yfinance"):
+                info = tk.fast_info
+                last_price = getattr(info, "last_price", None)
+                prev_close = getattr(info, "previous_close", None)
+                market_cap = getattr(info, "market_cap", None)
         except Exception:
-            pass
-        
-        # Calculate 90-day change
-        if len(close) >= 2:
-            start_price = close.iloc[0]
-            end_price = close.iloc[-1]
-            change_pct = ((end_price - start_price) / start_price) * 100
-        else:
-            change_pct = 0.0
-        
-        return {
-            "ticker": ticker,
-            "current": float(current),
-            "prev_close": float(prev_close) if prev_close else None,
-            "market_cap": float(market_cap) if market_cap else None,
-            "pe": float(pe) if pe else None,
-            "history": hist,
-            "change_90d_pct": float(change_pct)
-        }
+            last_price = prev_close = market_cap = None
+
+        return _build_record(ticker, hist, last_price, prev_close, market_cap, _trailing_pe(tk, ticker))
     except Exception as e:
         print(f"Error fetching {ticker}: {e}")
         return None
 
+
+def fetch_market_data(tickers: List[str], period: str = "3mo") -> Dict[str, Dict[str, Any]]:
+    """Fetch many tickers at once -> {ticker: fetch_stock_data-shaped dict}.
+
+    Histories come from the local price store (agents/price_store.py), which
+    downloads only missing ranges (bulk, one call per range); quotes and P/E
+    (cached) are fetched on a bounded thread pool. Tickers that fail are left out.
+    With EVAGENT_PRICE_OFFLINE=1 everything is served from local data.
+    """
+    store = get_price_store()
+    if (yf is None and not store.offline) or not tickers:
+        return {}
+    tickers = list(dict.fromkeys(tickers))
+    fetch = _download_histories if STOCK_FETCH_MODE == "bulk" else _ticker_histories
+    histories = store.histories(tickers, period, fetch=None if yf is None else fetch)
+
+    out: Dict[str, Dict[str, Any]] = {}
+    workers = max(1, min(STOCK_FETCH_WORKERS, len(tickers)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stock-fetch") as pool:
+        futures = {pool.submit(_fetch_ticker, t, histories.get(t), store.offline): t for t in tickers}
+        for fut in as_completed(futures):
+            data = fut.result()
+            if data:
+                out[futures[fut]] = data
+    return out
+
+def _fetch_for_run(
+    tickers: List[str], fetched: Optional[Dict[tuple, Dict[str, Any]]], period: str = "3mo"
+) -> Dict[str, Dict[str, Any]]:
+    """Fetch ``tickers``, reusing and adding to ``fetched`` (one supervisor run's successful fetches)."""
+    out: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for ticker in tickers:
+        key = (ticker, period)
+        if fetched is not None and key in fetched:
+            out[ticker] = dict(fetched[key])
+        else:
+            missing.append(ticker)
+    for ticker, data in fetch_market_data(missing, period).items():
+        if fetched is not None:
+            fetched[(ticker, period)] = dict(data)
+        out[ticker] = data
+    return out
+
+
+def _individual_spec(data: Dict[str, Any], company_name: str, out_dir: str) -> Dict[str, Any]:
+    ticker = data["ticker"]
+    close = data["history"]["Close"].dropna()
+    return chart_spec(
+        "individual", ticker, f"{company_name} ({ticker}) - Last 90 Days",
+        [{"label": company_name, "x": mdates.date2num(close.index), "y": close.values}],
+        out_dir,
+    )
+
+
+def _merged_spec(data_list: List[Dict[str, Any]], category: str, out_dir: str) -> Dict[str, Any]:
+    series = []
+    for data in data_list:
+        close = data["history"]["Close"].dropna()
+        # Normalize to starting price = 100
+        normalized = (close / close.iloc[0]) * 100
+        series.append({"label": data["company_name"], "x": mdates.date2num(normalized.index), "y": normalized.values})
+    return chart_spec("merged", category, f"{category} Suppliers - Normalized Price (Base=100)", series, out_dir)
+
+
 def create_individual_chart(data: Dict[str, Any], company_name: str, out_dir: str) -> str:
     """Create individual stock chart for OEM companies."""
     if plt is None:
         return "matplotlib_not_available"
-    
-    ticker = data["ticker"]
-    hist = data["history"]
-    close = hist["Close"].dropna()
-    
-    ts = datetime.now(timezone.utc).astimezone().strftime("%Y%m%d_%H%M%S")
-    png_path = os.path.join(out_dir, f"stock_OEM_{ticker}_{ts}.png")
-    
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(close.index, close.values, label=company_name, color="#1f77b4", linewidth=2)
-    ax.set_title(f"{company_name} ({ticker}) - Last 90 Days", fontsize=14, fontweight="bold")
-    ax.set_xlabel("Date", fontsize=11)
-    ax.set_ylabel("Price (USD)", fontsize=11)
-    ax.grid(True, alpha=0.3)
-    ax.legend(fontsize=10)
-    
-    # Format x-axis dates
-    if mdates:
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
-        fig.autofmt_xdate()
-    
-    fig.tight_layout()
-    fig.savefig(png_path, dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    
-    return png_path
+    return render_charts([_individual_spec(data, company_name, out_dir)], workers=1)[0]
 
 
 def create_merged_chart(data_list: List[Dict[str, Any]], category: str, out_dir: str) -> str:
     """Create merged chart for Battery or HVAC suppliers."""
     if plt is None:
         return "matplotlib_not_available"
-    
-    ts = datetime.now(timezone.utc).astimezone().strftime("%Y%m%d_%H%M%S")
-    png_path = os.path.join(out_dir, f"stock_{category}_merged_{ts}.png")
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    
-    colors = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b"]
-    
-    for idx, data in enumerate(data_list):
-        hist = data["history"]
-        close = hist["Close"].dropna()
-        
-        # Normalize to starting price = 100
-        normalized = (close / close.iloc[0]) * 100
-        
-        color = colors[idx % len(colors)]
-        ax.plot(normalized.index, normalized.values, 
-               label=data["company_name"], color=color, linewidth=2, alpha=0.8)
-    
-    ax.set_title(f"{category} Suppliers - Normalized Price (Base=100)", 
-                fontsize=14, fontweight="bold")
-    ax.set_xlabel("Date", fontsize=11)
-    ax.set_ylabel("Normalized Price", fontsize=11)
-    ax.axhline(y=100, color="gray", linestyle="--", alpha=0.5, linewidth=1)
-    ax.grid(True, alpha=0.3)
-    ax.legend(fontsize=9, loc="best")
-    
-    # Format x-axis dates
-    if mdates:
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
-        fig.autofmt_xdate()
-    
-    fig.tight_layout()
-    fig.savefig(png_path, dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    
-    return png_path
+    return render_charts([_merged_spec(data_list, category, out_dir)], workers=1)[0]
+
 
 def analyze_market_trend(oem_data: List[Dict[str, Any]], 
                         supplier_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze overall market trends based on 90-day price changes.
-    
+    """Analyze overall market trends from the aligned price histories of all tickers.
+
+    Risk metrics are computed in one vectorized pass (agents/market_analytics.py)
+    and added to each record: return_5d_pct, return_20d_pct, volatility_pct,
+    volatility_20d_pct, max_drawdown_pct, current_drawdown_pct.
+
     Returns:
         {
             "oem_trend": 1 or 0,
             "supplier_trend": 1 or 0,
-            "correlation_score": 1.0, 0.5, or 0.0,
+            "correlation_score": float in [-1, 1] (OEM vs supplier index daily returns),
             "oem_avg_change_pct": float,
-            "supplier_avg_change_pct": float
+            "supplier_avg_change_pct": float,
+            "oem_supplier_pairwise_corr": float,
+            "group_correlation": {group: {group: corr}},
+            "groups": {group: {tickers, avg_return_period_pct, avg_volatility_pct, worst_max_drawdown_pct}},
+            "observations": int
         }
     """
+    records = oem_data + supplier_data
+    analytics = compute_market_analytics(
+        {d["ticker"]: d.get("history") for d in records},
+        {d["ticker"]: d.get("category", "OEM") for d in records},
+    )
+    for d in records:
+        metrics = analytics["per_ticker"].get(d["ticker"], {})
+        d.update({k: v for k, v in metrics.items() if k != "return_period_pct"})
+
     # Calculate average changes
     oem_changes = [d["change_90d_pct"] for d in oem_data if d.get("change_90d_pct") is not None]
     supplier_changes = [d["change_90d_pct"] for d in supplier_data if d.get("change_90d_pct") is not None]
@@ -229,20 +364,18 @@ def analyze_market_trend(oem_data: List[Dict[str, Any]],
     oem_trend = 1 if oem_avg > 0 else 0
     supplier_trend = 1 if supplier_avg > 0 else 0
     
-    # Correlation score
-    if oem_trend == 1 and supplier_trend == 1:
-        correlation = 1.0  # Both up
-    elif oem_trend == 0 and supplier_trend == 0:
-        correlation = 0.0  # Both down
-    else:
-        correlation = 0.5  # One up, one down
+    correlation = analytics["oem_supplier_correlation"]
     
     return {
         "oem_trend": oem_trend,
         "supplier_trend": supplier_trend,
-        "correlation_score": correlation,
+        "correlation_score": correlation if correlation is not None else 0.0,
         "oem_avg_change_pct": round(oem_avg, 2),
-        "supplier_avg_change_pct": round(supplier_avg, 2)
+        "supplier_avg_change_pct": round(supplier_avg, 2),
+        "oem_supplier_pairwise_corr": analytics["oem_supplier_pairwise_mean"],
+        "group_correlation": analytics["group_correlation"],
+        "groups": analytics["groups"],
+        "observations": analytics["observations"],
     }
 
 
@@ -259,7 +392,8 @@ STOCK_EVALUATION_PROMPT = """You are a financial analyst evaluating the electric
 ### Market Trend Indicators
 - OEM Trend: {oem_trend_label} (Avg: {oem_avg_change:.2f}%)
 - Supplier Trend: {supplier_trend_label} (Avg: {supplier_avg_change:.2f}%)
-- Market Correlation Score: {correlation}/1.0
+- OEM vs Supplier Daily Return Correlation: {correlation} (-1 to 1)
+{risk_summary}
 
 ## Your Task
 
@@ -293,11 +427,18 @@ def evaluate_market_with_llm(
     """Evaluate market trends using LLM."""
     
     # Prepare summaries
+    def _risk(d: Dict[str, Any]) -> str:
+        parts = [f"{label}: {d[key]:.1f}%" for key, label in (
+            ("volatility_pct", "Volatility"), ("max_drawdown_pct", "Max Drawdown"),
+        ) if d.get(key) is not None]
+        return (", " + ", ".join(parts)) if parts else ""
+
     oem_summary = "\n".join([
         f"- {d['company_name']} ({d['ticker']}): "
         f"Current ${d['current']:.2f}, "
         f"90d Change: {d['change_90d_pct']:+.2f}%, "
         f"Market Cap: {_fmt_currency(d['market_cap'])}"
+        f"{_risk(d)}"
         for d in oem_data
     ])
     
@@ -305,9 +446,23 @@ def evaluate_market_with_llm(
         f"- {d['company_name']} ({d['ticker']}, {d['category']}): "
         f"Current ${d['current']:.2f}, "
         f"90d Change: {d['change_90d_pct']:+.2f}%"
+        f"{_risk(d)}"
         for d in supplier_data
     ])
     
+    risk_lines = [
+        f"- {name}: avg volatility {g['avg_volatility_pct']}%, worst drawdown {g['worst_max_drawdown_pct']}%"
+        for name, g in (trend_analysis.get("groups") or {}).items()
+    ]
+    if trend_analysis.get("oem_supplier_pairwise_corr") is not None:
+        risk_lines.append(f"- Mean OEM-supplier pairwise correlation: {trend_analysis['oem_supplier_pairwise_corr']}")
+    for name, row in (trend_analysis.get("group_correlation") or {}).items():
+        if name != "OEM":
+            continue
+        risk_lines.append("- OEM index correlation: " + ", ".join(
+            f"{other} {v}" for other, v in row.items() if other != "OEM" and v is not None))
+    risk_summary = "\n".join(risk_lines)
+    
     if llm is None:
         # Fallback: basic rule-based evaluation
         return _basic_market_evaluation(trend_analysis)
@@ -319,7 +474,8 @@ def evaluate_market_with_llm(
         prompt = PromptTemplate(
             input_variables=["oem_summary", "supplier_summary",
                              "oem_trend_label", "supplier_trend_label",
-                             "oem_avg_change", "supplier_avg_change", "correlation"],
+                             "oem_avg_change", "supplier_avg_change", "correlation",
+                             "risk_summary"],
             template=STOCK_EVALUATION_PROMPT
         )
         
@@ -327,15 +483,17 @@ def evaluate_market_with_llm(
         
         oem_trend_label = "Upward ↑" if trend_analysis["oem_trend"] else "Downward ↓"
         supplier_trend_label = "Upward ↑" if trend_analysis["supplier_trend"] else "Downward ↓"
-        result = chain.invoke({
-            "oem_summary": oem_summary,
-            "supplier_summary": supplier_summary,
-            "oem_trend_label": oem_trend_label,
-            "supplier_trend_label": supplier_trend_label,
-            "oem_avg_change": trend_analysis["oem_avg_change_pct"],
-            "supplier_avg_change": trend_analysis["supplier_avg_change_pct"],
-            "correlation": trend_analysis["correlation_score"]
-        })
+        with provider_slot("openai"):
+            result = chain.invoke({
+                "oem_summary": oem_summary,
+                "supplier_summary": supplier_summary,
+                "oem_trend_label": oem_trend_label,
+                "supplier_trend_label": supplier_trend_label,
+                "oem_avg_change": trend_analysis["oem_avg_change_pct"],
+                "supplier_avg_change": trend_analysis["supplier_avg_change_pct"],
+                "correlation": trend_analysis["correlation_score"],
+                "risk_summary": risk_summary,
+            })
         
         # Try to parse JSON
         try:
@@ -377,8 +535,16 @@ def _basic_market_evaluation(trend_analysis: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def run_stock_analysis(llm=None, out_dir: Optional[str] = None) -> Dict[str, Any]:
-    if yf is None or plt is None:
+def run_stock_analysis(
+    llm=None, out_dir: Optional[str] = None, fetched: Optional[Dict[tuple, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Fetch whitelist tickers, chart them and evaluate market trend.
+
+    fetched: successful fetches of the current supervisor run, shared across its
+    attempts; tickers already in it are reused and only the rest are downloaded
+    (the supervisor's incremental retry). It is filled in with this call's fetches.
+    """
+    if (yf is None and not get_price_store().offline) or plt is None:
         raise RuntimeError("yfinance and matplotlib required. pip install yfinance matplotlib")
     
     out_dir = out_dir or _outputs_dir()
@@ -393,53 +559,38 @@ def run_stock_analysis(llm=None, out_dir: Optional[str] = None) -> Dict[str, Any
     
     print(f"Fetching data for {len(oems)} OEMs, {len(battery)} Battery, {len(hvac)} HVAC suppliers...")
     
-    # Fetch OEM data
-    oem_data = []
-    oem_charts = {}
-    for c in oems:
-        ticker = c["ticker"]
-        name = c["name"]
-        print(f"  Fetching {name} ({ticker})...")
-        data = fetch_stock_data(ticker)
-        if data:
-            data["company_name"] = name
-            data["category"] = "OEM"
-            oem_data.append(data)
-            
-            # Create individual chart
-            chart_path = create_individual_chart(data, name, out_dir)
-            oem_charts[ticker] = chart_path
-    
-    # Fetch Battery supplier data
-    battery_data = []
-    for c in battery:
-        ticker = c["ticker"]
-        name = c["name"]
-        print(f"  Fetching {name} ({ticker})...")
-        data = fetch_stock_data(ticker)
-        if data:
-            data["company_name"] = name
-            data["category"] = "Battery"
-            battery_data.append(data)
-    
-    # Fetch HVAC supplier data
-    hvac_data = []
-    for c in hvac:
-        ticker = c["ticker"]
-        name = c["name"]
-        print(f"  Fetching {name} ({ticker})...")
-        data = fetch_stock_data(ticker)
-        if data:
-            data["company_name"] = name
-            data["category"] = "HVAC"
-            hvac_data.append(data)
-    
-    # Create merged supplier charts
-    supplier_charts = {}
-    if battery_data:
-        supplier_charts["Battery"] = create_merged_chart(battery_data, "Battery", out_dir)
-    if hvac_data:
-        supplier_charts["HVAC"] = create_merged_chart(hvac_data, "HVAC", out_dir)
+    # Fetch every whitelist ticker in one batch, then split by category
+    tickers = list(dict.fromkeys(c["ticker"] for c in oems + battery + hvac))
+    started = time.perf_counter()
+    fetched = _fetch_for_run(tickers, fetched)
+    print(f"  Fetched {len(fetched)}/{len(tickers)} tickers in {time.perf_counter() - started:.1f}s")
+
+    def _collect(group: List[Dict[str, Any]], category: str) -> List[Dict[str, Any]]:
+        rows = []
+        for c in group:
+            data = fetched.get(c["ticker"])
+            if data:
+                data = dict(data)
+                data["company_name"] = c["name"]
+                data["category"] = category
+                rows.append(data)
+        return rows
+
+    oem_data = _collect(oems, "OEM")
+    battery_data = _collect(battery, "Battery")
+    hvac_data = _collect(hvac, "HVAC")
+
+    # Individual OEM charts and merged supplier charts, rendered as one batch
+    # (unchanged charts keep their content-addressed file and are skipped)
+    specs = {("OEM", d["ticker"]): _individual_spec(d, d["company_name"], out_dir) for d in oem_data}
+    for category, rows in (("Battery", battery_data), ("HVAC", hvac_data)):
+        if rows:
+            specs[("Supplier", category)] = _merged_spec(rows, category, out_dir)
+    started = time.perf_counter()
+    paths = dict(zip(specs, render_charts(list(specs.values()))))
+    print(f"  Rendered {len(paths)} charts in {time.perf_counter() - started:.1f}s")
+    oem_charts = {key: path for (kind, key), path in paths.items() if kind == "OEM"}
+    supplier_charts = {key: path for (kind, key), path in paths.items() if kind == "Supplier"}
     
     # Combine all supplier data
     supplier_data = battery_data + hvac_data
@@ -5,14 +5,18 @@ from __future__ import annotations
 import os
 import json
 import asyncio
-from typing import Any, Dict, List, Optional, TypedDict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypedDict
 
 # Import sub-agents
 try:
     from .TechSearchAgent import run_tech_agent
     from .ValueChainAgent import run_valuechain_agent
     from .StockAnalyzerAgent import run_stock_analysis
-    from .ESGAgent import run_esg_agent
+    from .ESGAgent import run_esg_agent, OEM_WHITELIST
+    from .concurrency import CancelToken, RunCancelled, use_cancel_token
+    from .http_client import openai_chat as _call_openai
 except ImportError:
     # Fallback for standalone execution
     import sys
@@ -20,7 +24,9 @@ except ImportError:
     from TechSearchAgent import run_tech_agent
     from ValueChainAgent import run_valuechain_agent
     from StockAnalyzerAgent import run_stock_analysis
-    from ESGAgent import run_esg_agent
+    from ESGAgent import run_esg_agent, OEM_WHITELIST
+    from concurrency import CancelToken, RunCancelled, use_cancel_token
+    from http_client import openai_chat as _call_openai
 
 def _load_env_from_dotenv() -> None:
     if os.getenv("OPENAI_API_KEY"):
@@ -45,32 +51,6 @@ def _load_env_from_dotenv() -> None:
 
 _load_env_from_dotenv()
 
-def _call_openai(messages: List[Dict[str, str]], model: str = "gpt-4o-mini", temperature: float = 0.3) -> str:
-    """Call OpenAI Chat API; return assistant message content."""
-    from urllib import request
-    
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return ""
-    url = "https://api.openai.com/v1/chat/completions"
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-    }
-    body = json.dumps(payload).encode("utf-8")
-    req = request.Request(url, data=body, headers={
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-    })
-    try:
-        with request.urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
-    except Exception as e:
-        return f"Error: {e}"
-
-
 VALIDATION_PROMPT = """You are a quality control analyst. Check if the agent output contains all required evaluation metrics.
 
 Agent: {agent_name}
@@ -107,33 +87,129 @@ class SupervisorState(TypedDict):
     error_log: Dict[str, str]  # {agent_name: error_message}
 
 
-async def run_tech_async(company: str, out_dir: str) -> Dict[str, Any]:
+# Max concurrent runs per agent; the global cap is the runtime's worker pool size
+DEFAULT_AGENT_LIMITS: Dict[str, int] = {
+    "tech": 3,
+    "valuechain": 1,
+    "stock": 1,
+    "esg": 1,
+}
+
+
+class SupervisorRuntime:
+    """Supervisor-owned event loop and bounded worker pool.
+
+    One loop runs on a background thread for the whole supervisor run, so graph
+    nodes submit coroutines to it instead of creating a fresh loop per node.
+    Sync agents run on a fixed-size thread pool (global limit) behind per-agent
+    semaphores; external calls inside them are further limited per provider
+    (see concurrency.provider_slot). cancel() stops the run cooperatively; the
+    cancel token is this runtime's own, so other runs in the process keep going.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, agent_limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers or int(os.getenv("SUPERVISOR_MAX_WORKERS", "8"))
+        self.agent_limits = {**DEFAULT_AGENT_LIMITS, **(agent_limits or {})}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="supervisor")
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="supervisor-loop", daemon=True)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Successful stock fetches of this run, so a retry only re-downloads failed tickers
+        self.stock_fetched: Dict[tuple, Dict[str, Any]] = {}
+        self.cancel_token = CancelToken()
+        self._thread.start()
+
+    def run(self, coro) -> Any:
+        """Run a coroutine on the supervisor loop from synchronous code and wait for it."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def _semaphore(self, agent: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(agent)
+        if sem is None:
+            sem = asyncio.Semaphore(self.agent_limits.get(agent, 1))
+            self._semaphores[agent] = sem
+        return sem
+
+    def _run_in_run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Provider calls under fn (and its pools) see this run's cancel token
+        with use_cancel_token(self.cancel_token):
+            return fn(*args)
+
+    async def call(self, agent: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a synchronous agent function under its per-agent limit."""
+        async with self._semaphore(agent):
+            if self.cancel_token.is_cancelled():
+                raise RunCancelled("run cancelled")
+            return await self._loop.run_in_executor(self._executor, self._run_in_run, fn, *args)
+
+    def cancel(self) -> None:
+        """Cancel pending agent tasks; in-flight agents stop at their next provider call."""
+        self.cancel_token.cancel()
+
+        def _cancel_all() -> None:
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(_cancel_all)
+
+    def close(self) -> None:
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if not self._loop.is_running():
+            self._loop.close()
+
+
+async def run_tech_async(company: str, out_dir: str, runtime: SupervisorRuntime) -> Dict[str, Any]:
     """Run TechSearchAgent asynchronously"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, run_tech_agent, company, "OEM", out_dir)
+    return await runtime.call("tech", run_tech_agent, company, "OEM", out_dir)
 
 
-async def run_valuechain_async(out_dir: str) -> Dict[str, Any]:
+async def run_valuechain_async(out_dir: str, runtime: SupervisorRuntime) -> Dict[str, Any]:
     """Run ValueChainAgent asynchronously"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, run_valuechain_agent, None, out_dir, None, None)
+    return await runtime.call("valuechain", run_valuechain_agent, None, out_dir, None, None)
 
 
-async def run_stock_async(out_dir: str) -> Dict[str, Any]:
+async def run_stock_async(out_dir: str, runtime: SupervisorRuntime) -> Dict[str, Any]:
     """Run StockAnalyzerAgent asynchronously"""
-    loop = asyncio.get_event_loop()
     try:
         from langchain_openai import ChatOpenAI
         llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
     except Exception:
         llm = None
-    return await loop.run_in_executor(None, run_stock_analysis, llm, out_dir)
+    return await runtime.call("stock", run_stock_analysis, llm, out_dir, runtime.stock_fetched)
 
 
-async def run_esg_async(regions: List[str], oems: List[str], out_dir: str) -> Dict[str, Any]:
+async def run_esg_async(
+    regions: List[str],
+    oems: List[str],
+    out_dir: str,
+    runtime: SupervisorRuntime,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
     """Run ESGAgent asynchronously"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, run_esg_agent, regions, oems, out_dir)
+    return await runtime.call("esg", run_esg_agent, regions, oems, out_dir, previous)
+
+
+async def run_tech_batch(companies: List[str], out_dir: str, runtime: SupervisorRuntime) -> Dict[str, Any]:
+    """Run TechSearchAgent for each company; map company -> result (or {"error": ...})."""
+    subtasks = [run_tech_async(c, out_dir, runtime) for c in companies]
+    subresults = await asyncio.gather(*subtasks, return_exceptions=True)
+    mapping: Dict[str, Any] = {}
+    for comp, res in zip(companies, subresults):
+        if not isinstance(res, BaseException) and isinstance(res, dict):
+            mapping[comp] = res
+        else:
+            mapping[comp] = {"error": str(res)} if isinstance(res, BaseException) else {"error": "invalid_result"}
+    return mapping
 
 def validate_tech_results(results: Dict[str, Any]) -> Dict[str, Any]:
     """Validate TechSearchAgent output (single or multi-company)."""
@@ -237,7 +313,7 @@ def validate_esg_results(results: Dict[str, Any]) -> Dict[str, Any]:
         "error_message": f"Missing required fields: {', '.join(missing)}" if missing else ""
     }
 
-async def run_agents_parallel(state: SupervisorState) -> SupervisorState:
+async def run_agents_parallel(state: SupervisorState, runtime: SupervisorRuntime) -> SupervisorState:
     """Run all 4 agents in parallel"""
     companies = state["companies"]
     regions = state.get("regions", ["KR", "CN", "JP", "EU", "US"])
@@ -246,23 +322,12 @@ async def run_agents_parallel(state: SupervisorState) -> SupervisorState:
     # Prepare Tech tasks for all OEMs
     tech_companies = companies if companies else ["Tesla"]
 
-    async def run_all_tech() -> Dict[str, Any]:
-        subtasks = [run_tech_async(c, out_dir) for c in tech_companies]
-        subresults = await asyncio.gather(*subtasks, return_exceptions=True)
-        mapping: Dict[str, Any] = {}
-        for comp, res in zip(tech_companies, subresults):
-            if not isinstance(res, Exception) and isinstance(res, dict):
-                mapping[comp] = res
-            else:
-                mapping[comp] = {"error": str(res)} if isinstance(res, Exception) else {"error": "invalid_result"}
-        return mapping
-
     # Run all agents in parallel (tech batch + others)
     tasks = [
-        asyncio.create_task(run_all_tech()),
-        run_valuechain_async(out_dir),
-        run_stock_async(out_dir),
-        run_esg_async(regions, companies, out_dir),
+        asyncio.create_task(run_tech_batch(tech_companies, out_dir, runtime)),
+        run_valuechain_async(out_dir, runtime),
+        run_stock_async(out_dir, runtime),
+        run_esg_async(regions, companies, out_dir, runtime),
     ]
 
     try:
@@ -271,10 +336,10 @@ async def run_agents_parallel(state: SupervisorState) -> SupervisorState:
         results = [None, None, None, None]
 
     new = state.copy()
-    new["tech_results"] = results[0] if not isinstance(results[0], Exception) else None
-    new["valuechain_results"] = results[1] if not isinstance(results[1], Exception) else None
-    new["stock_results"] = results[2] if not isinstance(results[2], Exception) else None
-    new["esg_results"] = results[3] if not isinstance(results[3], Exception) else None
+    new["tech_results"] = results[0] if not isinstance(results[0], BaseException) else None
+    new["valuechain_results"] = results[1] if not isinstance(results[1], BaseException) else None
+    new["stock_results"] = results[2] if not isinstance(results[2], BaseException) else None
+    new["esg_results"] = results[3] if not isinstance(results[3], BaseException) else None
     
     # Initialize retry counters if not present
     if "retry_count" not in new:
@@ -328,8 +393,37 @@ def check_completion(state: SupervisorState) -> str:
     return "finish"
 
 
-async def retry_failed_agents(state: SupervisorState) -> SupervisorState:
-    """Retry only the failed agents"""
+def failed_tech_companies(results: Optional[Dict[str, Any]], companies: List[str]) -> List[str]:
+    """Companies whose tech result is missing or fails validation."""
+    if not isinstance(results, dict):
+        return list(companies)
+    return [c for c in companies if not validate_tech_results({c: results.get(c)})["valid"]]
+
+
+def failed_esg_units(
+    results: Optional[Dict[str, Any]],
+    regions: List[str],
+    oems: List[str],
+) -> tuple[List[str], List[str]]:
+    """(regions missing from gov, whitelisted OEMs missing from corp or ratings)."""
+    esg_oems = [o for o in oems if o in OEM_WHITELIST]
+    if not isinstance(results, dict) or not results:
+        return list(regions), esg_oems
+    gov = results.get("gov") or {}
+    corp = results.get("corp") or {}
+    ratings = results.get("ratings") or {}
+    failed_regions = [r for r in regions if r not in gov]
+    failed_oems = [o for o in esg_oems if o not in corp or o not in ratings]
+    return failed_regions, failed_oems
+
+
+async def retry_failed_agents(state: SupervisorState, runtime: SupervisorRuntime) -> SupervisorState:
+    """Retry only the failed agents, and within them only the failed sub-units.
+
+    Tech re-runs just the companies that failed validation, ESG just the missing
+    regions/OEMs, and stock re-downloads only tickers not fetched earlier in this
+    run. Successful results are merged back in.
+    """
     validation_status = state.get("validation_status", {})
     retry_count = state.get("retry_count", {})
     companies = state["companies"]
@@ -341,30 +435,35 @@ async def retry_failed_agents(state: SupervisorState) -> SupervisorState:
     
     # Build task list for failed agents
     if not validation_status.get("tech") and retry_count.get("tech", 0) < 2:
-        async def rerun_all_tech():
-            tech_companies = companies if companies else ["Tesla"]
-            subtasks = [run_tech_async(c, out_dir) for c in tech_companies]
-            subresults = await asyncio.gather(*subtasks, return_exceptions=True)
-            mapping: Dict[str, Any] = {}
-            for comp, res in zip(tech_companies, subresults):
-                if not isinstance(res, Exception) and isinstance(res, dict):
-                    mapping[comp] = res
-                else:
-                    mapping[comp] = {"error": str(res)} if isinstance(res, Exception) else {"error": "invalid_result"}
-            return mapping
-        tasks.append(rerun_all_tech())
+        tech_companies = companies if companies else ["Tesla"]
+        previous_tech = state.get("tech_results")
+        failed = failed_tech_companies(previous_tech, tech_companies)
+
+        async def rerun_failed_tech():
+            mapping = dict(previous_tech) if isinstance(previous_tech, dict) else {}
+            mapping.update(await run_tech_batch(failed, out_dir, runtime))
+            return {c: mapping.get(c) for c in tech_companies}
+
+        print(f"[Supervisor] Retrying tech for {len(failed)}/{len(tech_companies)} companies: {failed}")
+        tasks.append(rerun_failed_tech())
         agent_names.append("tech")
     
     if not validation_status.get("valuechain") and retry_count.get("valuechain", 0) < 2:
-        tasks.append(run_valuechain_async(out_dir))
+        tasks.append(run_valuechain_async(out_dir, runtime))
         agent_names.append("valuechain")
     
     if not validation_status.get("stock") and retry_count.get("stock", 0) < 2:
-        tasks.append(run_stock_async(out_dir))
+        tasks.append(run_stock_async(out_dir, runtime))
         agent_names.append("stock")
     
     if not validation_status.get("esg") and retry_count.get("esg", 0) < 2:
-        tasks.append(run_esg_async(regions, companies, out_dir))
+        previous_esg = state.get("esg_results")
+        failed_regions, failed_oems = failed_esg_units(previous_esg, regions, companies)
+        if previous_esg and (failed_regions or failed_oems):
+            print(f"[Supervisor] Retrying ESG for regions={failed_regions} oems={failed_oems}")
+            tasks.append(run_esg_async(failed_regions, failed_oems, out_dir, runtime, previous_esg))
+        else:
+            tasks.append(run_esg_async(regions, companies, out_dir, runtime))
         agent_names.append("esg")
     
     # Run retry tasks in parallel
@@ -377,7 +476,7 @@ async def retry_failed_agents(state: SupervisorState) -> SupervisorState:
         # Update results
         new = state.copy()
         for agent_name, result in zip(agent_names, results):
-            if not isinstance(result, Exception) and result:
+            if not isinstance(result, BaseException) and result:
                 new[f"{agent_name}_results"] = result
             # Increment retry count
             new["retry_count"][agent_name] = retry_count.get(agent_name, 0) + 1
@@ -416,15 +515,15 @@ def finalize_status(state: SupervisorState) -> SupervisorState:
     
     return new
 
-def compile_supervisor_graph():
+def compile_supervisor_graph(runtime: SupervisorRuntime):
     from langgraph.graph import StateGraph
     
     graph = StateGraph(SupervisorState)
     
-    # Add nodes
-    graph.add_node("run_agents", lambda s: asyncio.run(run_agents_parallel(s)))
+    # Add nodes (async nodes run on the supervisor-owned loop)
+    graph.add_node("run_agents", lambda s: runtime.run(run_agents_parallel(s, runtime)))
     graph.add_node("validate", validate_results)
-    graph.add_node("retry", lambda s: asyncio.run(retry_failed_agents(s)))
+    graph.add_node("retry", lambda s: runtime.run(retry_failed_agents(s, runtime)))
     graph.add_node("finalize", finalize_status)
     
     # Set entry point
@@ -449,14 +548,17 @@ def compile_supervisor_graph():
 def run_supervisor(
     companies: List[str],
     regions: Optional[List[str]] = None,
-    out_dir: Optional[str] = None
+    out_dir: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    agent_limits: Optional[Dict[str, int]] = None,
 ) -> Dict[str, Any]:
 
     base_dir = os.path.dirname(os.path.abspath(__file__))
     resolved_out = out_dir or os.path.normpath(os.path.join(base_dir, "..", "outputs"))
     os.makedirs(resolved_out, exist_ok=True)
     
-    compiled = compile_supervisor_graph()
+    runtime = SupervisorRuntime(max_workers=max_workers, agent_limits=agent_limits)
+    compiled = compile_supervisor_graph(runtime)
     
     resolved_regions = regions or ["KR", "CN", "JP", "EU", "US"]
     
@@ -474,7 +576,13 @@ def run_supervisor(
         "error_log": {},
     }
     
-    final_state = compiled.invoke(init_state)
+    try:
+        final_state = compiled.invoke(init_state)
+    except BaseException:
+        runtime.cancel()
+        raise
+    finally:
+        runtime.close()
     
     return {
         "final_status": final_state["final_status"],
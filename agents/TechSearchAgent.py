@@ -7,7 +7,7 @@ import json
 import re
 import time
 from typing import Any, Dict, List, Optional, TypedDict
-from urllib import request, parse
+from urllib import parse
 
 try:
     from langchain.tools import tool
@@ -17,6 +17,15 @@ except Exception:
             return fn
         return deco
 
+try:
+    from .http_client import openai_chat as _call_openai, tavily_search as _tavily_search
+    from .concurrency import ThreadPoolExecutor
+    from .result_cache import get_result_cache, content_hash
+except ImportError:
+    from http_client import openai_chat as _call_openai, tavily_search as _tavily_search
+    from concurrency import ThreadPoolExecutor
+    from result_cache import get_result_cache, content_hash
+
 def _load_env_from_dotenv() -> None:
     if os.getenv("TAVILY_API_KEY") and os.getenv("OPENAI_API_KEY"):
         return
@@ -51,29 +60,10 @@ COMPANY_CANON = {
     "Volkswagen": "volkswagen.com",
 }
 
-def _tavily_search(query: str, *, depth: str = "basic", include_domains: Optional[List[str]] = None, max_results: int = 8) -> Dict[str, Any]:
-    """Call Tavily /search; return JSON dict (or {})."""
-    api_key = os.getenv("TAVILY_API_KEY")
-    if not api_key:
-        return {}
-    url = "https://api.tavily.com/search"
-    payload = {
-        "api_key": api_key,
-        "query": query,
-        "max_results": max_results,
-        "include_answer": True,
-        "search_depth": depth,
-    }
-    if include_domains:
-        payload["include_domains"] = include_domains
-    body = json.dumps(payload).encode("utf-8")
-    req = request.Request(url, data=body, headers={"Content-Type": "application/json"})
-    try:
-        with request.urlopen(req, timeout=30) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except Exception:
-        return {}
+EVAL_MODEL = "gpt-4o-mini"
 
+# Concurrent Tavily queries per company (global cap is still EVAGENT_MAX_TAVILY)
+TECH_SEARCH_WORKERS = int(os.getenv("TECH_SEARCH_WORKERS", "4"))
 
 def _extract_urls(results: Dict[str, Any]) -> List[Dict[str, str]]:
     """From Tavily response, collect [{'title':..., 'url':..., 'content':...}, ...]."""
@@ -101,29 +91,6 @@ def _domain_from_url(url: str) -> str:
     except Exception:
         return ""
 
-def _call_openai(messages: List[Dict[str, str]], model: str = "gpt-4o-mini", temperature: float = 0.3) -> str:
-    """Call OpenAI Chat API; return assistant message content."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return ""
-    url = "https://api.openai.com/v1/chat/completions"
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-    }
-    body = json.dumps(payload).encode("utf-8")
-    req = request.Request(url, data=body, headers={
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-    })
-    try:
-        with request.urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
-    except Exception as e:
-        return f"Error: {e}"
-
 @tool("TechDomainResolver", description="Resolve official website domain for a company (OEM focus)")
 def TechDomainResolver(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Input: {"company": str} -> Output: {"company": str, "domain": str|None}.
@@ -180,18 +147,30 @@ def TechSearch(payload: Dict[str, Any]) -> Dict[str, Any]:
         queries.append(q)
 
     include_domains = [domain] if domain else None
-    all_hits: List[Dict[str, str]] = []
-    best_answer: Optional[str] = None
 
-    for q in queries:
-        data = _tavily_search(q, depth="advanced", include_domains=include_domains, max_results=5)
-        hits = _extract_urls(data)
-        all_hits.extend(hits)
-        if not best_answer and isinstance(data, dict):
-            best_answer = data.get("answer") or best_answer
-        time.sleep(0.2)
+    def _one(q: str) -> Dict[str, Any]:
+        return _tavily_search(q, depth="advanced", include_domains=include_domains, max_results=5)
+
+    def _search() -> Dict[str, Any]:
+        all_hits: List[Dict[str, str]] = []
+        best_answer: Optional[str] = None
+        if not queries:
+            return {"hits": all_hits, "answer": ""}
+
+        # Queries run concurrently (paced by the shared Tavily limiter); map() keeps
+        # results in query order so hits and the chosen answer are deterministic.
+        with ThreadPoolExecutor(max_workers=min(TECH_SEARCH_WORKERS, len(queries))) as pool:
+            responses = list(pool.map(_one, queries))
+
+        for data in responses:
+            all_hits.extend(_extract_urls(data))
+            if not best_answer and isinstance(data, dict):
+                best_answer = data.get("answer") or best_answer
 
-    return {"hits": all_hits, "answer": best_answer or ""}
+        return {"hits": all_hits, "answer": best_answer or ""}
+
+    key = {"company": company, "domain": domain, "queries": queries, "depth": "advanced", "max_results": 5}
+    return get_result_cache().cached("tech.search", key, _search, cacheable=lambda r: bool(r.get("hits")))
 
 
 @tool("TechDeduperRanker", description="Dedupe and rank search hits by domain priority and heuristics")
@@ -314,8 +293,39 @@ Respond in this exact JSON format:
 }}
 """
 
-    eval_response = _call_openai([{"role": "user", "content": eval_prompt}])
-    
+    key = {
+        "company": company,
+        "model": EVAL_MODEL,
+        "prompt_hash": content_hash(eval_prompt, [
+            (c.get("title", ""), c.get("url", ""), c.get("content", "")[:1000]) for c in citations
+        ]),
+    }
+    return get_result_cache().cached(
+        "tech.evaluate", key,
+        lambda: _evaluate(eval_prompt, citations),
+        cacheable=_evaluation_ok,
+    )
+
+
+def _evaluation_ok(result: Dict[str, Any]) -> bool:
+    """Only cache evaluations with all six scores and no failed citation summaries."""
+    evaluation = result.get("evaluation") or {}
+    if not all(
+        isinstance(evaluation.get(k), dict) and "score" in evaluation[k]
+        and evaluation[k].get("rationale") != "Evaluation failed"
+        for k in ("TRL", "MRL", "CRAAP", "Materiality", "ISSB", "OTA_Compliance")
+    ):
+        return False
+    return not any(str(c.get("summary", "")).startswith("Error:") for c in result.get("citation_summaries", []))
+
+
+def _evaluate(eval_prompt: str, citations: List[Dict[str, str]]) -> Dict[str, Any]:
+    # The 6-axis evaluation and the citation summaries are independent requests
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        eval_future = pool.submit(_call_openai, [{"role": "user", "content": eval_prompt}], model=EVAL_MODEL)
+        citation_summaries = _summarize_citations(citations)
+        eval_response = eval_future.result()
+
     # Parse evaluation
     evaluation = {}
     try:
@@ -333,32 +343,106 @@ Respond in this exact JSON format:
             "OTA_Compliance": {"score": 0, "rationale": "Evaluation failed", "references": []},
         }
 
-    # Summarize each citation
-    citation_summaries = []
-    for cit in citations:
-        title = cit.get("title", "")
-        url = cit.get("url", "")
-        content = cit.get("content", "")[:1000]  # Limit content length
-        
-        if not content:
-            citation_summaries.append({"title": title, "url": url, "summary": "No content available"})
-            continue
-        
-        sum_prompt = f"""Summarize this article excerpt in 2-3 sentences focusing on technical details:
+    return {
+        "evaluation": evaluation,
+        "citation_summaries": citation_summaries
+    }
+
+
+# "batch": one structured request per token-budgeted group of citations (default)
+# "per_citation": one request per citation, issued concurrently
+CITATION_SUMMARY_MODE = os.getenv("CITATION_SUMMARY_MODE", "batch")
+# Approximate input tokens (~4 chars each) allowed per batched summary request
+CITATION_BATCH_TOKENS = int(os.getenv("CITATION_BATCH_TOKENS", "3000"))
+
+
+def _summarize_one(title: str, content: str) -> str:
+    sum_prompt = f"""Summarize this article excerpt in 2-3 sentences focusing on technical details:
 
 Title: {title}
 Content: {content}
 
 Summary:"""
-        
-        summary = _call_openai([{"role": "user", "content": sum_prompt}])
-        citation_summaries.append({"title": title, "url": url, "summary": summary.strip()})
-        time.sleep(0.3)  # Rate limiting
+    return _call_openai([{"role": "user", "content": sum_prompt}], model=EVAL_MODEL).strip()
+
+
+def _citation_batches(items: List[Dict[str, Any]], budget_tokens: int) -> List[List[Dict[str, Any]]]:
+    """Group citations greedily so each batch's excerpts stay within the token budget."""
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = 0
+    for it in items:
+        cost = (len(it["title"]) + len(it["content"])) // 4 + 1
+        if current and used + cost > budget_tokens:
+            batches.append(current)
+            current, used = [], 0
+        current.append(it)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _summarize_batch(batch: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Summarize several citations in one JSON-mode request; return {index: summary}."""
+    articles = "\n\n".join(
+        f"[{it['index']}] Title: {it['title']}\nContent: {it['content']}" for it in batch
+    )
+    prompt = f"""Summarize each article excerpt below in 2-3 sentences focusing on technical details.
+
+{articles}
+
+Respond in this exact JSON format, one entry per article:
+{{"summaries": [{{"index": <article number>, "summary": "..."}}]}}"""
+    raw = _call_openai(
+        [{"role": "user", "content": prompt}], model=EVAL_MODEL,
+        response_format={"type": "json_object"},
+    )
+    out: Dict[int, str] = {}
+    try:
+        for entry in json.loads(raw).get("summaries", []):
+            idx = int(entry.get("index"))
+            summary = str(entry.get("summary") or "").strip()
+            if summary:
+                out[idx] = summary
+    except Exception:
+        pass
+    return out
+
+
+def _summarize_citations(citations: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Summarize citations in input order as [{title, url, summary}].
+
+    Batch mode needs one request per token budget (usually one per company); any
+    citation missing from a batch response falls back to its own request.
+    """
+    items = []
+    summaries: Dict[int, str] = {}
+    for i, cit in enumerate(citations):
+        content = cit.get("content", "")[:1000]  # Limit content length
+        if not content:
+            summaries[i] = "No content available"
+            continue
+        items.append({"index": i, "title": cit.get("title", ""), "content": content})
+
+    if items and os.getenv("OPENAI_API_KEY"):
+        pending = items
+        if CITATION_SUMMARY_MODE == "batch":
+            batches = _citation_batches(items, CITATION_BATCH_TOKENS)
+            with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+                for part in pool.map(_summarize_batch, batches):
+                    summaries.update(part)
+            pending = [it for it in items if it["index"] not in summaries]
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                for it, summary in zip(pending, pool.map(lambda x: _summarize_one(x["title"], x["content"]), pending)):
+                    summaries[it["index"]] = summary
+
+    return [
+        {"title": cit.get("title", ""), "url": cit.get("url", ""), "summary": summaries.get(i, "")}
+        for i, cit in enumerate(citations)
+    ]
 
-    return {
-        "evaluation": evaluation,
-        "citation_summaries": citation_summaries
-    }
 
 class TechState(TypedDict):
     company: str
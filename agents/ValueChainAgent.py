@@ -4,11 +4,20 @@ from __future__ import annotations
 import os
 import json
 import math
-from typing import Dict, Optional, TypedDict, Any, List
+import re
+import sqlite3
+import threading
+from typing import Dict, Optional, TypedDict, Any, List, Iterable
 import time
+import numpy as np
 import pandas as pd
 import plotly.express as px  # lightweight world map
 
+try:
+    from .concurrency import ThreadPoolExecutor, provider_slot, RunCancelled
+except ImportError:
+    from concurrency import ThreadPoolExecutor, provider_slot, RunCancelled
+
 LAT_CANDIDATES = ["lat", "latitude", "y", "y_coord"]
 LON_CANDIDATES = ["lon", "lng", "longitude", "x", "x_coord"]
 CITY_CANDIDATES = ["city", "city_name", "location", "plant_city"]
@@ -32,15 +41,232 @@ def _find_col(df: pd.DataFrame, candidates: list[str]) -> Optional[str]:
     return next((cols[c] for c in candidates if c in cols), None)
 
 
-def _ensure_latlon(
-    df: pd.DataFrame,
+def _normalize_query(query: str) -> str:
+    """Cache key for a geocode query: case-folded, single-spaced, tight commas."""
+    q = re.sub(r"\s+", " ", str(query)).strip().casefold()
+    return re.sub(r"\s*,\s*", ", ", q)
+
+
+class GeocodeCache:
+    """SQLite-backed geocode cache keyed by normalized query.
+
+    All rows are loaded into memory once on open; lookups are dict hits.
+    New entries are staged and written back in a single transaction by flush().
+    Queries the geocoder could not resolve are stored as misses (NULL lat/lon)
+    and not retried until ``miss_ttl_sec`` has passed.
+    A legacy ``query,lat,lon`` CSV next to the database is imported on first open.
+    """
+
+    def __init__(self, db_path: str, legacy_csv: Optional[str] = None, *, miss_ttl_sec: float = 30 * 86400):
+        self.db_path = db_path
+        self.miss_ttl_sec = miss_ttl_sec
+        self._lock = threading.Lock()
+        self._mem: Dict[str, tuple[float, float]] = {}
+        self._misses: Dict[str, float] = {}
+        self._pending: Dict[str, tuple[str, Optional[float], Optional[float], float]] = {}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY, query TEXT NOT NULL,"
+            " lat REAL, lon REAL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        for key, la, lo, ts in self._conn.execute("SELECT key, lat, lon, updated_at FROM geocode"):
+            if la is None or lo is None:
+                self._misses[key] = ts
+            else:
+                self._mem[key] = (la, lo)
+
+        if not self._mem and legacy_csv and os.path.isfile(legacy_csv):
+            self._import_legacy_csv(legacy_csv)
+            self.flush()
+
+    def _import_legacy_csv(self, csv_path: str) -> None:
+        # Old writer did not quote queries, so split lat/lon off the right-hand side
+        with open(csv_path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                line = line.strip()
+                if not line or (i == 0 and line.lower() == "query,lat,lon"):
+                    continue
+                parts = line.rsplit(",", 2)
+                if len(parts) != 3:
+                    continue
+                try:
+                    self.put(parts[0].strip().strip('"'), float(parts[1]), float(parts[2]))
+                except ValueError:
+                    continue
+
+    def get(self, query: str) -> Optional[tuple[float, float]]:
+        with self._lock:
+            return self._mem.get(_normalize_query(query))
+
+    def is_known_miss(self, query: str) -> bool:
+        """True if the query failed to geocode within the miss TTL."""
+        with self._lock:
+            ts = self._misses.get(_normalize_query(query))
+        return ts is not None and (time.time() - ts) < self.miss_ttl_sec
+
+    def __contains__(self, query: str) -> bool:
+        return self.get(query) is not None
+
+    def __len__(self) -> int:
+        return len(self._mem)
+
+    def put(self, query: str, lat: float, lon: float) -> None:
+        key = _normalize_query(query)
+        with self._lock:
+            self._misses.pop(key, None)
+            if self._mem.get(key) == (lat, lon):
+                return
+            self._mem[key] = (lat, lon)
+            self._pending[key] = (str(query), float(lat), float(lon), time.time())
+
+    def put_miss(self, query: str) -> None:
+        key = _normalize_query(query)
+        with self._lock:
+            if key in self._mem:
+                return
+            now = time.time()
+            self._misses[key] = now
+            self._pending[key] = (str(query), None, None, now)
+
+    def flush(self) -> int:
+        """Write staged entries in one transaction; return number written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            rows = [(k, q, la, lo, ts) for k, (q, la, lo, ts) in self._pending.items()]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO geocode (key, query, lat, lon, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            self._pending.clear()
+            return len(rows)
+
+
+_GEOCODE_CACHES: Dict[str, GeocodeCache] = {}
+_GEOCODE_CACHES_LOCK = threading.Lock()
+
+
+def get_geocode_cache(db_path: str) -> GeocodeCache:
+    """Process-wide GeocodeCache per database path (loaded once, shared by all callers)."""
+    key = os.path.abspath(db_path)
+    with _GEOCODE_CACHES_LOCK:
+        cache = _GEOCODE_CACHES.get(key)
+        if cache is None:
+            legacy_csv = os.path.splitext(key)[0] + ".csv"
+            cache = GeocodeCache(key, legacy_csv=legacy_csv)
+            _GEOCODE_CACHES[key] = cache
+        return cache
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate_per_sec`` sustained, bursts up to ``capacity``."""
+
+    def __init__(self, rate_per_sec: float, capacity: float = 1.0):
+        self.rate = max(float(rate_per_sec), 1e-6)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _StubLocation:
+    def __init__(self, lat: float, lon: float):
+        self.latitude = lat
+        self.longitude = lon
+
+
+class StubGeocoder:
+    """Offline geocoder with the geopy ``geocode(query)`` interface.
+
+    Looks queries up in a fixed {query: (lat, lon)} table (normalized keys) and
+    records every call, so the geocoding stage can be exercised without Nominatim.
+    """
+
+    def __init__(self, table: Optional[Dict[str, tuple[float, float]]] = None):
+        self.table = {_normalize_query(k): v for k, v in (table or {}).items()}
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+
+    def geocode(self, query: str):
+        with self._lock:
+            self.calls.append(query)
+        hit = self.table.get(_normalize_query(query))
+        return _StubLocation(*hit) if hit else None
+
+
+def _default_geocoder():
+    try:
+        from geopy.geocoders import Nominatim
+    except Exception:
+        raise ValueError(
+            "No lat/lon columns and geopy not installed. Install with `pip install geopy` or add lat/lon columns."
+        )
+    return Nominatim(user_agent="evagent_valuechain", timeout=15)
+
+
+def _resolve_queries(
+    queries: Iterable[str],
+    geocoder: Any,
     *,
-    cache_path: Optional[str] = None,
-    throttle_sec: float = 1.0,
-) -> pd.DataFrame:
+    bucket: TokenBucket,
+    max_workers: int = 4,
+    retries: int = 2,
+) -> Dict[str, Optional[tuple[float, float]]]:
+    """Geocode unique queries through a rate-limited worker pool.
+
+    Every attempt (including retries) takes a token from ``bucket``. A query that
+    still raises after ``retries`` retries is left out of the result so it is
+    retried on the next run instead of being recorded as a miss.
+    """
+    def _one(q: str):
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            try:
+                with provider_slot("nominatim"):
+                    loc = geocoder.geocode(q)
+                return q, (float(loc.latitude), float(loc.longitude)) if loc is not None else None
+            except RunCancelled:
+                raise
+            except Exception:
+                if attempt < retries:
+                    time.sleep(min(8.0, 0.5 * 2 ** attempt))
+        return q, Ellipsis
+
+    unique = list(dict.fromkeys(queries))
+    if not unique:
+        return {}
+    out: Dict[str, Optional[tuple[float, float]]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as ex:
+        for q, res in ex.map(_one, unique):
+            if res is not Ellipsis:
+                out[q] = res
+    return out
+
+
+def _row_queries(df: pd.DataFrame) -> Optional[List[Optional[tuple[str, str]]]]:
+    """Per-row (full query, "City, Country" fallback) or None when coordinates exist."""
     try:
         _infer_coord_columns(df)
-        return df
+        return None
     except Exception:
         pass
 
@@ -52,92 +278,125 @@ def _ensure_latlon(
             "Missing coordinate columns and cannot geocode: need City and Country columns."
         )
 
-    try:
-        from geopy.geocoders import Nominatim
-    except Exception:
-        raise ValueError(
-            "No lat/lon columns and geopy not installed. Install with `pip install geopy` or add lat/lon columns."
-        )
-
-    # Load cache
-    cache: Dict[str, tuple[float, float]] = {}
-    if cache_path and os.path.isfile(cache_path):
-        try:
-            cache_df = pd.read_csv(cache_path)
-            for _, r in cache_df.iterrows():
-                cache[str(r["query"])]= (float(r["lat"]), float(r["lon"]))
-        except Exception:
-            pass
-
-    geolocator = Nominatim(user_agent="evagent_valuechain", timeout=15)
-    to_cache: list[tuple[str, float, float]] = []
-
-    lat_name = "lat"
-    lon_name = "lon"
-    out_df = df.copy()
-    if lat_name not in out_df.columns:
-        out_df[lat_name] = None
-    if lon_name not in out_df.columns:
-        out_df[lon_name] = None
+    lat = df["lat"] if "lat" in df.columns else pd.Series([None] * len(df), index=df.index)
+    lon = df["lon"] if "lon" in df.columns else pd.Series([None] * len(df), index=df.index)
 
-    for idx, row in out_df.iterrows():
+    rows: List[Optional[tuple[str, str]]] = []
+    for rec, la, lo in zip(df.to_dict("records"), lat, lon):
         # Skip if already populated
-        if pd.notna(row.get(lat_name)) and pd.notna(row.get(lon_name)):
+        if pd.notna(la) and pd.notna(lo):
+            rows.append(None)
             continue
-
-        parts = []
-        if plant_col and pd.notna(row.get(plant_col)):
-            parts.append(str(row.get(plant_col)))
-        if city_col and pd.notna(row.get(city_col)):
-            parts.append(str(row.get(city_col)))
-        if country_col and pd.notna(row.get(country_col)):
-            parts.append(str(row.get(country_col)))
+        parts = [str(rec[c]) for c in (plant_col, city_col, country_col) if c and pd.notna(rec.get(c))]
         if not parts:
+            rows.append(None)
             continue
-        query = ", ".join(parts)
+        rows.append((", ".join(parts), f"{rec.get(city_col)}, {rec.get(country_col)}"))
+    return rows
 
-        if query in cache:
-            la, lo = cache[query]
-            out_df.at[idx, lat_name] = la
-            out_df.at[idx, lon_name] = lo
-            continue
 
+def geocode_frames(
+    dfs: List[pd.DataFrame],
+    *,
+    cache_path: Optional[str] = None,
+    geocoder: Any = None,
+    rate_per_sec: float = 1.0,
+    max_workers: int = 4,
+    retries: int = 2,
+) -> List[pd.DataFrame]:
+    """Ensure lat/lon on several DataFrames with one deduplicated geocoding pass.
+
+    All rows missing coordinates are collapsed into a set of unique queries.
+    Cache misses are resolved concurrently under a shared token bucket (Nominatim
+    allows ~1 req/s); queries that fail fall back to unique "City, Country" keys.
+    Results are written to the cache in one batch, so cost scales with unique
+    locations rather than rows. ``geocoder`` defaults to geopy Nominatim; pass a
+    StubGeocoder to run offline.
+    """
+    cache = get_geocode_cache(cache_path) if cache_path else None
+    cached: Dict[str, tuple[float, float]] = {}
+
+    def _lookup(q: str) -> Optional[tuple[float, float]]:
+        return cached.get(q) or (cache.get(q) if cache is not None else None)
+
+    def _pending(q: str) -> bool:
+        return _lookup(q) is None and not (cache is not None and cache.is_known_miss(q))
+
+    per_df = [_row_queries(df) for df in dfs]
+    rows = [r for qs in per_df if qs for r in qs if r]
+
+    primary = [q for q, _ in rows if _pending(q)]
+    if primary:
+        if geocoder is None:
+            geocoder = _default_geocoder()
+        bucket = TokenBucket(rate_per_sec)
+        resolved = _resolve_queries(primary, geocoder, bucket=bucket, max_workers=max_workers, retries=retries)
+        failed = {q for q, res in resolved.items() if res is None}
+        for q, res in resolved.items():
+            if res is not None:
+                cached[q] = res
+                if cache is not None:
+                    cache.put(q, *res)
+
+        fallback = {q: cc for q, cc in rows if q in failed}
+        resolved_cc = _resolve_queries(
+            [cc for cc in fallback.values() if _pending(cc)],
+            geocoder, bucket=bucket, max_workers=max_workers, retries=retries,
+        )
+        for cc, res in resolved_cc.items():
+            if res is not None:
+                cached[cc] = res
+                if cache is not None:
+                    cache.put(cc, *res)
+        for q, cc in fallback.items():
+            hit = _lookup(cc)
+            if hit:
+                cached[q] = hit
+                if cache is not None:
+                    cache.put(q, *hit)
+            elif cache is not None and (cc in resolved_cc or cache.is_known_miss(cc)):
+                cache.put_miss(q)
+
+    # Persist new entries in one batch
+    if cache is not None:
         try:
-            loc = geolocator.geocode(query)
-            if loc is None and city_col and country_col:
-                cc_key = f"{row.get(city_col)}, {row.get(country_col)}"
-                if cc_key in cache:
-                    la, lo = cache[cc_key]
-                    out_df.at[idx, lat_name] = la
-                    out_df.at[idx, lon_name] = lo
-                    continue
-                loc = geolocator.geocode(cc_key)
-            if loc is not None:
-                la = float(loc.latitude)
-                lo = float(loc.longitude)
-                out_df.at[idx, lat_name] = la
-                out_df.at[idx, lon_name] = lo
-                to_cache.append((query, la, lo))
-            time.sleep(throttle_sec)
+            cache.flush()
         except Exception:
+            pass
+
+    out: List[pd.DataFrame] = []
+    for df, qs in zip(dfs, per_df):
+        if qs is None:
+            out.append(df)
             continue
+        out_df = df.copy()
+        lat = list(out_df["lat"]) if "lat" in out_df.columns else [None] * len(out_df)
+        lon = list(out_df["lon"]) if "lon" in out_df.columns else [None] * len(out_df)
+        for i, r in enumerate(qs):
+            hit = _lookup(r[0]) if r else None
+            if hit:
+                lat[i], lon[i] = hit
+        out_df["lat"] = lat
+        out_df["lon"] = lon
+        # Verify
+        _infer_coord_columns(out_df)
+        out.append(out_df)
+    return out
 
-    # Persist cache
-    if cache_path and to_cache:
-        try:
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-            mode = "a" if os.path.isfile(cache_path) else "w"
-            with open(cache_path, mode, encoding="utf-8") as f:
-                if mode == "w":
-                    f.write("query,lat,lon\n")
-                for q, la, lo in to_cache:
-                    f.write(f"{q},{la},{lo}\n")
-        except Exception:
-            pass
 
-    # Verify
-    _infer_coord_columns(out_df)
-    return out_df
+def _ensure_latlon(
+    df: pd.DataFrame,
+    *,
+    cache_path: Optional[str] = None,
+    throttle_sec: float = 1.0,
+    geocoder: Any = None,
+) -> pd.DataFrame:
+    return geocode_frames(
+        [df],
+        cache_path=cache_path,
+        geocoder=geocoder,
+        rate_per_sec=1.0 / throttle_sec if throttle_sec > 0 else 1e6,
+    )[0]
 
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -150,6 +409,42 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
+
+def haversine_matrix_km(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances (km) between (N, 2) and (M, 2) lat/lon arrays -> (N, M)."""
+    R = 6371.0088
+    phi1 = np.radians(src[:, 0])[:, None]
+    phi2 = np.radians(dst[:, 0])[None, :]
+    dphi = phi2 - phi1
+    dlambda = np.radians(dst[:, 1][None, :] - src[:, 1][:, None])
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+def count_within_radii(
+    src: np.ndarray,
+    dst: np.ndarray,
+    radii_km: List[float],
+    *,
+    chunk_rows: int = 256,
+) -> np.ndarray:
+    """Count dst points within each radius of every src point in one batched pass.
+
+    Returns an int array of shape (N, len(radii_km)). Rows with NaN coordinates in
+    dst never match (NaN comparisons are False), mirroring the scalar loop.
+    src is processed in chunks so the distance matrix stays bounded in memory.
+    """
+    radii = np.asarray(radii_km, dtype=float)
+    counts = np.zeros((len(src), len(radii)), dtype=np.int64)
+    if len(src) == 0 or len(dst) == 0:
+        return counts
+    for start in range(0, len(src), chunk_rows):
+        d = haversine_matrix_km(src[start:start + chunk_rows], dst)
+        counts[start:start + chunk_rows] = (d[:, :, None] <= radii).sum(axis=1)
+    return counts
+
+
 try:
     from langchain.tools import tool
 except Exception:
@@ -324,7 +619,7 @@ def _format_jit_scores(jit_analysis: Dict[str, Any]) -> Dict[str, Any]:
 
 def _default_data_dir() -> str:
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.normpath(os.path.join(base_dir, "..", "data"))
+    return os.getenv("EVAGENT_DATA_DIR") or os.path.normpath(os.path.join(base_dir, "..", "data"))
 
 
 class VCState(TypedDict):
@@ -341,6 +636,7 @@ class VCState(TypedDict):
     map_path: Optional[str]
     thresholds_km: Dict[str, float]  # {"near": 66, "region": 140}
     llm: Optional[Any]  # Optional LLM for evaluation
+    geocoder: Optional[Any]  # Optional geocoder override (e.g. StubGeocoder)
 
 def load_csvs(state: VCState) -> VCState:
     # Resolve data_dir robustly (fallback to project-relative data/)
@@ -371,10 +667,14 @@ def load_csvs(state: VCState) -> VCState:
 
     # Ensure coordinates exist; if not, geocode by City/Country
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    cache_csv = os.path.normpath(os.path.join(base_dir, "..", "db", "geocode_cache.csv"))
-    oem_df = _ensure_latlon(oem_df, cache_path=cache_csv)
-    sup_battery_df = _ensure_latlon(sup_battery_df, cache_path=cache_csv)
-    sup_hvac_df = _ensure_latlon(sup_hvac_df, cache_path=cache_csv)
+    cache_db = os.getenv("EVAGENT_GEOCODE_CACHE_PATH") or os.path.normpath(
+        os.path.join(base_dir, "..", "db", "geocode_cache.sqlite")
+    )
+    oem_df, sup_battery_df, sup_hvac_df = geocode_frames(
+        [oem_df, sup_battery_df, sup_hvac_df],
+        cache_path=cache_db,
+        geocoder=state.get("geocoder"),
+    )
 
     supplier_df = pd.concat(
         [sup_battery_df.assign(_seg="battery"), sup_hvac_df.assign(_seg="hvac")],
@@ -443,26 +743,20 @@ def count_suppliers(state: VCState) -> VCState:
 
     results: Dict[str, Dict[str, int]] = {}
 
-    sup_coords = supplier_df[[s_lat, s_lon]].to_numpy()
-
-    for idx, row in oem_df.iterrows():
-        comp_name = str(row.get(company_label, f"oem_{idx}"))
-        lat1 = float(row[o_lat]); lon1 = float(row[o_lon])
+    # Unparseable supplier coordinates are skipped (NaN never falls within a radius)
+    sup_coords = np.column_stack([
+        pd.to_numeric(supplier_df[s_lat], errors="coerce").to_numpy(dtype=float),
+        pd.to_numeric(supplier_df[s_lon], errors="coerce").to_numpy(dtype=float),
+    ]) if len(supplier_df) else np.empty((0, 2))
+    oem_coords = oem_df[[o_lat, o_lon]].astype(float).to_numpy()
 
-        c66 = 0; c140 = 0
-        for lat2, lon2 in sup_coords:
-            try:
-                d = haversine_km(lat1, lon1, float(lat2), float(lon2))
-            except Exception:
-                continue
-            if d <= near_km:
-                c66 += 1
-            if d <= region_km:
-                c140 += 1
+    counts = count_within_radii(oem_coords, sup_coords, [near_km, region_km])
 
+    for (idx, row), (c66, c140) in zip(oem_df.iterrows(), counts):
+        comp_name = str(row.get(company_label, f"oem_{idx}"))
         prev = results.get(comp_name, {"within_66km": 0, "within_140km": 0})
-        prev["within_66km"] += c66
-        prev["within_140km"] += c140
+        prev["within_66km"] += int(c66)
+        prev["within_140km"] += int(c140)
         results[comp_name] = prev
 
     new = state.copy()
@@ -523,7 +817,8 @@ def run_valuechain_agent(
     data_dir: Optional[str] = None,
     out_dir: Optional[str] = None,
     thresholds_km: Optional[Dict[str, float]] = None,
-    llm = None
+    llm = None,
+    geocoder = None,
 ) -> Dict[str, Any]:
     resolved_data = data_dir or _default_data_dir()
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -545,6 +840,7 @@ def run_valuechain_agent(
         "map_path": None,
         "thresholds_km": thresholds_km or {"near": 66.0, "region": 140.0},
         "llm": llm,
+        "geocoder": geocoder,
     }
 
     final_state = compiled.invoke(init_state)
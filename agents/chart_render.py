@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Stock chart rendering stage
+
+- Charts are described by plain specs (kind, title, series of date numbers and
+  values) and written to content-addressed files, e.g.
+  ``stock_OEM_TSLA_<hash>.png``: unchanged data keeps its file and is not
+  re-rendered, and older versions beyond a retention count are pruned.
+- Each render process keeps one template figure per chart kind and updates
+  its line artists with ``set_data`` instead of building a new figure.
+- Batches are rendered on a process pool (spawned workers, so it is safe to
+  call from threaded agents); small batches render in-process.
+
+This module only needs matplotlib/numpy so pool workers start quickly.
+
+Env: STOCK_CHART_WORKERS (default: CPU count, max 4), STOCK_CHART_PARALLEL_MIN
+     (default 6 charts), STOCK_CHART_DPI (default 150), STOCK_CHART_KEEP (default 2)
+"""
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+# Bump when the chart layout changes so content hashes (and files) change too
+CHART_STYLE_VERSION = 1
+COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b"]
+
+CHART_DPI = int(os.getenv("STOCK_CHART_DPI", "150"))
+# Older files kept per chart (ticker / category) besides the current one
+CHART_KEEP = int(os.getenv("STOCK_CHART_KEEP", "2"))
+
+
+def chart_spec(
+    kind: str,
+    name: str,
+    title: str,
+    series: List[Dict[str, Any]],
+    out_dir: str,
+) -> Dict[str, Any]:
+    """Build a render spec; ``series`` items are {label, x (date numbers), y}.
+
+    kind "individual" -> stock_OEM_<name>_<hash>.png, "merged" -> stock_<name>_merged_<hash>.png
+    """
+    payload = {
+        "v": CHART_STYLE_VERSION, "dpi": CHART_DPI, "kind": kind, "title": title,
+        "series": [[s["label"], list(map(float, s["x"])), list(map(float, s["y"]))] for s in series],
+    }
+    digest = hashlib.sha256(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()[:16]
+    stem = f"stock_OEM_{name}" if kind == "individual" else f"stock_{name}_merged"
+    return {**payload, "stem": stem, "path": os.path.join(out_dir, f"{stem}_{digest}.png")}
+
+
+# ---------------------------------
+# Rendering (runs in pool workers)
+# ---------------------------------
+_templates: Dict[str, Any] = {}
+
+
+def _template(kind: str):
+    """Per-process figure, axes and line pool for a chart kind (created once)."""
+    if kind in _templates:
+        return _templates[kind]
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    if kind == "individual":
+        fig, ax = plt.subplots(figsize=(10, 5))
+        ax.set_ylabel("Price (USD)", fontsize=11)
+    else:
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.set_ylabel("Normalized Price", fontsize=11)
+        ax.axhline(y=100, color="gray", linestyle="--", alpha=0.5, linewidth=1)
+    ax.set_xlabel("Date", fontsize=11)
+    ax.grid(True, alpha=0.3)
+    ax.xaxis_date()
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
+    ax.tick_params(axis="x", labelrotation=30)
+    fig.subplots_adjust(left=0.08, right=0.97, top=0.9, bottom=0.2)
+    _templates[kind] = (fig, ax, [])
+    return _templates[kind]
+
+
+def render_chart(spec: Dict[str, Any]) -> str:
+    """Draw ``spec`` onto the reused template figure and save it; returns the path."""
+    fig, ax, lines = _template(spec["kind"])
+    series = spec["series"]
+    while len(lines) < len(series):
+        color = COLORS[len(lines) % len(COLORS)]
+        alpha = 1.0 if spec["kind"] == "individual" else 0.8
+        lines.append(ax.plot([], [], color=color, linewidth=2, alpha=alpha)[0])
+    for line, (label, x, y) in zip(lines, series):
+        line.set_data(x, y)
+        line.set_label(label)
+        line.set_visible(True)
+    for line in lines[len(series):]:
+        line.set_visible(False)
+        line.set_label("_hidden")
+
+    ax.set_title(spec["title"], fontsize=14, fontweight="bold")
+    ax.relim(visible_only=True)
+    ax.autoscale_view()
+    legend = ax.legend(handles=lines[:len(series)], fontsize=10 if spec["kind"] == "individual" else 9, loc="best")
+
+    tmp = spec["path"] + ".tmp.png"
+    fig.savefig(tmp, dpi=spec["dpi"])
+    os.replace(tmp, spec["path"])
+    legend.remove()
+    return spec["path"]
+
+
+# ---------------------------------
+# Batch stage
+# ---------------------------------
+def _workers() -> int:
+    env = os.getenv("STOCK_CHART_WORKERS")
+    return max(1, int(env) if env else min(os.cpu_count() or 1, 4))
+
+
+def render_charts(specs: List[Dict[str, Any]], workers: Optional[int] = None) -> List[str]:
+    """Render specs whose file does not exist yet, prune old versions; returns paths in order."""
+    todo = [s for s in specs if not os.path.isfile(s["path"])]
+    workers = min(workers or _workers(), len(todo))
+    if todo:
+        if workers > 1 and len(todo) >= int(os.getenv("STOCK_CHART_PARALLEL_MIN", "6")):
+            try:
+                ctx = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                    list(pool.map(render_chart, todo, chunksize=max(1, len(todo) // (workers * 2))))
+            except (BrokenProcessPool, OSError) as e:
+                # e.g. no __main__ guard in the entry script: finish in-process
+                print(f"[Charts] process pool unavailable ({e.__class__.__name__}), rendering in-process")
+        for spec in todo:
+            if not os.path.isfile(spec["path"]):
+                render_chart(spec)
+    for spec in specs:
+        prune_charts(spec["path"], spec["stem"])
+    return [s["path"] for s in specs]
+
+
+def prune_charts(current: str, stem: str, keep: Optional[int] = None) -> List[str]:
+    """Delete files of the same chart (``<stem>_*.png``) beyond the newest ``keep`` besides ``current``."""
+    keep = CHART_KEEP if keep is None else keep
+    out_dir = os.path.dirname(current)
+    # Content hashes, or timestamps from before charts were content-addressed
+    versioned = re.compile(re.escape(stem) + r"_([0-9a-f]{16}|\d{8}_\d{6})\.png")
+    others = [
+        p for p in glob.glob(os.path.join(glob.escape(out_dir), f"{glob.escape(stem)}_*.png"))
+        if p != current and versioned.fullmatch(os.path.basename(p))
+    ]
+    others.sort(key=os.path.getmtime, reverse=True)
+    removed = []
+    for path in others[keep:]:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
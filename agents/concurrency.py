@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide concurrency limits shared by all agents
+
+- Per-provider slots (Tavily, OpenAI, yfinance, Nominatim) cap in-flight calls to
+  each external service no matter how many agents/threads are running.
+- A cancel token per supervisor run lets it stop that run cooperatively: the
+  next provider call in any of the run's threads raises RunCancelled instead of
+  hitting the network. The token is the current one in the calling context
+  (use_cancel_token); ThreadPoolExecutor below carries it into pool threads, so
+  other runs in the same process are unaffected.
+
+Limits can be overridden per provider with EVAGENT_MAX_<PROVIDER>, e.g. EVAGENT_MAX_TAVILY=2.
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+from concurrent import futures
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+DEFAULT_PROVIDER_LIMITS: Dict[str, int] = {
+    "tavily": 4,
+    "openai": 4,
+    "yfinance": 4,
+    "nominatim": 1,
+}
+
+
+class RunCancelled(RuntimeError):
+    """Raised at a provider call boundary after the run has been cancelled."""
+
+
+class CancelToken:
+    """Cancel flag for one run."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "evagent_cancel_token", default=None
+)
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def provider_limit(provider: str) -> int:
+    env = os.getenv(f"EVAGENT_MAX_{provider.upper()}")
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    return DEFAULT_PROVIDER_LIMITS.get(provider, 4)
+
+
+def _slot(provider: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        sem = _slots.get(provider)
+        if sem is None:
+            sem = threading.BoundedSemaphore(provider_limit(provider))
+            _slots[provider] = sem
+        return sem
+
+
+@contextmanager
+def use_cancel_token(token: Optional[CancelToken]) -> Iterator[None]:
+    """Make ``token`` the current run's cancel token in this context."""
+    reset = _current_token.set(token)
+    try:
+        yield
+    finally:
+        _current_token.reset(reset)
+
+
+def is_cancelled() -> bool:
+    token = _current_token.get()
+    return token is not None and token.is_cancelled()
+
+
+def raise_if_cancelled() -> None:
+    if is_cancelled():
+        raise RunCancelled("run cancelled")
+
+
+class ThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks run in a copy of the submitting context,
+    so the current cancel token follows work into pool threads."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+@contextmanager
+def provider_slot(provider: str) -> Iterator[None]:
+    """Hold one of the provider's concurrency slots for the duration of a call."""
+    raise_if_cancelled()
+    sem = _slot(provider)
+    # Poll so a cancelled run does not stay blocked behind a saturated provider
+    while not sem.acquire(timeout=0.5):
+        raise_if_cancelled()
+    try:
+        raise_if_cancelled()
+        yield
+    finally:
+        sem.release()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Single-pass ESG fact extraction from search answer text
+
+One precompiled pattern tokenizes an answer into years, GHG scopes, rating
+grades and context keywords (net zero / carbon neutral, MSCI, CDP, rating /
+score); extract() walks the matches once and returns every field the ESG fact
+types need:
+
+- target_year: the year tied to a net-zero or carbon-neutral phrase ("by 2050
+  net zero", else "net zero by 2050", else a year shortly before the phrase);
+  otherwise the earliest year in 2024-2099, otherwise the earliest year found.
+- scopes: S1/S2/S3 from "Scope 1", "Scopes 1, 2 and 3", "Scopes 1, 2, and 3",
+  "Scope 1-3", "S3".
+- msci / cdp: the first grade on that agency's scale. Grades are matched
+  case-sensitively on word boundaries (the "a" in "a rating" or the A in
+  "A-list" is not a grade); a lone letter also needs a rating keyword shortly
+  before it or a "from/by <agency>" phrase right after it ("B from CDP").
+  Each grade is attributed to the agency of a directly following "from/by
+  <agency>" phrase, else to the nearest agency named before it in the same
+  sentence ("MSCI rating of BBB and a CDP score of B"): grades attributed to
+  the other agency are skipped, and ones attributed to the agency itself win
+  over unattributed ones. An unattributed grade only counts for agencies the
+  text names (any agency, if it names none), so "rated 'A' by MSCI" is not
+  also a CDP grade.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+YEAR_MIN, YEAR_MAX = 2024, 2099
+# Max distance (chars) from a keyword to the value it qualifies
+NET_ZERO_WINDOW = 60
+YEAR_ADJACENT = 3
+YEAR_BEFORE_WINDOW = 20
+GRADE_WINDOW = 40
+AGENCY_WINDOW = 80
+
+MSCI_GRADES = frozenset({"AAA", "AA", "A", "BBB", "BB", "B", "CCC"})
+CDP_GRADES = frozenset({"A", "A-", "A+", "B", "B-", "B+", "C", "C-", "C+", "D", "D-", "D+", "F"})
+
+_TOKEN_RE = re.compile(
+    # Cheap first-character filter: every token starts with one of these
+    r"(?=[2SsNnCcMmRrGgABDF])"
+    r"(?:(?P<year>(?<!\d)20[2-9]\d(?!\d))"
+    r"|(?P<scope>(?i:\bscopes?)\s*(?P<scope_nums>[123](?:\s*(?:,\s*(?:(?i:and)|&)|,|/|&|-|–|(?i:and|to))\s*[123])*)(?!\d))"
+    r"|(?<![\w])[Ss](?P<s_num>[123])(?![\w])"
+    r"|(?P<netzero>(?i:\bnet[\s-]?zero\b|\b(?:carbon|climate)[\s-]neutral(?:ity)?\b))"
+    r"|(?P<agency>(?i:\bMSCI\b|\bCDP\b))"
+    r"|(?P<context>(?i:\brat(?:ing|ings|ed)\b|\bscor(?:e|es|ed)\b|\bgrade[sd]?\b))"
+    r"|(?<![\w+\-])(?P<grade>(?:AAA|AA|A|BBB|BB|B|CCC|C|D|F)(?:[+-](?![\w+\-])|(?![\w+\-]))))"
+)
+_ARTICLE_RE = re.compile(r" [A-Za-z]")
+# "BBB from MSCI", "a B score from CDP", "rated C by CDP", "rated 'A' by MSCI"
+_FROM_AGENCY_RE = re.compile(
+    r"[\"'’”]?\s+(?:(?i:score|rating|grade)\s+)?(?i:from|by)\s+(?:(?i:the)\s+)?(?P<agency>(?i:MSCI|CDP))\b"
+)
+_SENTENCE_END_RE = re.compile(r"[.;!?](?:\s|$)")
+_SCOPE_PART_RE = re.compile(r"([123])(?:\s*(?:-|–|(?i:to))\s*([123]))?")
+
+
+def _scopes(nums: str) -> List[int]:
+    out: List[int] = []
+    for lo, hi in _SCOPE_PART_RE.findall(nums):
+        out.extend(range(int(lo), int(hi or lo) + 1))
+    return out
+
+
+def extract(text: Optional[str]) -> Dict[str, Any]:
+    """{"target_year", "years", "scopes", "msci", "cdp"} from one answer text."""
+    text = text or ""
+    years: List[int] = []
+    # Net-zero year candidates as (tier, year): 0 adjacent before, 1 after, 2 shortly before
+    netzero: List[tuple] = []
+    scopes = set()
+    # (start, end, grade, has a rating keyword before it) and (start, end, agency)
+    grades: List[tuple] = []
+    agencies: List[tuple] = []
+
+    netzero_end = last_year_end = context_end = -10**9
+
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "year":
+            year = int(m.group("year"))
+            years.append(year)
+            if m.start() - netzero_end <= NET_ZERO_WINDOW:
+                netzero.append((1, year))
+                netzero_end = -10**9
+            last_year_end = m.end()
+        elif kind == "scope":
+            scopes.update(_scopes(m.group("scope_nums")))
+        elif kind == "s_num":
+            scopes.add(int(m.group("s_num")))
+        elif kind == "netzero":
+            # "by 2050 net zero": a year just before the phrase
+            gap = m.start() - last_year_end
+            if years and gap <= YEAR_BEFORE_WINDOW:
+                netzero.append((0 if gap <= YEAR_ADJACENT else 2, years[-1]))
+            netzero_end = m.end()
+        elif kind == "agency":
+            agencies.append((m.start(), m.end(), m.group("agency").upper()))
+            context_end = m.end()
+        elif kind == "context":
+            context_end = m.end()
+        elif kind == "grade":
+            start = m.start()
+            if m.group("grade") == "A" and _ARTICLE_RE.match(text, m.end()) and (
+                start == 0 or text[start - 1] == "\n" or text[start - 2:start] in (". ", "! ", "? ")
+            ):
+                continue  # sentence-initial article: "A score of ...", "A CDP score ..."
+            grades.append((start, m.end(), m.group("grade"), start - context_end <= GRADE_WINDOW))
+
+    # Grades per agency, ranked (own agency nearest, then unattributed) by position
+    best: Dict[str, Any] = {"MSCI": None, "CDP": None}
+    named = {a[2] for a in agencies} or set(best)
+    for start, end, grade, has_context in grades:
+        m = _FROM_AGENCY_RE.match(text, end)
+        after = m is not None
+        near = m.group("agency").upper() if m else None
+        if near is None:
+            # Nearest agency named before the grade, within the same sentence
+            for a_start, a_end, name in reversed(agencies):
+                if a_end > start:
+                    continue
+                if start - a_end <= AGENCY_WINDOW and not _SENTENCE_END_RE.search(text, a_end, start):
+                    near = name
+                break
+        if len(grade) == 1 and not has_context and not after:
+            continue
+        for name, scale in (("MSCI", MSCI_GRADES), ("CDP", CDP_GRADES)):
+            if grade not in scale or (near != name if near is not None else name not in named):
+                continue
+            cand = (0 if near == name else 1, start, grade)
+            if best[name] is None or cand < best[name]:
+                best[name] = cand
+
+    tied = [c for c in netzero if YEAR_MIN <= c[1] <= YEAR_MAX]
+    if tied:
+        # Lowest tier; within a tier the first phrase in the text
+        target = min(tied, key=lambda c: c[0])[1]
+    else:
+        valid = [y for y in years if YEAR_MIN <= y <= YEAR_MAX]
+        target = min(valid) if valid else (min(years) if years else None)
+    return {
+        "target_year": target,
+        "years": years,
+        "scopes": [f"S{n}" for n in sorted(scopes)],
+        "msci": best["MSCI"][2] if best["MSCI"] else None,
+        "cdp": best["CDP"][2] if best["CDP"] else None,
+    }
+
+
+def extract_many(texts: Iterable[Optional[str]]) -> List[Dict[str, Any]]:
+    """extract() over many answers (e.g. a history backfill); identical texts are parsed once."""
+    seen: Dict[str, Dict[str, Any]] = {}
+    out = []
+    for text in texts:
+        key = text or ""
+        if key not in seen:
+            seen[key] = extract(key)
+        out.append(seen[key])
+    return out
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Slow-changing ESG fact store with per-fact TTLs
+
+- Facts are keyed by (subject, fact type): the subject is a region code or a
+  company name, the type one of FACT_TYPES (government net-zero policy,
+  corporate target, MSCI letter, CDP score).
+- Each fact keeps its parsed value plus provenance: the Tavily query, the
+  answer text it was parsed from and when it was fetched.
+- Facts expire per type; due() lists the keys that are missing or expired, so
+  callers re-fetch only those and a steady-state run makes no network calls.
+- Empty answers are stored too, with a short TTL, so a subject the search has
+  no answer for is not re-queried on every run. An empty re-fetch never
+  replaces a previous answer; the older fact is served until a fetch succeeds.
+
+- Hit rates of multi-subject (batched) queries are recorded per fact type and
+  batch size, decayed so recent runs dominate, for callers that plan batches.
+
+The store does not call Tavily; callers pass the fetch function.
+
+Env: EVAGENT_ESG_STORE_PATH, EVAGENT_ESG_TTL_<TYPE> (days, e.g. EVAGENT_ESG_TTL_MSCI=14),
+     EVAGENT_ESG_TTL_EMPTY (days, default 1),
+     EVAGENT_ESG_STORE=0 to bypass the store (always fetch, never store)
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Default TTL per fact type, in days
+FACT_TYPES: Dict[str, float] = {
+    "gov_policy": 90,   # government net-zero year / policy text, per region
+    "corp_target": 30,  # corporate target year and scopes, per OEM
+    "msci": 30,         # MSCI ESG letter rating, per OEM
+    "cdp": 90,          # CDP climate score (published yearly), per OEM
+}
+# TTL for facts whose search returned no answer
+EMPTY_TTL_DAYS = 1
+# Weight of earlier batch stats on each new record; stats older than the max age are ignored
+BATCH_STATS_DECAY = 0.8
+BATCH_STATS_MAX_AGE_DAYS = 30
+
+FactKey = Tuple[str, str]
+
+
+def _ttl_days(fact_type: str) -> float:
+    env = os.getenv(f"EVAGENT_ESG_TTL_{fact_type.upper()}")
+    if env:
+        try:
+            return float(env)
+        except ValueError:
+            pass
+    return EMPTY_TTL_DAYS if fact_type == "empty" else FACT_TYPES[fact_type]
+
+
+class ESGFactStore:
+    """SQLite-backed (subject, fact type) -> value store with provenance and expiry."""
+
+    def __init__(self, db_path: str, *, enabled: bool = True):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS facts ("
+                " subject TEXT NOT NULL, fact_type TEXT NOT NULL,"
+                " value TEXT NOT NULL, query TEXT NOT NULL, answer TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (subject, fact_type))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batch_stats ("
+                " fact_type TEXT NOT NULL, batch_size INTEGER NOT NULL,"
+                " queries REAL NOT NULL, subjects REAL NOT NULL, hits REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (fact_type, batch_size))"
+            )
+
+    def ttl_sec(self, fact_type: str, answer: str = "x") -> float:
+        return _ttl_days(fact_type if answer else "empty") * 86400
+
+    # ---- reads ----
+    def get(self, subject: str, fact_type: str) -> Optional[Dict[str, Any]]:
+        """Stored fact (fresh or not) as {value, query, answer, fetched_at, expires_at}."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, query, answer, fetched_at FROM facts WHERE subject = ? AND fact_type = ?",
+                (subject, fact_type),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "value": json.loads(row[0]),
+            "query": row[1],
+            "answer": row[2],
+            "fetched_at": row[3],
+            "expires_at": row[3] + self.ttl_sec(fact_type, row[2]),
+        }
+
+    def fresh(self, subject: str, fact_type: str) -> Optional[Dict[str, Any]]:
+        fact = self.get(subject, fact_type)
+        return fact if fact is not None and fact["expires_at"] > time.time() else None
+
+    def due(self, keys: Iterable[FactKey]) -> List[FactKey]:
+        """Keys with no stored fact or an expired one, i.e. what a refresh must fetch."""
+        return [k for k in keys if self.fresh(*k) is None]
+
+    def schedule(self) -> List[Tuple[str, str, float]]:
+        """All stored facts as (subject, fact_type, expires_at), soonest first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT subject, fact_type, answer, fetched_at FROM facts").fetchall()
+        return sorted(
+            ((s, t, at + self.ttl_sec(t, a)) for s, t, a, at in rows if t in FACT_TYPES),
+            key=lambda r: r[2],
+        )
+
+    # ---- writes ----
+    def put(self, subject: str, fact_type: str, value: Any, *, query: str, answer: str) -> Dict[str, Any]:
+        """Store a fact fetched now; returns it in get() form."""
+        fetched_at = time.time()
+        if self.enabled:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO facts (subject, fact_type, value, query, answer, fetched_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (subject, fact_type, json.dumps(value, ensure_ascii=False), query, answer, fetched_at),
+                )
+        return {
+            "value": value,
+            "query": query,
+            "answer": answer,
+            "fetched_at": fetched_at,
+            "expires_at": fetched_at + self.ttl_sec(fact_type, answer),
+        }
+
+    # ---- batched query stats ----
+    def record_batch(self, fact_type: str, batch_size: int, *, queries: int, subjects: int, hits: int) -> None:
+        """Add one run's batched queries: ``hits`` of ``subjects`` got a usable answer."""
+        if not self.enabled:
+            return
+        d = BATCH_STATS_DECAY
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO batch_stats (fact_type, batch_size, queries, subjects, hits, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(fact_type, batch_size) DO UPDATE SET"
+                " queries = queries * ? + excluded.queries, subjects = subjects * ? + excluded.subjects,"
+                " hits = hits * ? + excluded.hits, updated_at = excluded.updated_at",
+                (fact_type, batch_size, queries, subjects, hits, time.time(), d, d, d),
+            )
+
+    def batch_stats(self, fact_type: str) -> Dict[int, Dict[str, float]]:
+        """{batch_size: {queries, subjects, hits, hit_rate}} from recent runs (decayed counts)."""
+        if not self.enabled:
+            return {}
+        since = time.time() - BATCH_STATS_MAX_AGE_DAYS * 86400
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT batch_size, queries, subjects, hits FROM batch_stats"
+                " WHERE fact_type = ? AND updated_at >= ?",
+                (fact_type, since),
+            ).fetchall()
+        return {
+            size: {"queries": q, "subjects": n, "hits": h, "hit_rate": h / n if n else 0.0}
+            for size, q, n, h in rows
+        }
+
+    # ---- refresh ----
+    def lookup(
+        self,
+        subject: str,
+        fact_type: str,
+        query: str,
+        fetch: Optional[Callable[[str], Optional[str]]],
+        parse: Callable[[str], Any],
+    ) -> Dict[str, Any]:
+        """Fresh stored fact, else ``fetch(query)`` -> answer text, parsed and stored.
+
+        Stored facts are re-parsed from their answer text, so parser fixes apply
+        without re-fetching. Without ``fetch`` (no API key), or when it returns
+        None (the call failed), nothing is stored: the stored fact is returned
+        even if expired, and a missing one is parse("").
+        """
+        fact = self.fresh(subject, fact_type)
+        if fact is not None:
+            return {**fact, "value": parse(fact["answer"])}
+        stale = self.get(subject, fact_type)
+        if stale is not None:
+            stale["value"] = parse(stale["answer"])
+        missing = {"value": parse(""), "query": query, "answer": "", "fetched_at": None, "expires_at": None}
+        if fetch is None:
+            return stale or missing
+        answer = fetch(query)
+        with self._lock:
+            self.fetches += 1
+        if answer is None:
+            return stale or missing
+        answer = answer.strip()
+        if not answer and stale is not None and stale["answer"]:
+            # Keep the last real answer; it stays due, so the next run retries
+            return stale
+        return self.put(subject, fact_type, parse(answer), query=query, answer=answer)
+
+
+def _default_path() -> str:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.getenv("EVAGENT_ESG_STORE_PATH") or os.path.normpath(
+        os.path.join(base_dir, "..", "db", "esg_facts.sqlite")
+    )
+
+
+_store: Optional[ESGFactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_esg_store() -> ESGFactStore:
+    """Process-wide ESGFactStore (opened lazily on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ESGFactStore(_default_path(), enabled=os.getenv("EVAGENT_ESG_STORE", "1") != "0")
+        return _store
@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+"""
+Shared HTTP transport for agent API calls (stdlib only)
+
+- Keep-alive connections are pooled per (scheme, host, port) and reused across
+  calls and threads instead of opening a fresh TLS connection per request.
+- AdaptiveRateLimiter paces requests per provider: the rate grows slowly while
+  calls succeed and halves on HTTP 429, replacing fixed sleeps between calls.
+- call_json() adds the per-provider concurrency slot, retry with jittered
+  exponential backoff on 429/5xx and connection errors, and request metrics.
+- tavily_search() / openai_chat() are the single implementations used by all agents.
+- record_usage() / prompt_cache_metrics() track token usage and provider prompt-cache
+  hits; prompt_cache_warmup() lets one request warm a shared prefix before the rest.
+
+Env:
+  TAVILY_BASE_URL, OPENAI_BASE_URL   point providers at a local stub server
+  EVAGENT_HTTP_TIMEOUT               default timeout in seconds (30)
+  EVAGENT_HTTP_RETRIES               retries after the first attempt (3)
+  EVAGENT_HTTP_POOL_SIZE             idle connections kept per host (8)
+  EVAGENT_RATE_<PROVIDER>            initial requests/sec per provider (5)
+  EVAGENT_PROMPT_CACHE_WARMUP_TIMEOUT  max seconds to wait for a prefix warm-up (30)
+"""
+from __future__ import annotations
+
+import hashlib
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib import parse
+
+try:
+    from .concurrency import provider_slot, raise_if_cancelled
+except ImportError:
+    from concurrency import provider_slot, raise_if_cancelled
+
+DEFAULT_BASE_URLS: Dict[str, str] = {
+    "tavily": "https://api.tavily.com",
+    "openai": "https://api.openai.com/v1",
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TransportError(RuntimeError):
+    """Raised when a request fails after all retries (status is None for network errors)."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class Response(NamedTuple):
+    status: int
+    data: bytes
+    headers: Dict[str, str]
+
+    def json(self) -> Any:
+        return json.loads(self.data.decode("utf-8")) if self.data else None
+
+
+def base_url(provider: str) -> str:
+    """Provider base URL; <PROVIDER>_BASE_URL overrides it (e.g. a local stub server)."""
+    env = os.getenv(f"{provider.upper()}_BASE_URL")
+    return (env or DEFAULT_BASE_URLS[provider]).rstrip("/")
+
+
+class AdaptiveRateLimiter:
+    """AIMD request pacing: +``step`` req/s per success, x0.5 on throttle."""
+
+    def __init__(self, rate: float, *, min_rate: float = 0.5, max_rate: float = 20.0, step: float = 0.25):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.rate = min(max(rate, min_rate), max_rate)
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + 1.0 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            # Back off before the next request goes out
+            self._next = max(self._next, time.monotonic() + 1.0 / self.rate)
+
+
+class HTTPClient:
+    """Thread-safe HTTP client with a keep-alive connection pool."""
+
+    def __init__(self, *, timeout: float = 30.0, pool_size: int = 8):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._pools: Dict[Tuple[str, str, int], "queue.LifoQueue[http.client.HTTPConnection]"] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, key: Tuple[str, str, int]) -> "queue.LifoQueue[http.client.HTTPConnection]":
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = queue.LifoQueue(maxsize=self.pool_size)
+                self._pools[key] = pool
+            return pool
+
+    def _connect(self, key: Tuple[str, str, int], timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool(key).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Response:
+        """Send one request over a pooled connection (no retries)."""
+        u = parse.urlsplit(url)
+        scheme = u.scheme or "http"
+        port = u.port or (443 if scheme == "https" else 80)
+        key = (scheme, u.hostname or "", port)
+        path = u.path or "/"
+        if u.query:
+            path += "?" + u.query
+        hdrs = {"Connection": "keep-alive", **(headers or {})}
+        t = timeout if timeout is not None else self.timeout
+
+        # A pooled connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            try:
+                conn = self._pool(key).get_nowait()
+                conn.timeout = t
+                if conn.sock is not None:
+                    conn.sock.settimeout(t)
+                reused = True
+            except queue.Empty:
+                conn = self._connect(key, t)
+                reused = False
+            try:
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return Response(resp.status, data, {k.lower(): v for k, v in resp.getheaders()})
+        raise RuntimeError("unreachable")
+
+
+# ---------------------------------
+# Metrics
+# ---------------------------------
+_metrics: Dict[str, Dict[str, float]] = {}
+_metrics_lock = threading.Lock()
+
+
+def _record(provider: str, *, latency: float, status: Optional[int], retried: bool) -> None:
+    with _metrics_lock:
+        m = _metrics.setdefault(provider, {
+            "requests": 0, "errors": 0, "retries": 0, "throttled": 0,
+            "latency_total_sec": 0.0, "latency_max_sec": 0.0,
+        })
+        m["requests"] += 1
+        m["latency_total_sec"] += latency
+        m["latency_max_sec"] = max(m["latency_max_sec"], latency)
+        if status is None or status >= 400:
+            m["errors"] += 1
+        if status == 429:
+            m["throttled"] += 1
+        if retried:
+            m["retries"] += 1
+
+
+def http_metrics() -> Dict[str, Dict[str, float]]:
+    """Snapshot of per-provider request counts and latencies since the last reset."""
+    with _metrics_lock:
+        out = {}
+        for provider, m in _metrics.items():
+            snap = dict(m)
+            snap["latency_avg_sec"] = m["latency_total_sec"] / m["requests"] if m["requests"] else 0.0
+            out[provider] = snap
+        return out
+
+
+def reset_http_metrics() -> None:
+    with _metrics_lock:
+        _metrics.clear()
+
+
+# ---------------------------------
+# Prompt caching
+# ---------------------------------
+# OpenAI caches the longest previously seen prompt prefix (>= 1024 tokens) and
+# reports it as usage.prompt_tokens_details.cached_tokens. Callers that send the
+# same large context many times put it first (identical bytes), route requests
+# with the same prompt_cache_key, and let one request warm the prefix before
+# the rest fan out.
+PROMPT_CACHE_WARMUP_TIMEOUT = float(os.getenv("EVAGENT_PROMPT_CACHE_WARMUP_TIMEOUT", "30"))
+# How long a warmed prefix is treated as cached (OpenAI keeps prefixes ~5-10 min)
+PROMPT_CACHE_TTL = float(os.getenv("EVAGENT_PROMPT_CACHE_TTL", "300"))
+
+_usage: Dict[str, Dict[str, int]] = {}
+# key -> (warm-up event, monotonic time it was warmed or None while warming)
+_warmups: Dict[str, List[Any]] = {}
+_warmup_lock = threading.Lock()
+
+
+def prompt_cache_key(prefix: str) -> str:
+    """Stable routing key for requests sharing ``prefix``."""
+    return "evagent-" + hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:24]
+
+
+def record_usage(provider: str, usage: Optional[Dict[str, Any]]) -> None:
+    """Accumulate token usage from an OpenAI ``usage`` dict or langchain ``usage_metadata``."""
+    if not usage:
+        return
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens")) or 0
+    details = usage.get("prompt_tokens_details") or usage.get("input_token_details") or {}
+    cached = details.get("cached_tokens", details.get("cache_read")) or 0
+    completion = usage.get("completion_tokens", usage.get("output_tokens")) or 0
+    with _metrics_lock:
+        u = _usage.setdefault(provider, {
+            "requests": 0, "cache_hits": 0, "prompt_tokens": 0,
+            "cached_tokens": 0, "completion_tokens": 0,
+        })
+        u["requests"] += 1
+        u["prompt_tokens"] += int(prompt)
+        u["cached_tokens"] += int(cached)
+        u["completion_tokens"] += int(completion)
+        if cached:
+            u["cache_hits"] += 1
+
+
+def prompt_cache_metrics() -> Dict[str, Dict[str, float]]:
+    """Snapshot of per-provider token usage and prompt-cache hits since the last reset."""
+    with _metrics_lock:
+        out = {}
+        for provider, u in _usage.items():
+            snap: Dict[str, float] = dict(u)
+            snap["hit_rate"] = u["cache_hits"] / u["requests"] if u["requests"] else 0.0
+            snap["cached_ratio"] = u["cached_tokens"] / u["prompt_tokens"] if u["prompt_tokens"] else 0.0
+            out[provider] = snap
+        return out
+
+
+def reset_prompt_cache_metrics() -> None:
+    with _metrics_lock:
+        _usage.clear()
+
+
+@contextmanager
+def prompt_cache_warmup(key: str, timeout: Optional[float] = None) -> Iterator[Callable[[], None]]:
+    """Let the first request for ``key`` populate the provider cache before the others.
+
+    The first caller proceeds immediately and should call the yielded ``warmed()``
+    once the provider has processed its prompt (first streamed token or response).
+    Later callers block until then, or ``timeout`` seconds, and proceed regardless.
+    Wait here before taking a provider slot so waiters do not hold one. A warmed
+    key stays set for PROMPT_CACHE_TTL seconds, so callers in that window do not
+    wait; after it the next caller warms the prefix again. Expired keys are
+    dropped, so the map only holds prefixes warmed recently or still warming.
+    """
+    with _warmup_lock:
+        now = time.monotonic()
+        for k in [k for k, (_, at) in _warmups.items() if at is not None and now - at > PROMPT_CACHE_TTL]:
+            del _warmups[k]
+        entry = _warmups.get(key)
+        first = entry is None
+        if first:
+            entry = _warmups[key] = [threading.Event(), None]
+    event = entry[0]
+
+    def warmed() -> None:
+        with _warmup_lock:
+            if entry[1] is None:
+                entry[1] = time.monotonic()
+        event.set()
+
+    if not first:
+        event.wait(PROMPT_CACHE_WARMUP_TIMEOUT if timeout is None else timeout)
+    done = warmed if first else event.set
+    try:
+        yield done
+    finally:
+        done()
+
+
+# ---------------------------------
+# Shared client / limiters
+# ---------------------------------
+_client: Optional[HTTPClient] = None
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Process-wide pooled client shared by all agents."""
+    global _client
+    with _registry_lock:
+        if _client is None:
+            _client = HTTPClient(
+                timeout=float(os.getenv("EVAGENT_HTTP_TIMEOUT", "30")),
+                pool_size=int(os.getenv("EVAGENT_HTTP_POOL_SIZE", "8")),
+            )
+        return _client
+
+
+def rate_limiter(provider: str, default_rate: float = 5.0) -> AdaptiveRateLimiter:
+    """Process-wide adaptive limiter per provider (initial rate: EVAGENT_RATE_<PROVIDER>)."""
+    with _registry_lock:
+        lim = _limiters.get(provider)
+        if lim is None:
+            rate = float(os.getenv(f"EVAGENT_RATE_{provider.upper()}", str(default_rate)))
+            lim = AdaptiveRateLimiter(rate)
+            _limiters[provider] = lim
+        return lim
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str]) -> float:
+    if retry_after:
+        try:
+            return min(30.0, float(retry_after))
+        except ValueError:
+            pass
+    # Full jitter around an exponential base, capped
+    return min(8.0, 0.5 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+def call_json(
+    provider: str,
+    path: str,
+    payload: Dict[str, Any],
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+) -> Any:
+    """POST JSON to <provider base URL><path> and return the decoded response.
+
+    Paces each attempt with the provider's adaptive limiter, then holds the
+    provider's concurrency slot for the request itself, and retries
+    429/5xx/network errors with jittered backoff. Raises TransportError once
+    retries are exhausted.
+    """
+    url = base_url(provider) + path
+    body = json.dumps(payload).encode("utf-8")
+    hdrs = {"Content-Type": "application/json", **(headers or {})}
+    max_retries = int(os.getenv("EVAGENT_HTTP_RETRIES", "3")) if retries is None else retries
+    limiter = rate_limiter(provider)
+    client = get_http_client()
+
+    for attempt in range(max_retries + 1):
+        raise_if_cancelled()
+        status: Optional[int] = None
+        retry_after: Optional[str] = None
+        started = time.perf_counter()
+        try:
+            # Pace before taking a slot, so a throttled limiter does not sleep holding one
+            limiter.acquire()
+            with provider_slot(provider):
+                resp = client.request("POST", url, body=body, headers=hdrs, timeout=timeout)
+            status = resp.status
+            retry_after = resp.headers.get("retry-after")
+            error = f"HTTP {status}"
+        except (OSError, http.client.HTTPException) as e:
+            error = f"{type(e).__name__}: {e}"
+        _record(provider, latency=time.perf_counter() - started, status=status, retried=attempt > 0)
+
+        if status is not None and status < 400:
+            limiter.on_success()
+            try:
+                return resp.json()
+            except ValueError as e:
+                raise TransportError(f"{provider}: invalid JSON response", status) from e
+        if status == 429:
+            limiter.on_throttle()
+        if (status is not None and status not in RETRY_STATUSES) or attempt == max_retries:
+            raise TransportError(f"{provider}: {error}", status)
+        time.sleep(_backoff_delay(attempt, retry_after))
+    raise TransportError(f"{provider}: retries exhausted")
+
+
+# ---------------------------------
+# Provider helpers
+# ---------------------------------
+def tavily_search(
+    query: str,
+    *,
+    depth: str = "basic",
+    include_domains: Optional[List[str]] = None,
+    max_results: int = 5,
+    raise_errors: bool = False,
+) -> Dict[str, Any]:
+    """Call Tavily /search; return JSON dict (or {}).
+
+    With raise_errors, a failed call raises TransportError instead of returning
+    {}, so callers can tell it apart from a search with no answer.
+    """
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        return {}
+    payload: Dict[str, Any] = {
+        "api_key": api_key,
+        "query": query,
+        "max_results": max_results,
+        "include_answer": True,
+        "search_depth": depth,
+    }
+    if include_domains:
+        payload["include_domains"] = include_domains
+    try:
+        data = call_json("tavily", "/search", payload, timeout=30)
+    except TransportError:
+        if raise_errors:
+            raise
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def openai_chat_completion(payload: Dict[str, Any], *, timeout: float = 60) -> Dict[str, Any]:
+    """POST /chat/completions; return the raw response dict (raises on failure)."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise TransportError("OPENAI_API_KEY not set")
+    data = call_json(
+        "openai", "/chat/completions", payload,
+        headers={"Authorization": f"Bearer {api_key}"}, timeout=timeout,
+    )
+    if isinstance(data, dict):
+        record_usage("openai", data.get("usage"))
+    return data
+
+
+def openai_chat(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.3,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Call OpenAI Chat API; return assistant message content ("" without a key, "Error: ..." on failure)."""
+    if not os.getenv("OPENAI_API_KEY"):
+        return ""
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+    }
+    if response_format:
+        payload["response_format"] = response_format
+    try:
+        data = openai_chat_completion(payload)
+        return data.get("choices", [{}])[0].get("message", {}).get("content", "") or ""
+    except (TransportError, AttributeError, IndexError, TypeError) as e:
+        return f"Error: {e}"
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized multi-ticker market analytics
+
+All ticker histories are aligned on one date index (union of trading days,
+short gaps forward-filled) and every metric is computed column-wise in one
+pass over the wide close-price frame, so cost grows with rows x tickers in
+NumPy rather than with Python loops per ticker.
+
+Per ticker: 5d / 20d returns, annualized volatility (whole window and latest
+20d), max and current drawdown. Per group (OEM, Battery, HVAC, suppliers):
+equal-weight index returns, and the Pearson correlation between group
+indices plus the mean OEM-vs-supplier pairwise return correlation.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+# Forward-fill at most this many missing days (exchange holidays) when aligning
+MAX_FILL_DAYS = 3
+ROLLING_WINDOW = 20
+
+
+def align_closes(histories: Dict[str, Any]) -> pd.DataFrame:
+    """{ticker: OHLCV frame} -> wide Close frame on a common, tz-naive date index."""
+    columns = {}
+    for ticker, hist in histories.items():
+        if hist is None or getattr(hist, "empty", True) or "Close" not in hist:
+            continue
+        close = hist["Close"].astype(float)
+        index = pd.DatetimeIndex(close.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        close.index = index.normalize()
+        columns[ticker] = close[~close.index.duplicated(keep="last")]
+    if not columns:
+        return pd.DataFrame()
+    closes = pd.DataFrame(columns).sort_index()
+    return closes.ffill(limit=MAX_FILL_DAYS)
+
+
+def _round(x: Any, digits: int = 2) -> Optional[float]:
+    return None if x is None or pd.isna(x) else round(float(x), digits)
+
+
+def ticker_metrics(closes: pd.DataFrame) -> pd.DataFrame:
+    """Per-ticker metrics (rows = tickers) from an aligned close frame, in percent."""
+    returns = closes.pct_change(fill_method=None)
+    filled = closes.ffill()
+    last = filled.iloc[-1]
+    first = closes.bfill().iloc[0]
+    drawdown = closes / closes.cummax() - 1
+
+    def _trailing(days: int) -> pd.Series:
+        # Last price vs. `days` rows of the common index earlier
+        if len(filled) <= days:
+            return pd.Series(np.nan, index=closes.columns)
+        return last / filled.iloc[-days - 1] - 1
+
+    metrics = pd.DataFrame({
+        "return_period": last / first - 1,
+        "return_5d": _trailing(5),
+        "return_20d": _trailing(ROLLING_WINDOW),
+        "volatility": returns.std() * np.sqrt(TRADING_DAYS),
+        "volatility_20d": returns.rolling(ROLLING_WINDOW, min_periods=2).std().ffill().iloc[-1]
+        * np.sqrt(TRADING_DAYS),
+        "max_drawdown": drawdown.min(),
+        "current_drawdown": drawdown.ffill().iloc[-1],
+    })
+    return metrics * 100
+
+
+def group_correlations(returns: pd.DataFrame, groups: Dict[str, List[str]]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Correlation matrix of equal-weight group index returns -> {group: {group: corr}}."""
+    index_returns = pd.DataFrame({
+        name: returns[[t for t in tickers if t in returns]].mean(axis=1)
+        for name, tickers in groups.items()
+        if any(t in returns for t in tickers)
+    })
+    corr = index_returns.corr(min_periods=5)
+    return {a: {b: _round(v, 3) for b, v in row.items()} for a, row in corr.to_dict(orient="index").items()}
+
+
+def compute_market_analytics(
+    histories: Dict[str, Any],
+    categories: Dict[str, str],
+) -> Dict[str, Any]:
+    """Analytics for all tickers at once.
+
+    histories: {ticker: OHLCV frame}; categories: {ticker: "OEM" | "Battery" | "HVAC"}.
+    Returns {"per_ticker": {ticker: {metric_pct: value}}, "groups": {group: {...}},
+    "group_correlation": {group: {group: corr}}, "oem_supplier_correlation": float|None,
+    "oem_supplier_pairwise_mean": float|None, "observations": int}.
+    """
+    closes = align_closes(histories)
+    if closes.empty:
+        return {"per_ticker": {}, "groups": {}, "group_correlation": {},
+                "oem_supplier_correlation": None, "oem_supplier_pairwise_mean": None, "observations": 0}
+
+    returns = closes.pct_change(fill_method=None)
+    metrics = ticker_metrics(closes)
+    per_ticker = {
+        t: {f"{k}_pct": _round(v) for k, v in row.items()}
+        for t, row in metrics.to_dict(orient="index").items()
+    }
+
+    oems = [t for t in closes if categories.get(t) == "OEM"]
+    suppliers = [t for t in closes if categories.get(t) not in (None, "OEM")]
+    groups: Dict[str, List[str]] = {"OEM": oems, "Supplier": suppliers}
+    for t in suppliers:
+        groups.setdefault(categories[t], []).append(t)
+
+    group_stats = {}
+    for name, tickers in groups.items():
+        if not tickers:
+            continue
+        m = metrics.loc[tickers]
+        group_stats[name] = {
+            "tickers": len(tickers),
+            "avg_return_period_pct": _round(m["return_period"].mean()),
+            "avg_volatility_pct": _round(m["volatility"].mean()),
+            "worst_max_drawdown_pct": _round(m["max_drawdown"].min()),
+        }
+
+    correlation = group_correlations(returns, groups)
+    oem_supplier = (correlation.get("OEM") or {}).get("Supplier")
+
+    pairwise = None
+    if oems and suppliers:
+        # OEM x supplier block of the full return correlation matrix
+        block = returns[oems + suppliers].corr(min_periods=5).loc[oems, suppliers].to_numpy()
+        if np.isfinite(block).any():
+            pairwise = round(float(np.nanmean(block)), 3)
+
+    return {
+        "per_ticker": per_ticker,
+        "groups": group_stats,
+        "group_correlation": correlation,
+        "oem_supplier_correlation": oem_supplier,
+        "oem_supplier_pairwise_mean": pairwise,
+        "observations": int(returns.dropna(how="all").shape[0]),
+    }
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Local daily OHLCV store with incremental refresh
+
+- Rows are keyed by (ticker, date) in a SQLite file; a coverage table records
+  the date range already requested per ticker and when it was last refreshed.
+- histories() serves any window (3mo, 1y, 5y, ...) from the store and only
+  downloads what is missing: the full window for new tickers, the tail since
+  the last stored day once coverage is older than the max age, and the head
+  when a longer window than before is asked for. Tickers needing the same
+  range share one bulk download.
+- Windows are anchored at each ticker's last stored day, so offline re-runs
+  (EVAGENT_PRICE_OFFLINE=1, or a failed download) return the same frames.
+
+The store does not import yfinance; callers pass the downloader.
+
+Env: EVAGENT_PRICE_STORE_PATH, EVAGENT_PRICE_MAX_AGE (seconds, default 21600),
+     EVAGENT_PRICE_OFFLINE
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# fetch(tickers, period=..., start=..., end=...) -> {ticker: OHLCV frame indexed by date}
+Downloader = Callable[..., Dict[str, Any]]
+
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+
+def period_start(period: str, anchor: date) -> date:
+    """First day of a yfinance-style ``period`` ending at ``anchor`` (1d..Ny, ytd, max)."""
+    if period == "max":
+        return date(1900, 1, 1)
+    if period == "ytd":
+        return date(anchor.year, 1, 1)
+    m = _PERIOD_RE.match(period)
+    if not m:
+        raise ValueError(f"unsupported period {period!r}")
+    n, unit = int(m.group(1)), m.group(2)
+    if unit == "d":
+        return anchor - timedelta(days=n)
+    if unit == "wk":
+        return anchor - timedelta(weeks=n)
+    months = n if unit == "mo" else 12 * n
+    return (pd.Timestamp(anchor) - pd.DateOffset(months=months)).date()
+
+
+def _day(value: Any) -> str:
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+class PriceStore:
+    """SQLite-backed daily OHLCV store with per-ticker coverage tracking."""
+
+    def __init__(self, db_path: str, *, max_age_sec: float = 6 * 3600, offline: bool = False):
+        self.db_path = db_path
+        self.max_age_sec = max_age_sec
+        self.offline = offline
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ohlcv ("
+                " ticker TEXT NOT NULL, date TEXT NOT NULL,"
+                " open REAL, high REAL, low REAL, close REAL, volume REAL,"
+                " PRIMARY KEY (ticker, date))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                " ticker TEXT PRIMARY KEY, start TEXT NOT NULL, end TEXT NOT NULL,"
+                " refreshed_at REAL NOT NULL)"
+            )
+
+    # ---- reads ----
+    def coverage(self, ticker: str) -> Optional[Tuple[str, str, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT start, end, refreshed_at FROM coverage WHERE ticker = ?", (ticker,)
+            ).fetchone()
+
+    def frame(self, ticker: str, start: Optional[str] = None) -> pd.DataFrame:
+        """Stored rows for ``ticker`` from ``start`` (inclusive) as a Date-indexed OHLCV frame."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, open, high, low, close, volume FROM ohlcv"
+                " WHERE ticker = ? AND date >= ? ORDER BY date",
+                (ticker, start or ""),
+            ).fetchall()
+        index = pd.DatetimeIndex([r[0] for r in rows], name="Date")
+        return pd.DataFrame([r[1:] for r in rows], index=index, columns=COLUMNS)
+
+    # ---- writes ----
+    def put(self, ticker: str, frame: Any, *, start: Optional[str] = None) -> None:
+        """Upsert rows and extend coverage to [start or first row, last row]."""
+        if frame is None or frame.empty:
+            return
+        frame = frame.dropna(subset=["Close"])
+        if frame.empty:
+            return
+        rows = [
+            (ticker, _day(ts), *(None if pd.isna(v) else float(v) for v in values))
+            for ts, values in zip(frame.index, frame.reindex(columns=COLUMNS).itertuples(index=False))
+        ]
+        first, last = rows[0][1], rows[-1][1]
+        lo = min(first, start) if start else first
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ohlcv (ticker, date, open, high, low, close, volume)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT INTO coverage (ticker, start, end, refreshed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(ticker) DO UPDATE SET"
+                " start = MIN(start, excluded.start), end = MAX(end, excluded.end),"
+                " refreshed_at = excluded.refreshed_at",
+                (ticker, lo, last, time.time()),
+            )
+
+    # ---- incremental refresh ----
+    def _plan(self, tickers: Iterable[str], period: str) -> Dict[Tuple[Any, ...], List[str]]:
+        """Group tickers by the download they need: ("full",), ("tail", start), ("head", start, end)."""
+        plan: Dict[Tuple[Any, ...], List[str]] = {}
+        now = time.time()
+        for ticker in tickers:
+            cov = self.coverage(ticker)
+            if cov is None:
+                plan.setdefault(("full",), []).append(ticker)
+                continue
+            start, end, refreshed_at = cov
+            want = period_start(period, datetime.strptime(end, "%Y-%m-%d").date()).isoformat()
+            if want < start:
+                plan.setdefault(("head", want, start), []).append(ticker)
+            if now - refreshed_at > self.max_age_sec:
+                # Re-fetch the last stored day too: it may have been an intraday snapshot
+                plan.setdefault(("tail", end), []).append(ticker)
+        return plan
+
+    def refresh(self, tickers: List[str], period: str, fetch: Downloader) -> None:
+        """Download only what ``period`` needs beyond the stored coverage."""
+        if self.offline:
+            return
+        for job, group in self._plan(tickers, period).items():
+            if job[0] == "full":
+                kwargs: Dict[str, Any] = {"period": period}
+            elif job[0] == "tail":
+                kwargs = {"start": job[1]}
+            else:
+                kwargs = {"start": job[1], "end": job[2]}
+            try:
+                frames = fetch(group, **kwargs) or {}
+            except Exception as e:
+                print(f"[PriceStore] {job[0]} download failed for {len(group)} tickers: {e}")
+                continue
+            frames = {t: f for t, f in frames.items() if f is not None and not f.empty}
+            if not frames and job[0] != "head":
+                # yfinance returns nothing instead of raising on provider/network
+                # failures; a tail always includes the last stored day, so leave them due
+                print(f"[PriceStore] {job[0]} download returned no rows for {len(group)} tickers")
+                continue
+            self.downloads += 1
+            # put() marks the tickers that came back as refreshed; the rest stay due
+            for ticker, frame in frames.items():
+                if job[0] == "full":
+                    # The whole window was requested, even if the listing starts later
+                    start = period_start(period, pd.Timestamp(frame.index[-1]).date()).isoformat()
+                else:
+                    start = job[1] if job[0] == "head" else None
+                self.put(ticker, frame, start=start)
+            if job[0] == "head":
+                # Nothing earlier may exist (listed later): remember the range was asked for
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "UPDATE coverage SET start = MIN(start, ?) WHERE ticker = ?",
+                        [(job[1], t) for t in group],
+                    )
+
+    def histories(self, tickers: List[str], period: str, fetch: Optional[Downloader] = None) -> Dict[str, pd.DataFrame]:
+        """{ticker: frame} for the ``period`` window ending at each ticker's last stored day.
+
+        With ``fetch``, missing ranges are downloaded first; tickers with no stored
+        rows afterwards are left out.
+        """
+        if fetch is not None:
+            self.refresh(tickers, period, fetch)
+        out: Dict[str, pd.DataFrame] = {}
+        for ticker in tickers:
+            cov = self.coverage(ticker)
+            if cov is None:
+                continue
+            start = period_start(period, datetime.strptime(cov[1], "%Y-%m-%d").date()).isoformat()
+            frame = self.frame(ticker, start)
+            if not frame.empty:
+                out[ticker] = frame
+        return out
+
+
+def _default_path() -> str:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.getenv("EVAGENT_PRICE_STORE_PATH") or os.path.normpath(
+        os.path.join(base_dir, "..", "db", "price_store.sqlite")
+    )
+
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    """Process-wide PriceStore (opened lazily on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore(
+                _default_path(),
+                max_age_sec=float(os.getenv("EVAGENT_PRICE_MAX_AGE", "21600")),
+                offline=os.getenv("EVAGENT_PRICE_OFFLINE", "0") == "1",
+            )
+        return _store
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed result cache for agent pipeline stages
+
+- Entries are keyed by sha256 of (stage, key parts), e.g. company, domain,
+  query terms, model and prompt hash, and stored as JSON in a SQLite file.
+- Entries expire after a TTL; the store is size-bounded and evicts least
+  recently used entries first.
+- Mode (process-wide, set by app.py --cache-mode or EVAGENT_CACHE_MODE):
+    off        no reads, no writes
+    read       serve hits, never write
+    readwrite  serve hits, store misses (default)
+    refresh    ignore existing entries, store fresh results
+
+Env: EVAGENT_CACHE_PATH, EVAGENT_CACHE_TTL (seconds, default 86400),
+     EVAGENT_CACHE_MAX_MB (default 256)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+CACHE_MODES = ("off", "read", "readwrite", "refresh")
+
+_mode: str = os.getenv("EVAGENT_CACHE_MODE", "readwrite")
+
+
+def set_cache_mode(mode: str) -> None:
+    global _mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"cache mode must be one of {CACHE_MODES}, got {mode!r}")
+    _mode = mode
+
+
+def get_cache_mode() -> str:
+    return _mode if _mode in CACHE_MODES else "readwrite"
+
+
+def content_hash(*parts: Any) -> str:
+    """Stable sha256 over JSON-serializable parts (used for prompt hashes and keys)."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _default_path() -> str:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.getenv("EVAGENT_CACHE_PATH") or os.path.normpath(
+        os.path.join(base_dir, "..", "db", "result_cache.sqlite")
+    )
+
+
+class ResultCache:
+    """SQLite-backed stage cache with TTL expiry and size-bounded LRU eviction."""
+
+    def __init__(self, db_path: str, *, ttl_sec: float = 86400, max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, stage TEXT NOT NULL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (accessed_at)")
+
+    @staticmethod
+    def make_key(stage: str, key_parts: Dict[str, Any]) -> str:
+        return content_hash(stage, key_parts)
+
+    def get(self, stage: str, key_parts: Dict[str, Any]) -> Optional[Any]:
+        if get_cache_mode() not in ("read", "readwrite"):
+            return None
+        key = self.make_key(stage, key_parts)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_sec:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, stage: str, key_parts: Dict[str, Any], value: Any) -> None:
+        if get_cache_mode() not in ("readwrite", "refresh"):
+            return
+        key = self.make_key(stage, key_parts)
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, stage, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, raw, len(raw), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds the lock and an open transaction
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_sec,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM results ORDER BY accessed_at ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def cached(
+        self,
+        stage: str,
+        key_parts: Dict[str, Any],
+        compute: Callable[[], Any],
+        *,
+        cacheable: Callable[[Any], bool] = bool,
+    ) -> Any:
+        """Return the cached value for (stage, key_parts) or compute and store it.
+
+        Results rejected by ``cacheable`` (e.g. empty or error responses) are returned
+        but not stored.
+        """
+        hit = self.get(stage, key_parts)
+        if hit is not None:
+            return hit
+        value = compute()
+        if cacheable(value):
+            self.put(stage, key_parts, value)
+        return value
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide ResultCache (opened lazily on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                _default_path(),
+                ttl_sec=float(os.getenv("EVAGENT_CACHE_TTL", "86400")),
+                max_bytes=int(float(os.getenv("EVAGENT_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            )
+        return _cache
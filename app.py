@@ -8,6 +8,7 @@ Usage:
     python app.py                          # All OEMs from whitelist
     python app.py --regions "KR,CN,JP"     # Custom regions
     python app.py --oems "Tesla,BMW"       # Specific OEMs only
+    python app.py --cache-mode refresh     # Ignore cached search/LLM results
 """
 
 import os
@@ -24,6 +25,7 @@ sys.path.insert(0, AGENTS_DIR)
 
 from agents.SupervisorAgent import run_supervisor
 from agents.ReportWriterAgent import run_report_writer
+from agents.result_cache import CACHE_MODES, get_cache_mode, set_cache_mode
 
 
 def load_oem_companies() -> list[str]:
@@ -62,6 +64,7 @@ Examples:
   python app.py --oems "Tesla,BMW,Ford"      # Specific OEMs only
   python app.py --regions "KR,CN,JP"         # Custom regions
   python app.py --skip-report                # Skip PDF generation
+  python app.py --cache-mode off             # Always call Tavily/OpenAI
         """
     )
     parser.add_argument(
@@ -87,8 +90,17 @@ Examples:
         action="store_true",
         help="Skip PDF report generation"
     )
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        default=None,
+        help="Search/LLM result cache: off, read, readwrite, refresh "
+             "(default: EVAGENT_CACHE_MODE or readwrite)"
+    )
     
     args = parser.parse_args()
+    if args.cache_mode:
+        set_cache_mode(args.cache_mode)
     
     # Load OEMs
     if args.oems:
@@ -114,6 +126,7 @@ Examples:
         print(f"  {i}. {company}")
     print(f"\nESG Regions: {', '.join(regions)}")
     print(f"Output: {args.out_dir}")
+    print(f"Cache mode: {get_cache_mode()}")
     print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 80)
     
@@ -0,0 +1,231 @@
+"""
+Report generation job queue (table: report_jobs)
+
+- POST /api/reports/generate only enqueues a job; worker.py processes claim
+  and run it, so the agent pipeline never runs inside the API process.
+- Requests for the same company share the queued or running job instead of
+  starting another pipeline run (the report depends only on the company). A partial unique index
+  on dedup_key keeps this true across concurrent API processes.
+- Claims are atomic: SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL plus a
+  conditional UPDATE (status still 'queued'), so no two workers take one job.
+- Running jobs heartbeat; a job whose worker died or stopped heartbeating is
+  re-queued, or failed once it has used REPORT_JOB_MAX_ATTEMPTS attempts.
+
+Env: REPORT_JOB_MAX_ATTEMPTS (default 2), REPORT_JOB_STALE_SEC (default 300)
+"""
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import AIReport as AIReportModel, ReportJob as ReportJobModel
+
+ACTIVE_STATUSES = ("queued", "running")
+MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "2"))
+STALE_SEC = int(os.getenv("REPORT_JOB_STALE_SEC", "300"))
+
+
+def dedup_key(request) -> str:
+    """Hash of the normalized ReportGenerateRequest
+
+    Only the company: the worker generates the same report whatever oem_id or
+    include_sections say, so they must not split identical work into two jobs.
+    """
+    payload = {
+        "company": " ".join((request.company_name or "").split()).lower(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def active_job(db: Session, key: str) -> Optional[ReportJobModel]:
+    return (
+        db.query(ReportJobModel)
+        .filter(ReportJobModel.dedup_key == key, ReportJobModel.status.in_(ACTIVE_STATUSES))
+        .first()
+    )
+
+
+def enqueue_report_job(db: Session, request, requested_by: Optional[str] = None) -> Tuple[ReportJobModel, bool]:
+    """Queue a report job; returns (job, created). An identical in-flight job is returned as is."""
+    key = dedup_key(request)
+    existing = active_job(db, key)
+    if existing:
+        return existing, False
+
+    report_code = f"RPT-{uuid.uuid4().hex[:8].upper()}"
+    report = AIReportModel(
+        report_code=report_code,
+        oem_id=request.oem_id,
+        title=f"Analysis Report: {request.company_name}",
+        html_path=f"/reports/{report_code}.html"
+    )
+    db.add(report)
+    db.flush()
+    job = ReportJobModel(
+        report_id=report.report_id,
+        dedup_key=key,
+        company_name=request.company_name,
+        oem_id=request.oem_id,
+        params=json.dumps(request.dict(), ensure_ascii=False),
+        requested_by=requested_by,
+        status="queued",
+        progress=0,
+        stage="queued",
+        attempts=0,
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request queued the same job first
+        db.rollback()
+        existing = active_job(db, key)
+        if existing:
+            return existing, False
+        raise
+    db.refresh(job)
+    return job, True
+
+
+def queue_position(db: Session, job: ReportJobModel) -> Optional[int]:
+    """1-based position among queued jobs (None unless queued)"""
+    if job.status != "queued":
+        return None
+    ahead = (
+        db.query(ReportJobModel)
+        .filter(
+            ReportJobModel.status == "queued",
+            ReportJobModel.created_at < job.created_at,
+            ReportJobModel.job_id != job.job_id,
+        )
+        .count()
+    )
+    return ahead + 1
+
+
+def claim_next_job(db: Session, worker_id: str, candidates: int = 8) -> Optional[ReportJobModel]:
+    """Atomically move the oldest queued job to running for ``worker_id``"""
+    rows = (
+        db.query(ReportJobModel.job_id)
+        .filter(ReportJobModel.status == "queued")
+        .order_by(ReportJobModel.created_at)
+        .limit(candidates)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    now = datetime.now()
+    for (job_id,) in rows:
+        claimed = (
+            db.query(ReportJobModel)
+            .filter(ReportJobModel.job_id == job_id, ReportJobModel.status == "queued")
+            .update({
+                ReportJobModel.status: "running",
+                ReportJobModel.worker_id: worker_id,
+                ReportJobModel.attempts: ReportJobModel.attempts + 1,
+                ReportJobModel.progress: 0,
+                ReportJobModel.stage: "claimed",
+                ReportJobModel.error: None,
+                ReportJobModel.started_at: now,
+                ReportJobModel.heartbeat_at: now,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return db.get(ReportJobModel, job_id)
+    db.commit()
+    return None
+
+
+def _owned(db: Session, job_id: str, worker_id: str):
+    return db.query(ReportJobModel).filter(
+        ReportJobModel.job_id == job_id,
+        ReportJobModel.worker_id == worker_id,
+        ReportJobModel.status == "running",
+    )
+
+
+def heartbeat(db: Session, job_id: str, worker_id: str,
+              progress: Optional[int] = None, stage: Optional[str] = None) -> bool:
+    """Refresh the heartbeat (and progress); False if the job is no longer this worker's"""
+    values = {ReportJobModel.heartbeat_at: datetime.now()}
+    if progress is not None:
+        values[ReportJobModel.progress] = max(0, min(100, int(progress)))
+    if stage is not None:
+        values[ReportJobModel.stage] = stage
+    updated = _owned(db, job_id, worker_id).update(values, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def complete_job(db: Session, job_id: str, worker_id: str,
+                 html_path: str, html_content: Optional[str]) -> bool:
+    job = _owned(db, job_id, worker_id).first()
+    if not job:
+        return False
+    report = db.get(AIReportModel, job.report_id)
+    if report:
+        report.html_path = html_path
+        if html_content:
+            report.html_content = html_content
+    job.status = "succeeded"
+    job.progress = 100
+    job.stage = "done"
+    job.finished_at = datetime.now()
+    db.commit()
+    return True
+
+
+def fail_job(db: Session, job_id: str, worker_id: str, error: str) -> bool:
+    """Record a failed attempt: re-queued while attempts remain, else failed"""
+    job = _owned(db, job_id, worker_id).first()
+    if not job:
+        return False
+    _retry_or_fail(job, error)
+    db.commit()
+    return True
+
+
+def release_job(db: Session, job_id: str, worker_id: str) -> bool:
+    """Put a job back in the queue without using up an attempt (worker shutdown)"""
+    updated = _owned(db, job_id, worker_id).update({
+        ReportJobModel.status: "queued",
+        ReportJobModel.worker_id: None,
+        ReportJobModel.stage: "requeued",
+        ReportJobModel.attempts: ReportJobModel.attempts - 1,
+    }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def _retry_or_fail(job: ReportJobModel, error: str) -> None:
+    job.error = error[:4000]
+    job.worker_id = None
+    if job.attempts < MAX_ATTEMPTS:
+        job.status = "queued"
+        job.stage = "retry"
+    else:
+        job.status = "failed"
+        job.stage = "failed"
+        job.finished_at = datetime.now()
+
+
+def recover_jobs(db: Session, worker_id: Optional[str] = None, stale_sec: Optional[int] = None) -> int:
+    """Re-queue (or fail) running jobs of a dead worker, or with no heartbeat for ``stale_sec``"""
+    query = db.query(ReportJobModel).filter(ReportJobModel.status == "running")
+    if worker_id is not None:
+        query = query.filter(ReportJobModel.worker_id == worker_id)
+        reason = "worker process exited"
+    else:
+        cutoff = datetime.now() - timedelta(seconds=STALE_SEC if stale_sec is None else stale_sec)
+        query = query.filter(ReportJobModel.heartbeat_at < cutoff)
+        reason = "worker stopped heartbeating"
+    jobs = query.with_for_update(skip_locked=True).all()
+    for job in jobs:
+        _retry_or_fail(job, reason)
+    db.commit()
+    return len(jobs)
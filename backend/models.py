@@ -1,6 +1,6 @@
 from sqlalchemy import Column, String, DateTime, Text, Numeric, Date, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 import uuid
 
@@ -98,6 +98,41 @@ class AIReport(Base):
     created_at = Column(DateTime, default=func.now(), index=True)
     
     oem_company = relationship("OEMCompany", back_populates="reports")
+    jobs = relationship("ReportJob", back_populates="report")
+
+class ReportJob(Base):
+    """Queued report generation (run by worker.py processes, see jobs.py)"""
+    __tablename__ = "report_jobs"
+
+    job_id = Column(String(36), primary_key=True, default=generate_uuid)
+    report_id = Column(String(36), ForeignKey('ai_reports.report_id'), nullable=False, index=True)
+    # Hash of the normalized request; at most one queued/running job per key
+    dedup_key = Column(String(64), nullable=False)
+    company_name = Column(String(200), nullable=False)
+    oem_id = Column(String(36))
+    params = Column(Text)  # request JSON
+    requested_by = Column(String(36))
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    stage = Column(String(50))
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100))
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    report = relationship("AIReport", back_populates="jobs")
+
+    __table_args__ = (
+        Index('idx_report_jobs_status_created', 'status', 'created_at'),
+        Index(
+            'idx_report_jobs_active_dedup', 'dedup_key', unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
 
 class NewsFeed(Base):
     __tablename__ = "news_feed"
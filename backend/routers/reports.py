@@ -1,15 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse, FileResponse, HTMLResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import List, Optional
-import uuid
 from pathlib import Path
 
 from database import get_db
-from models import AIReport as AIReportModel
-from schemas import AIReport, AIReportCreate, AnalysisRequest, ReportGenerateRequest, User
+from models import AIReport as AIReportModel, ReportJob as ReportJobModel
+from schemas import AIReport, AIReportCreate, AnalysisRequest, ReportGenerateRequest, ReportJob, User
 from routers.auth import get_current_user
+import jobs
 
 router = APIRouter()
 
@@ -68,6 +68,29 @@ def get_reports(
     reports = query.order_by(desc(AIReportModel.created_at)).offset(skip).limit(limit).all()
     return reports
 
+def _job_status(db: Session, job: ReportJobModel) -> ReportJob:
+    status = ReportJob.model_validate(job)
+    status.queue_position = jobs.queue_position(db, job)
+    return status
+
+@router.get("/jobs", response_model=List[ReportJob])
+def list_report_jobs(
+    status: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    query = db.query(ReportJobModel)
+    if status:
+        query = query.filter(ReportJobModel.status == status)
+    return query.order_by(desc(ReportJobModel.created_at)).limit(limit).all()
+
+@router.get("/jobs/{job_id}", response_model=ReportJob)
+def get_report_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(ReportJobModel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(db, job)
+
 @router.get("/{report_id}", response_model=AIReport)
 def get_report(report_id: str, db: Session = Depends(get_db)):
     report = db.query(AIReportModel).filter(AIReportModel.report_id == report_id).first()
@@ -82,35 +105,25 @@ def get_report_by_code(report_code: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Report not found")
     return report
 
-@router.post("/generate")
-async def generate_report(
+@router.post("/generate", status_code=202)
+def generate_report(
     request: ReportGenerateRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Generate a comprehensive AI report"""
-    report_code = f"RPT-{uuid.uuid4().hex[:8].upper()}"
-    
-    # Create report entry
-    report = AIReportModel(
-        report_code=report_code,
-        oem_id=request.oem_id,
-        title=f"Analysis Report: {request.company_name}",
-        html_path=f"/reports/{report_code}.html"
-    )
-    db.add(report)
-    db.commit()
-    db.refresh(report)
-    
-    # Add background task to generate report
-    # background_tasks.add_task(generate_report_task, report.report_id, request)
+    """Queue a comprehensive AI report (generated by worker.py processes)"""
+    job, created = jobs.enqueue_report_job(db, request, requested_by=current_user.user_id)
+    report = db.get(AIReportModel, job.report_id)
     
     return {
-        "report_id": report.report_id,
-        "report_code": report_code,
+        "report_id": job.report_id,
+        "report_code": report.report_code,
+        "job_id": job.job_id,
         "status": "generating",
-        "message": "Report generation started"
+        "job_status": job.status,
+        "deduplicated": not created,
+        "queue_position": jobs.queue_position(db, job),
+        "message": "Report generation queued" if created else "Identical report request already in progress"
     }
 
 @router.post("/analysis")
@@ -128,6 +141,20 @@ async def run_analysis(
     }
 
 
+@router.get("/{report_id}/status", response_model=ReportJob)
+def get_report_status(report_id: str, db: Session = Depends(get_db)):
+    """Latest generation job of a report"""
+    job = (
+        db.query(ReportJobModel)
+        .filter(ReportJobModel.report_id == report_id)
+        .order_by(desc(ReportJobModel.created_at))
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="No generation job for this report")
+    return _job_status(db, job)
+
+
 @router.get("/{report_id}/open", include_in_schema=False)
 def open_report(report_id: str, db: Session = Depends(get_db)):
     report = db.query(AIReportModel).filter(AIReportModel.report_id == report_id).first()
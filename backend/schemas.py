@@ -98,6 +98,25 @@ class AIReport(AIReportBase):
     class Config:
         from_attributes = True
 
+class ReportJob(BaseModel):
+    job_id: str
+    report_id: str
+    company_name: str
+    oem_id: Optional[str]
+    status: str  # queued, running, succeeded, failed
+    progress: int
+    stage: Optional[str]
+    error: Optional[str]
+    attempts: int
+    queue_position: Optional[int] = None
+    created_at: Optional[datetime]
+    started_at: Optional[datetime]
+    heartbeat_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
 # Factory schemas
 class FactoryBase(BaseModel):
     plant_name: str
@@ -0,0 +1,230 @@
+"""
+Report generation worker pool
+
+Runs the jobs queued by POST /api/reports/generate (see jobs.py) in separate
+processes, next to the API server:
+
+    cd backend && python worker.py --workers 2
+
+Each worker process claims one job at a time and runs run_supervisor and then
+run_report_writer for the requested company, writing progress and heartbeats
+to the job row. Every job writes to its own outputs/jobs/<job_id>/ directory,
+so concurrent jobs never share the map, charts or report files. The generated
+HTML, with its local asset links pointed at /reports/jobs/<job_id>/, is saved
+as outputs/<report_code>.html and stored on the ai_reports row. Workers stay up between jobs, so the agent
+modules are imported once per process. The parent process restarts workers
+that exit, re-queues their jobs and re-queues jobs whose heartbeat went stale.
+
+Env: REPORT_WORKERS (default 2), REPORT_WORKER_POLL_SEC (default 2),
+     REPORT_JOB_HEARTBEAT_SEC (default 15), EVAGENT_OUTPUTS_DIR
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+from database import SessionLocal
+from models import AIReport as AIReportModel
+import jobs
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+OUTPUTS_DIR = Path(os.getenv("EVAGENT_OUTPUTS_DIR") or (ROOT_DIR / 'outputs')).resolve()
+POLL_SEC = float(os.getenv("REPORT_WORKER_POLL_SEC", "2"))
+HEARTBEAT_SEC = float(os.getenv("REPORT_JOB_HEARTBEAT_SEC", "15"))
+
+
+def _worker_id(pid: int) -> str:
+    return f"{socket.gethostname()}:{pid}"
+
+
+def _db_call(fn, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+class JobProgress:
+    """Progress updates plus a background heartbeat for one running job"""
+
+    def __init__(self, job_id: str, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def set(self, progress: int, stage: str) -> None:
+        print(f"[Worker {self.worker_id}] {self.job_id} {progress}% {stage}")
+        _db_call(jobs.heartbeat, self.job_id, self.worker_id, progress=progress, stage=stage)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(HEARTBEAT_SEC):
+            try:
+                _db_call(jobs.heartbeat, self.job_id, self.worker_id)
+            except Exception as e:
+                print(f"[Worker {self.worker_id}] heartbeat failed: {e}")
+
+
+@contextmanager
+def _outputs_env(path: Path):
+    """Point EVAGENT_OUTPUTS_DIR (read by the report writer) at ``path`` for one job"""
+    previous = os.environ.get("EVAGENT_OUTPUTS_DIR")
+    os.environ["EVAGENT_OUTPUTS_DIR"] = str(path)
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("EVAGENT_OUTPUTS_DIR", None)
+        else:
+            os.environ["EVAGENT_OUTPUTS_DIR"] = previous
+
+
+def run_job(job, worker_id: str) -> None:
+    """Generate the report for one claimed job"""
+    # Agents are imported here, on first use in the worker process only
+    for path in (str(ROOT_DIR), str(ROOT_DIR / 'agents')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    from agents.SupervisorAgent import run_supervisor
+    from agents.ReportWriterAgent import _file_uri, run_report_writer
+
+    company = job.company_name
+    # Own directory per job: the map and charts are written under fixed names
+    job_dir = OUTPUTS_DIR / "jobs" / job.job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    with JobProgress(job.job_id, worker_id) as progress, _outputs_env(job_dir):
+        progress.set(5, "supervisor")
+        supervisor_results = run_supervisor(companies=[company], out_dir=str(job_dir))
+        if supervisor_results.get("final_status") != 1:
+            errors = json.dumps(supervisor_results.get("error_log") or {}, ensure_ascii=False)
+            raise RuntimeError(f"SupervisorAgent failed: {errors}")
+
+        progress.set(60, "report")
+        report_result = run_report_writer(supervisor_results, companies=[company])
+        result = (report_result.get("results") or [{}])[0]
+        if not result.get("html_path"):
+            raise RuntimeError(f"ReportWriterAgent failed: {report_result.get('error') or result.get('error')}")
+        if result.get("error"):
+            # The API serves the HTML; a failed PDF/PNG conversion does not fail the job
+            print(f"[Worker {worker_id}] {job.job_id} ⚠ {result['error']}")
+
+        progress.set(95, "store")
+        report_code = _db_call(lambda db: db.get(AIReportModel, job.report_id).report_code)
+        # Per-report copy whose images load from the job's directory (served under /reports/)
+        html_text = Path(result["html_path"]).read_text(encoding='utf-8', errors='ignore')
+        html_text = html_text.replace(_file_uri(str(job_dir)) + "/", f"/reports/jobs/{job.job_id}/")
+        target = OUTPUTS_DIR / f"{report_code}.html"
+        target.write_text(html_text, encoding='utf-8')
+        if not _db_call(jobs.complete_job, job.job_id, worker_id, f"/reports/{target.name}", html_text):
+            print(f"[Worker {worker_id}] {job.job_id} was taken over by another worker; result discarded")
+
+
+def worker_main(stop_event) -> None:
+    """Worker process: claim and run jobs until ``stop_event`` is set"""
+    worker_id = _worker_id(os.getpid())
+
+    # The parent handles Ctrl+C and stops workers with SIGTERM; a running job is released
+    def _terminate(signum, frame):
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    print(f"[Worker {worker_id}] ready")
+    while not stop_event.is_set():
+        try:
+            job = _db_call(jobs.claim_next_job, worker_id)
+        except Exception as e:
+            print(f"[Worker {worker_id}] claim failed: {e}")
+            job = None
+        if job is None:
+            stop_event.wait(POLL_SEC)
+            continue
+
+        print(f"[Worker {worker_id}] {job.job_id}: {job.company_name} (attempt {job.attempts})")
+        try:
+            run_job(job, worker_id)
+            print(f"[Worker {worker_id}] {job.job_id} ✓")
+        except (KeyboardInterrupt, SystemExit):
+            _db_call(jobs.release_job, job.job_id, worker_id)
+            print(f"[Worker {worker_id}] {job.job_id} released")
+            return
+        except Exception as e:
+            traceback.print_exc()
+            _db_call(jobs.fail_job, job.job_id, worker_id, f"{e.__class__.__name__}: {e}")
+            print(f"[Worker {worker_id}] {job.job_id} ✗ {e}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Report generation worker pool")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("REPORT_WORKERS", "2")),
+                        help="Worker processes (default: REPORT_WORKERS or 2)")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = ctx.Event()
+    procs = {}
+    stopping = []
+
+    # Only flag here: setting stop_event inside a handler can deadlock with its wait()
+    def _stop(signum, frame):
+        stopping.append(signum)
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    print(f"🚀 Starting {args.workers} report workers (outputs: {OUTPUTS_DIR})")
+    last_recovery = 0.0
+    while not stopping:
+        for slot in range(max(1, args.workers)):
+            proc = procs.get(slot)
+            if proc is not None and proc.is_alive():
+                continue
+            if proc is not None:
+                # Exited (crash, OOM kill): its running job goes back to the queue
+                try:
+                    n = _db_call(jobs.recover_jobs, worker_id=_worker_id(proc.pid))
+                    print(f"⚠ Worker {proc.pid} exited ({proc.exitcode}); recovered {n} job(s)")
+                except Exception as e:
+                    print(f"⚠ Worker {proc.pid} exited ({proc.exitcode}); job recovery failed: {e}")
+            proc = ctx.Process(target=worker_main, args=(stop_event,), name=f"report-worker-{slot}")
+            proc.start()
+            procs[slot] = proc
+
+        if time.monotonic() - last_recovery >= jobs.STALE_SEC / 2:
+            try:
+                n = _db_call(jobs.recover_jobs)
+                if n:
+                    print(f"⚠ Re-queued {n} stale job(s)")
+            except Exception as e:
+                print(f"⚠ Stale job check failed: {e}")
+            last_recovery = time.monotonic()
+        time.sleep(POLL_SEC)
+
+    print("👋 Stopping report workers...")
+    stop_event.set()
+    for proc in procs.values():
+        if proc.is_alive():
+            proc.terminate()
+    for proc in procs.values():
+        proc.join(timeout=30)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+ESG answer extraction - accuracy and throughput benchmark
+
+Compares agents/esg_extract.py with the per-call regex helpers ESGAgent used
+before (kept below as the baseline) on:
+
+- accuracy: hand-labelled answers in benchmarks/fixtures/esg_answers.json
+  and esg_answers_two_agency.json (answers naming both MSCI and CDP), scored
+  per field (target_year, scopes, msci, cdp). The patterns were written
+  against both sets, so neither measures unseen answers;
+  tests/test_esg_extract.py asserts these;
+- throughput: a corpus of answers (the labelled ones, plus every answer stored
+  in an ESG fact store with --db) repeated up to --n texts, as when re-parsing
+  cached answers for a history backfill.
+
+Usage:
+    python benchmarks/bench_esg_extract.py
+    python benchmarks/bench_esg_extract.py --n 20000 --db db/esg_facts.sqlite --out esg_extract.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "agents"))
+
+from esg_extract import extract, extract_many  # noqa: E402
+from stubs import load_fixture  # noqa: E402
+
+FIELDS = ("target_year", "scopes", "msci", "cdp")
+
+
+# ---------------------------------
+# Baseline: the helpers ESGAgent used before esg_extract
+# ---------------------------------
+def _legacy_year(text: str) -> Optional[int]:
+    yrs = [int(y) for y in re.findall(r"(20[2-6][0-9])", text or "")]
+    if not yrs:
+        return None
+    valid = [y for y in yrs if 2024 <= y <= 2065]
+    return min(valid) if valid else min(yrs)
+
+
+def _legacy_scopes(text: str) -> List[str]:
+    s = (text or "").lower()
+    scopes: List[str] = []
+    if re.search(r"\bscope\s*1\b|\bs1\b", s):
+        scopes.append("S1")
+    if re.search(r"\bscope\s*2\b|\bs2\b", s):
+        scopes.append("S2")
+    if re.search(r"\bscope\s*3\b|\bs3\b", s):
+        scopes.append("S3")
+    return scopes
+
+
+def _legacy_pick(pattern: str, text: str) -> Optional[str]:
+    m = re.search(pattern, text or "", re.IGNORECASE)
+    return m.group(0) if m else None
+
+
+def legacy_extract(text: str) -> Dict[str, Any]:
+    return {
+        "target_year": _legacy_year(text),
+        "scopes": _legacy_scopes(text),
+        "msci": _legacy_pick(r"AAA|AA|A|BBB|BB|B|CCC", text),
+        "cdp": _legacy_pick(r"A\+|A-|A|B\+|B|B-|C\+|C|C-|D\+|D|D-", text),
+    }
+
+
+# ---------------------------------
+# Measurements
+# ---------------------------------
+def accuracy(cases: List[Dict[str, Any]], fn: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+    scores: Dict[str, List[int]] = {f: [0, 0] for f in FIELDS}
+    misses = []
+    for case in cases:
+        got = fn(case["text"])
+        for field, want in case["expected"].items():
+            scores[field][1] += 1
+            if got[field] == want:
+                scores[field][0] += 1
+            else:
+                misses.append({"text": case["text"][:80], "field": field, "want": want, "got": got[field]})
+    ok = sum(s[0] for s in scores.values())
+    total = sum(s[1] for s in scores.values())
+    return {
+        "overall": round(ok / total, 3) if total else None,
+        "fields": {f: f"{s[0]}/{s[1]}" for f, s in scores.items() if s[1]},
+        "misses": misses,
+    }
+
+
+def _store_answers(db_path: str) -> List[str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return [r[0] for r in conn.execute("SELECT answer FROM facts WHERE answer != ''")]
+    finally:
+        conn.close()
+
+
+def throughput(texts: List[str], fn: Callable[[List[str]], Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    fn(texts)
+    sec = time.perf_counter() - started
+    return {"sec": round(sec, 4), "answers_per_sec": round(len(texts) / sec) if sec else None}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ESG answer extraction (accuracy and throughput)")
+    parser.add_argument("--n", type=int, default=10000, help="Corpus size for the throughput run (default: 10000)")
+    parser.add_argument("--db", default=None, help="ESG fact store whose stored answers join the corpus")
+    parser.add_argument("--show-misses", action="store_true", help="Include per-case misses in the output")
+    parser.add_argument("--out", default=None, help="Write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    cases = load_fixture("esg_answers.json")["cases"]
+    base = [c["text"] for c in cases] + (_store_answers(args.db) if args.db else [])
+    corpus = (base * (args.n // len(base) + 1))[: args.n]
+    # Distinct texts, so the comparison is per parse rather than per cache hit
+    unique = [f"{t} [{i}]" for i, t in enumerate(corpus)]
+
+    two_agency = load_fixture("esg_answers_two_agency.json")["cases"]
+    report: Dict[str, Any] = {
+        "cases": len(cases), "two_agency_cases": len(two_agency), "corpus": len(corpus),
+        "accuracy": {}, "accuracy_two_agency": {}, "throughput": {},
+    }
+    for name, fn in (("legacy", legacy_extract), ("esg_extract", extract)):
+        for key, labelled in (("accuracy", cases), ("accuracy_two_agency", two_agency)):
+            acc = accuracy(labelled, fn)
+            if not args.show_misses:
+                acc["misses"] = len(acc["misses"])
+            report[key][name] = acc
+    report["throughput"] = {
+        "legacy": throughput(unique, lambda ts: [legacy_extract(t) for t in ts]),
+        "esg_extract": throughput(unique, lambda ts: [extract(t) for t in ts]),
+        "esg_extract_many_repeated": throughput(corpus, extract_many),
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+EV Market Analysis - pipeline benchmark
+
+Runs run_supervisor + run_report_writer against local stand-ins for Tavily,
+OpenAI, yfinance and Nominatim (benchmarks/stubs.py, fixtures in
+benchmarks/fixtures/) for several company counts, and reports per-stage wall
+time, CPU time, peak RSS and API call counts as JSON.
+
+Each company count runs in its own subprocess and temp workspace (config, data,
+outputs and caches), so peak RSS and caches are not shared between runs.
+Company counts above the 9 configured OEMs use synthetic OEMs whose factories
+and price series reuse the recorded ones.
+
+Usage:
+    python benchmarks/run_benchmark.py
+    python benchmarks/run_benchmark.py --companies 1,9 --out bench.json
+    python benchmarks/run_benchmark.py --latency-scale 0   # CPU overhead only
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+# Per-call latency of each stand-in (seconds) at --latency-scale 1.0
+DEFAULT_LATENCY = {"tavily": 0.25, "openai": 0.6, "yfinance": 0.15, "nominatim": 0.1}
+
+OEM_DATA_FILE = "ev_factories_full_with_status.csv"
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+# ---------------------------------
+# Workspace
+# ---------------------------------
+def _build_workspace(workdir: str, n_companies: int) -> List[str]:
+    """Write config/ and data/ for n OEMs (real first, then synthetic); return OEM names."""
+    with open(os.path.join(BASE_DIR, "config", "allowed_companies.json"), "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    real_oems = [c for c in cfg["companies"] if c.get("category") == "OEM"]
+    suppliers = [c for c in cfg["companies"] if c.get("category") != "OEM"]
+
+    oems = [dict(c) for c in real_oems[:n_companies]]
+    for i in range(len(oems), n_companies):
+        base = real_oems[i % len(real_oems)]
+        oems.append({
+            "name": f"Synthetic OEM {i + 1:03d}",
+            "ticker": f"SYN{i + 1:03d}",
+            "country": base.get("country", "US"),
+            "category": "OEM",
+            "aliases": [],
+            "_template": base["name"],
+        })
+
+    cfg_dir = os.path.join(workdir, "config")
+    os.makedirs(cfg_dir, exist_ok=True)
+    with open(os.path.join(cfg_dir, "allowed_companies.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"metadata": cfg.get("metadata", {}),
+             "companies": [{k: v for k, v in c.items() if k != "_template"} for c in oems] + suppliers},
+            f, ensure_ascii=False, indent=2,
+        )
+
+    data_dir = os.path.join(workdir, "data")
+    shutil.copytree(os.path.join(BASE_DIR, "data"), data_dir)
+    synthetic = [c for c in oems if "_template" in c]
+    if synthetic:
+        path = os.path.join(data_dir, OEM_DATA_FILE)
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames or []
+            rows = list(reader)
+        by_company: Dict[str, List[Dict[str, str]]] = {}
+        for r in rows:
+            by_company.setdefault(r.get("Company", ""), []).append(r)
+        for c in synthetic:
+            for r in by_company.get(c["_template"], []):
+                rows.append({**r, "Company": c["name"]})
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    return [c["name"] for c in oems]
+
+
+# ---------------------------------
+# Worker (one company count, one process)
+# ---------------------------------
+def _timed_stage(fn: Callable[[], Any], counters: Callable[[], Dict[str, int]]) -> Dict[str, Any]:
+    before = counters()
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    error = None
+    result = None
+    try:
+        result = fn()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    after = counters()
+    return {
+        "wall_sec": round(time.perf_counter() - wall0, 3),
+        "cpu_sec": round(time.process_time() - cpu0, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "api_calls": {k: after.get(k, 0) - before.get(k, 0) for k in ("tavily", "openai", "yfinance", "nominatim")},
+        "error": error,
+        "_result": result,
+    }
+
+
+def run_worker(n_companies: int, args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix=f"evagent_bench_{n_companies}_")
+    try:
+        companies = _build_workspace(workdir, n_companies)
+        outputs = os.path.join(workdir, "outputs")
+        os.makedirs(outputs, exist_ok=True)
+
+        sys.path.insert(0, BENCH_DIR)
+        from stubs import CallCounter, FakeYFinance, FixtureServer, make_geocoder
+
+        scale = args.latency_scale
+        counter = CallCounter()
+        server = FixtureServer(
+            counter,
+            tavily_latency=DEFAULT_LATENCY["tavily"] * scale,
+            openai_latency=DEFAULT_LATENCY["openai"] * scale,
+        ).start()
+
+        os.environ.update({
+            "TAVILY_API_KEY": "bench",
+            "OPENAI_API_KEY": "bench",
+            "TAVILY_BASE_URL": server.base_url,
+            "OPENAI_BASE_URL": server.base_url + "/v1",
+            "OPENAI_API_BASE": server.base_url + "/v1",
+            "EVAGENT_CONFIG_DIR": os.path.join(workdir, "config"),
+            "EVAGENT_DATA_DIR": os.path.join(workdir, "data"),
+            "EVAGENT_OUTPUTS_DIR": outputs,
+            "EVAGENT_GEOCODE_CACHE_PATH": os.path.join(workdir, "geocode_cache.sqlite"),
+            "EVAGENT_CACHE_PATH": os.path.join(workdir, "result_cache.sqlite"),
+            "EVAGENT_PRICE_STORE_PATH": os.path.join(workdir, "price_store.sqlite"),
+            "EVAGENT_ESG_STORE_PATH": os.path.join(workdir, "esg_facts.sqlite"),
+            "EVAGENT_CACHE_MODE": args.cache_mode,
+        })
+
+        # Import after the environment points at the workspace and stand-ins
+        sys.path.insert(0, os.path.join(BASE_DIR, "agents"))
+        sys.path.insert(0, BASE_DIR)
+        from agents import SupervisorAgent, StockAnalyzerAgent, ValueChainAgent
+        from agents.ReportWriterAgent import run_report_writer
+
+        StockAnalyzerAgent.yf = FakeYFinance(counter, latency=DEFAULT_LATENCY["yfinance"] * scale)
+        geocoder = make_geocoder(ValueChainAgent.StubGeocoder, counter, latency=DEFAULT_LATENCY["nominatim"] * scale)
+        ValueChainAgent._default_geocoder = lambda: geocoder
+        if args.geocode_cache == "warm":
+            cache = ValueChainAgent.get_geocode_cache(os.environ["EVAGENT_GEOCODE_CACHE_PATH"])
+            for query, (lat, lon) in geocoder.table.items():
+                cache.put(query, lat, lon)
+            cache.flush()
+
+        # Cumulative time spent inside each sub-agent (calls overlap, so this can exceed wall time)
+        agent_time: Dict[str, Dict[str, float]] = {}
+
+        def _wrap(name: str, fn: Callable) -> Callable:
+            def inner(*a, **kw):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*a, **kw)
+                finally:
+                    slot = agent_time.setdefault(name, {"calls": 0, "total_sec": 0.0})
+                    slot["calls"] += 1
+                    slot["total_sec"] = round(slot["total_sec"] + time.perf_counter() - t0, 3)
+            return inner
+
+        for attr, name in (("run_tech_agent", "tech"), ("run_valuechain_agent", "valuechain"),
+                           ("run_stock_analysis", "stock"), ("run_esg_agent", "esg")):
+            setattr(SupervisorAgent, attr, _wrap(name, getattr(SupervisorAgent, attr)))
+
+        stages: Dict[str, Any] = {}
+        stages["supervisor"] = _timed_stage(
+            lambda: SupervisorAgent.run_supervisor(companies=companies, out_dir=outputs),
+            counter.snapshot,
+        )
+        sup = stages["supervisor"].pop("_result") or {}
+        if args.skip_report:
+            report_summary = None
+        else:
+            stages["report_writer"] = _timed_stage(lambda: run_report_writer(sup), counter.snapshot)
+            rep = stages["report_writer"].pop("_result") or {}
+            report_summary = {k: rep.get(k) for k in ("total", "success", "failed", "prompt_cache")}
+
+        server.stop()
+        return {
+            "companies": n_companies,
+            "stages": stages,
+            "agents": agent_time,
+            "api_calls_total": counter.snapshot(),
+            "supervisor_status": sup.get("final_status"),
+            "reports": report_summary,
+        }
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---------------------------------
+# Driver
+# ---------------------------------
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the EV analysis pipeline against recorded fixtures")
+    parser.add_argument("--companies", default="1,9,50,200", help="Comma-separated OEM counts (default: 1,9,50,200)")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier for stand-in latencies %s (0 = no simulated latency)" % DEFAULT_LATENCY)
+    parser.add_argument("--cache-mode", default="off", help="EVAGENT_CACHE_MODE for the run (default: off)")
+    parser.add_argument("--geocode-cache", choices=["warm", "cold"], default="warm",
+                        help="Pre-populate the geocode cache from fixtures (default: warm)")
+    parser.add_argument("--skip-report", action="store_true", help="Only benchmark run_supervisor")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep temp workspaces for inspection")
+    parser.add_argument("--out", default=None, help="Write JSON results here (default: stdout)")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        result = run_worker(args.worker, args)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        return 0
+
+    counts = [int(c) for c in args.companies.split(",") if c.strip()]
+    runs = []
+    for n in counts:
+        print(f"[bench] {n} companies ...", file=sys.stderr)
+        fd, result_file = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", str(n), "--result-file", result_file,
+               "--latency-scale", str(args.latency_scale), "--cache-mode", args.cache_mode,
+               "--geocode-cache", args.geocode_cache]
+        if args.skip_report:
+            cmd.append("--skip-report")
+        if args.keep_workdir:
+            cmd.append("--keep-workdir")
+        # Agent progress output goes to the worker log, not the JSON stream
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        try:
+            with open(result_file, "r", encoding="utf-8") as f:
+                run = json.load(f)
+        except (OSError, ValueError):
+            run = {"companies": n, "error": f"worker exited with {proc.returncode}", "log_tail": proc.stdout[-2000:]}
+        finally:
+            os.remove(result_file)
+        runs.append(run)
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "latency_scale": args.latency_scale,
+            "latency_sec": {k: v * args.latency_scale for k, v in DEFAULT_LATENCY.items()},
+            "cache_mode": args.cache_mode,
+            "geocode_cache": args.geocode_cache,
+        },
+        "runs": runs,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-ins for external services used by the benchmark harness
+
+- FixtureServer: HTTP server speaking the Tavily /search and OpenAI
+  /v1/chat/completions protocols, replaying benchmarks/fixtures/*.json.
+  Like OpenAI it reports a previously seen message prefix (>= 1024 tokens)
+  as usage.prompt_tokens_details.cached_tokens.
+  Agents reach it through TAVILY_BASE_URL / OPENAI_BASE_URL (agents/http_client.py)
+  and langchain's ChatOpenAI through OPENAI_BASE_URL / OPENAI_API_BASE.
+- FakeYFinance: drop-in for the ``yfinance`` module (download, Ticker().history/fast_info/info).
+- LatencyGeocoder: StubGeocoder with recorded Nominatim coordinates and a fixed delay.
+
+Every stand-in counts its calls; ``latency`` adds a fixed per-call delay so runs
+reflect network-bound behaviour (set it to 0 to measure pure CPU overhead).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name: str) -> Any:
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _stable_index(text: str, n: int) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) % n
+
+
+class CallCounter:
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+# ---------------------------------
+# Tavily / OpenAI over HTTP
+# ---------------------------------
+class FixtureServer:
+    """Threaded local server replaying Tavily and OpenAI fixtures."""
+
+    def __init__(
+        self,
+        counter: CallCounter,
+        *,
+        tavily_latency: float = 0.0,
+        openai_latency: float = 0.0,
+        stream_interval: float = 0.0,
+    ):
+        self.counter = counter
+        self.tavily_latency = tavily_latency
+        self.openai_latency = openai_latency
+        # Delay between streamed chunks (latency then applies to the first token only)
+        self.stream_interval = stream_interval
+        self.tavily = load_fixture("tavily.json")["responses"]
+        self.openai_routes = load_fixture("openai.json")["routes"]
+        self._seen_prefixes: set = set()
+        self._prefix_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                path = self.path.rstrip("/")
+                if path.endswith("/search"):
+                    out = server._tavily(body)
+                elif path.endswith("/chat/completions"):
+                    out = server._openai(body)
+                    if body.get("stream"):
+                        out["stream_usage"] = bool((body.get("stream_options") or {}).get("include_usage"))
+                        self._send_stream(out)
+                        return
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = json.dumps(out, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, completion: Dict[str, Any]) -> None:
+                # Server-sent events, one chunk per line of content (chat.completion.chunk)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                content = completion["choices"][0]["message"]["content"]
+                pieces = [p for p in re.split(r"(?<=\n)", content) if p]
+                base = {k: completion[k] for k in ("id", "created", "model")}
+                for i, piece in enumerate(pieces):
+                    delta = {"content": piece} if i else {"role": "assistant", "content": piece}
+                    chunk = {**base, "object": "chat.completion.chunk",
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                    self.wfile.write(b"data: " + json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n\n")
+                    self.wfile.flush()
+                    if server.stream_interval:
+                        time.sleep(server.stream_interval)
+                done = {**base, "object": "chat.completion.chunk",
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self.wfile.write(b"data: " + json.dumps(done).encode("utf-8") + b"\n\n")
+                if completion.get("stream_usage"):
+                    usage = {**base, "object": "chat.completion.chunk", "choices": [],
+                             "usage": completion["usage"]}
+                    self.wfile.write(b"data: " + json.dumps(usage).encode("utf-8") + b"\n\n")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def start(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _tavily(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.counter.add("tavily")
+        if self.tavily_latency:
+            time.sleep(self.tavily_latency)
+        query = str(body.get("query", ""))
+        tpl = json.dumps(self.tavily[_stable_index(query, len(self.tavily))], ensure_ascii=False)
+        out = json.loads(tpl.replace("{query}", json.dumps(query, ensure_ascii=False)[1:-1]))
+        out["results"] = out.get("results", [])[: int(body.get("max_results") or 5)]
+        return out
+
+    def _openai(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.counter.add("openai")
+        if self.openai_latency:
+            time.sleep(self.openai_latency)
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+        route = next((r for r in self.openai_routes if r["match"] in prompt), self.openai_routes[-1])
+        content = route["content"]
+        if route["name"] == "citation_batch":
+            idx = [int(i) for i in re.findall(r"^\[(\d+)\] Title:", prompt, re.MULTILINE)]
+            content = json.dumps({"summaries": [{"index": i, "summary": content} for i in idx]})
+        elif route["name"] == "report":
+            m = re.search(r"이번 보고서 대상:\s*(.+)", prompt)
+            content = content.replace("{company}", m.group(1).strip() if m else "")
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        cached_tokens = self._cached_tokens(messages)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+    def _cached_tokens(self, messages: List[Any]) -> int:
+        """Longest previously seen message prefix, in 128-token steps from 1024 (as OpenAI)."""
+        keys = []
+        text = ""
+        for m in messages[:-1]:
+            if isinstance(m, dict):
+                text += str(m.get("content", "")) + "\n"
+            keys.append((hashlib.sha256(text.encode("utf-8")).hexdigest(), len(text) // 4))
+        with self._prefix_lock:
+            hit = max((tokens for key, tokens in keys if key in self._seen_prefixes), default=0)
+            self._seen_prefixes.update(key for key, _ in keys)
+        return hit // 128 * 128 if hit >= 1024 else 0
+
+
+# ---------------------------------
+# yfinance
+# ---------------------------------
+class _FastInfo:
+    def __init__(self, info: Dict[str, Any]):
+        self.last_price = info.get("last_price")
+        self.previous_close = info.get("previous_close")
+        self.market_cap = info.get("market_cap")
+
+
+class FakeYFinance:
+    """Minimal ``yfinance`` module replacement backed by recorded OHLCV snapshots.
+
+    Unknown tickers (synthetic OEMs) reuse a recorded series chosen by a stable hash.
+    """
+
+    def __init__(self, counter: CallCounter, *, latency: float = 0.0):
+        fx = load_fixture("yfinance.json")
+        self.counter = counter
+        self.latency = latency
+        self.end_date = fx["end_date"]
+        self.tickers: Dict[str, Dict[str, Any]] = fx["tickers"]
+        self._names: List[str] = sorted(self.tickers)
+
+    def _record(self, ticker: str) -> Dict[str, Any]:
+        if ticker in self.tickers:
+            return self.tickers[ticker]
+        return self.tickers[self._names[_stable_index(ticker, len(self._names))]]
+
+    def _frame(self, ticker: str, start: Optional[str] = None, end: Optional[str] = None):
+        import pandas as pd
+
+        rows = self._record(ticker)["ohlcv"]
+        index = pd.bdate_range(end=self.end_date, periods=len(rows), name="Date")
+        df = pd.DataFrame(rows, index=index, columns=["Open", "High", "Low", "Close", "Volume"])
+        # Recorded snapshot only: period windows return all of it; start/end (end exclusive) slice it
+        if start:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end:
+            df = df[df.index < pd.Timestamp(end)]
+        return df
+
+    def _call(self) -> None:
+        self.counter.add("yfinance")
+        if self.latency:
+            time.sleep(self.latency)
+
+    def Ticker(self, ticker: str) -> "_FakeTicker":
+        return _FakeTicker(self, ticker)
+
+    def download(self, tickers, period: str = "3mo", interval: str = "1d", group_by: str = "column", **kwargs):
+        """Bulk history: one call, columns (ticker, field) when group_by="ticker"."""
+        import pandas as pd
+
+        self._call()
+        names = tickers.split() if isinstance(tickers, str) else list(tickers)
+        frames = {t: self._frame(t, kwargs.get("start"), kwargs.get("end")) for t in names}
+        df = pd.concat(frames, axis=1)
+        return df if group_by == "ticker" else df.swaplevel(0, 1, axis=1)
+
+
+class _FakeTicker:
+    def __init__(self, yf: FakeYFinance, ticker: str):
+        self._yf = yf
+        self.ticker = ticker
+        self._info: Optional[Dict[str, Any]] = None
+
+    def history(self, period: str = "3mo", interval: str = "1d", **kwargs):
+        self._yf._call()
+        return self._yf._frame(self.ticker, kwargs.get("start"), kwargs.get("end"))
+
+    @property
+    def fast_info(self) -> _FastInfo:
+        return _FastInfo(self._yf._record(self.ticker)["info"])
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        if self._info is None:
+            self._yf._call()
+            info = self._yf._record(self.ticker)["info"]
+            self._info = {"trailingPE": info.get("trailingPE"), "symbol": self.ticker}
+        return self._info
+
+
+# ---------------------------------
+# Nominatim
+# ---------------------------------
+def make_geocoder(stub_cls, counter: CallCounter, *, latency: float = 0.0):
+    """StubGeocoder (from ValueChainAgent) over recorded coordinates, with call counting."""
+    table = {q: tuple(v) for q, v in load_fixture("nominatim.json").items()}
+
+    class LatencyGeocoder(stub_cls):
+        def geocode(self, query: str):
+            counter.add("nominatim")
+            if latency:
+                time.sleep(latency)
+            return super().geocode(query)
+
+    return LatencyGeocoder(table)
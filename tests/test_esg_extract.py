@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Accuracy of agents/esg_extract.py on the labelled ESG answer fixtures.
+
+Both fixture sets are tuning sets: the patterns were written against them, so
+these are regression checks. esg_answers_two_agency.json is mostly answers
+naming both MSCI and CDP.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agents"))
+
+from esg_extract import extract  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def _cases(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return json.load(f)["cases"]
+
+
+def _accuracy(cases):
+    checks = [(extract(c["text"])[field] == want) for c in cases for field, want in c["expected"].items()]
+    return sum(checks) / len(checks)
+
+
+def test_answers_accuracy():
+    assert _accuracy(_cases("esg_answers.json")) == 1.0
+
+
+def test_two_agency_accuracy():
+    assert _accuracy(_cases("esg_answers_two_agency.json")) >= 0.95
+
+
+@pytest.mark.parametrize("case", [
+    c for c in _cases("esg_answers_two_agency.json") if "msci" in c["expected"] or "cdp" in c["expected"]
+], ids=lambda c: c["text"][:40])
+def test_two_agency_ratings_attribution(case):
+    got = extract(case["text"])
+    for field in ("msci", "cdp"):
+        if field in case["expected"]:
+            assert got[field] == case["expected"][field], case["text"]
+
+
+@pytest.mark.parametrize("text, scopes", [
+    ("Net zero across Scopes 1, 2, and 3 by 2040.", ["S1", "S2", "S3"]),
+    ("Net zero across Scope 1, 2, & 3 by 2040.", ["S1", "S2", "S3"]),
+    ("Net zero across Scopes 1, 2 and 3 by 2040.", ["S1", "S2", "S3"]),
+    ("Carbon neutral for Scopes 1 and 2, and a 2030 goal.", ["S1", "S2"]),
+])
+def test_scope_lists(text, scopes):
+    assert extract(text)["scopes"] == scopes
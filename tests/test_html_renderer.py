@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""IncrementalHtmlRenderer (agents/ReportWriterAgent.py) splits lines like str.splitlines().
+
+The reference renders each line of text.splitlines(), as the renderer it
+replaced did; whole and chunked feeds must produce the same document.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agents"))
+
+from ReportWriterAgent import IncrementalHtmlRenderer  # noqa: E402
+
+TEXTS = [
+    "# 보고서\n## 1. 개요\n본문\n\n| a | b |\n|---|---|\n| 1 | 2 |\n## 2. 결론\n끝\n",
+    "# 제목\r\n## 섹션\r\n첫 줄\r\n\r\n둘째 줄",
+    "## 1. 개요\u2028줄 구분\u2029문단 구분\x0c폼피드\x0b수직 탭\x85NEL\x1c\x1d\x1e끝",
+    "| a | b |\x0c|---|---|\u2028| 1 | 2 |\r\r\n## 다음\r",
+]
+
+
+def _reference(text):
+    r = IncrementalHtmlRenderer({})
+    for ln in text.splitlines():
+        r._line(ln)
+    r._flush_table()
+    return r.document()
+
+
+def _render(chunks):
+    r = IncrementalHtmlRenderer({})
+    for c in chunks:
+        r.feed(c)
+    r.finish()
+    return r.document()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_whole_text_matches_splitlines(text):
+    assert _render([text]) == _reference(text)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_chunked_text_matches_splitlines(text, size):
+    assert _render([text[i:i + size] for i in range(0, len(text), size)]) == _reference(text)
@@ -3,7 +3,7 @@
 LLM helper
 
 - OPENAI_API_KEY를 evagent/.env 또는 환경변수에서 로드 후, 간단한 Markdown 생성 헬퍼 제공
-- openai 패키지가 없거나 네트워크가 막힌 환경에서는 예외를 던진다(상위에서 폴백 처리)
+- agents.http_client 공용 전송 계층 사용. 네트워크가 막힌 환경에서는 예외를 던진다(상위에서 폴백 처리)
 """
 from __future__ import annotations
 
@@ -36,27 +36,26 @@ _load_env_from_dotenv()
 def generate_markdown(prompt: str, *, model: str = "gpt-4o-mini") -> str:
     """Prompt를 Markdown 문자열로 생성.
 
-    openai 라이브러리 존재 및 OPENAI_API_KEY 필요.
+    OPENAI_API_KEY 필요(OPENAI_BASE_URL로 스텁 서버 지정 가능).
     상위 호출부에서 예외를 캐치해 폴백(HTML 스켈레톤) 처리한다.
     """
     try:
-        from openai import OpenAI  # type: ignore
+        from agents.http_client import openai_chat_completion  # type: ignore
     except Exception as e:
-        raise RuntimeError("openai library not available") from e
+        raise RuntimeError("agents.http_client not available") from e
 
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
 
-    client = OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
+    # 공용 풀링 클라이언트 재사용(호출마다 OpenAI 클라이언트/TLS 연결을 새로 만들지 않음)
+    resp = openai_chat_completion({
+        "model": model,
+        "messages": [
             {"role": "system", "content": "당신은 전문 애널리스트입니다. 한국어로만 답하고, 주어진 데이터만 근거로 작성합니다."},
             {"role": "user", "content": prompt},
         ],
-        temperature=0.3,
-    )
-    content = resp.choices[0].message.content or ""
+        "temperature": 0.3,
+    })
+    content = resp.get("choices", [{}])[0].get("message", {}).get("content") or ""
     return content
-